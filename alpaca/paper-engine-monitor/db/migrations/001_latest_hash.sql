@@ -0,0 +1,4 @@
+-- history rows carry the hash of their latest model, which --latest_mode DERIVED
+-- copies into the *_latest tables (see BaseQueries.derive)
+ALTER TABLE portfolio ADD COLUMN IF NOT EXISTS latest_hash VARCHAR;
+ALTER TABLE position ADD COLUMN IF NOT EXISTS latest_hash VARCHAR;
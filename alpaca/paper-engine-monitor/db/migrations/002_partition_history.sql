@@ -0,0 +1,147 @@
+-- Partitions by month the history tables (portfolio, position) of a database
+-- created before they were partitioned. Each table is renamed to
+-- <table>_unpartitioned, created again from db/ with monthly partitions from
+-- its first row, and its rows are copied over, in one transaction. Run after
+-- 001_latest_hash.sql, with the loader stopped:
+--
+--     psql "$TARGET" -f db/migrations/002_partition_history.sql
+--
+-- then drop portfolio_unpartitioned and position_unpartitioned once checked.
+\set ON_ERROR_STOP on
+BEGIN;
+
+-- portfolio: the old table and its indexes are renamed out of the way
+ALTER TABLE portfolio RENAME TO portfolio_unpartitioned;
+DO $$
+DECLARE
+    idx TEXT;
+BEGIN
+    FOR idx IN
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'portfolio_unpartitioned'
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I;', idx, idx || '_unpartitioned');
+    END LOOP;
+END $$;
+
+\ir ../portfolio.sql
+
+-- monthly partitions of the existing rows, up to the ones portfolio.sql premade
+DO $$
+DECLARE
+    m TIMESTAMP;
+BEGIN
+    SELECT date_trunc('month', MIN(portfolio_ts)) INTO m FROM portfolio_unpartitioned;
+    WHILE m < date_trunc('month', now() AT TIME ZONE 'UTC') LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF portfolio FOR VALUES FROM (%L) TO (%L);',
+            'portfolio_p' || to_char(m, 'YYYYMM'),
+            m,
+            m + interval '1 month'
+        );
+        m := m + interval '1 month';
+    END LOOP;
+END $$;
+
+INSERT INTO portfolio (
+    portfolio_id,
+    portfolio_ts,
+    long_notional,
+    short_notional,
+    notional,
+    long_wgt,
+    short_wgt,
+    long_rtn,
+    long_cum_rtn,
+    short_rtn,
+    short_cum_rtn,
+    rtn,
+    cum_rtn,
+    hash,
+    event_id,
+    delivery_id,
+    latest_hash
+)
+SELECT
+    portfolio_id,
+    portfolio_ts,
+    long_notional,
+    short_notional,
+    notional,
+    long_wgt,
+    short_wgt,
+    long_rtn,
+    long_cum_rtn,
+    short_rtn,
+    short_cum_rtn,
+    rtn,
+    cum_rtn,
+    hash,
+    event_id,
+    delivery_id,
+    latest_hash
+FROM portfolio_unpartitioned;
+
+-- position: the old table and its indexes are renamed out of the way
+ALTER TABLE position RENAME TO position_unpartitioned;
+DO $$
+DECLARE
+    idx TEXT;
+BEGIN
+    FOR idx IN
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'position_unpartitioned'
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I;', idx, idx || '_unpartitioned');
+    END LOOP;
+END $$;
+
+\ir ../position.sql
+
+-- monthly partitions of the existing rows, up to the ones position.sql premade
+DO $$
+DECLARE
+    m TIMESTAMP;
+BEGIN
+    SELECT date_trunc('month', MIN(position_ts)) INTO m FROM position_unpartitioned;
+    WHILE m < date_trunc('month', now() AT TIME ZONE 'UTC') LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF position FOR VALUES FROM (%L) TO (%L);',
+            'position_p' || to_char(m, 'YYYYMM'),
+            m,
+            m + interval '1 month'
+        );
+        m := m + interval '1 month';
+    END LOOP;
+END $$;
+
+INSERT INTO position (
+    portfolio_id,
+    side,
+    asset_id_type,
+    asset_id,
+    position_ts,
+    wgt,
+    quantity,
+    notional,
+    hash,
+    event_id,
+    delivery_id,
+    latest_hash
+)
+SELECT
+    portfolio_id,
+    side,
+    asset_id_type,
+    asset_id,
+    position_ts,
+    wgt,
+    quantity,
+    notional,
+    hash,
+    event_id,
+    delivery_id,
+    latest_hash
+FROM position_unpartitioned;
+
+COMMIT;
@@ -16,8 +16,36 @@ CREATE TABLE portfolio
 
     hash                                    VARCHAR NOT NULL,
 
-    event_id                                BIGINT NOT NULL UNIQUE,
+    event_id                                BIGINT NOT NULL,
     delivery_id                             BIGINT NOT NULL,
+    -- hash of the latest model, copied by --latest_mode DERIVED
+    latest_hash                             VARCHAR,
 
-    PRIMARY KEY(portfolio_id, portfolio_ts)
-);
+    PRIMARY KEY(portfolio_id, portfolio_ts),
+    -- unique constraints of a partitioned table include the partition key
+    UNIQUE(event_id, portfolio_ts)
+) PARTITION BY RANGE (portfolio_ts);
+
+CREATE INDEX portfolio_delivery_id_idx ON portfolio (delivery_id);
+CREATE INDEX portfolio_portfolio_ts_brin ON portfolio USING BRIN (portfolio_ts);
+
+-- monthly partitions portfolio_pYYYYMM are created and expired by
+-- python -m paper_engine_monitor.maintenance (daily, see README), rows outside
+-- them land here
+CREATE TABLE portfolio_default PARTITION OF portfolio DEFAULT;
+
+-- current month and the 3 premade by maintenance, so rows don't start in the
+-- default partition
+DO $$
+DECLARE
+    m TIMESTAMP := date_trunc('month', now() AT TIME ZONE 'UTC');
+BEGIN
+    FOR i IN 0..3 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF portfolio FOR VALUES FROM (%L) TO (%L);',
+            'portfolio_p' || to_char(m + make_interval(months => i), 'YYYYMM'),
+            m + make_interval(months => i),
+            m + make_interval(months => i + 1)
+        );
+    END LOOP;
+END $$;
@@ -0,0 +1,20 @@
+CREATE TABLE portfolio_rollup
+(
+    portfolio_id                            BIGINT,
+    resolution                              VARCHAR(10),
+    bucket_ts                               TIMESTAMP,
+    notional_open                           DECIMAL(24,4),
+    notional_high                           DECIMAL(24,4),
+    notional_low                            DECIMAL(24,4),
+    notional_close                          DECIMAL(24,4),
+    cum_rtn_open                            DECIMAL(24,4),
+    cum_rtn_high                            DECIMAL(24,4),
+    cum_rtn_low                             DECIMAL(24,4),
+    cum_rtn_close                           DECIMAL(24,4),
+
+    first_ts                                TIMESTAMP NOT NULL,
+    last_ts                                 TIMESTAMP NOT NULL,
+    n_obs                                   INTEGER NOT NULL,
+
+    PRIMARY KEY(portfolio_id, resolution, bucket_ts)
+);
@@ -11,8 +11,36 @@ CREATE TABLE position
 
     hash                                    VARCHAR NOT NULL,
 
-    event_id                                BIGINT NOT NULL UNIQUE,
+    event_id                                BIGINT NOT NULL,
     delivery_id                             BIGINT NOT NULL,
+    -- hash of the latest model, copied by --latest_mode DERIVED
+    latest_hash                             VARCHAR,
 
-    PRIMARY KEY(portfolio_id, asset_id, position_ts)
-);
+    PRIMARY KEY(portfolio_id, asset_id, position_ts),
+    -- unique constraints of a partitioned table include the partition key
+    UNIQUE(event_id, position_ts)
+) PARTITION BY RANGE (position_ts);
+
+CREATE INDEX position_delivery_id_idx ON position (delivery_id);
+CREATE INDEX position_position_ts_brin ON position USING BRIN (position_ts);
+
+-- monthly partitions position_pYYYYMM are created and expired by
+-- python -m paper_engine_monitor.maintenance (daily, see README), rows outside
+-- them land here
+CREATE TABLE position_default PARTITION OF position DEFAULT;
+
+-- current month and the 3 premade by maintenance, so rows don't start in the
+-- default partition
+DO $$
+DECLARE
+    m TIMESTAMP := date_trunc('month', now() AT TIME ZONE 'UTC');
+BEGIN
+    FOR i IN 0..3 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF position FOR VALUES FROM (%L) TO (%L);',
+            'position_p' || to_char(m + make_interval(months => i), 'YYYYMM'),
+            m + make_interval(months => i),
+            m + make_interval(months => i + 1)
+        );
+    END LOOP;
+END $$;
@@ -0,0 +1,18 @@
+CREATE TABLE position_rollup
+(
+    portfolio_id                            BIGINT,
+    resolution                              VARCHAR(10),
+    asset_id                                VARCHAR(20),
+    bucket_ts                               TIMESTAMP,
+    asset_id_type                           VARCHAR(20),
+    side                                    VARCHAR(20),
+    wgt                                     DECIMAL(10,4),
+    quantity                                DECIMAL(24,4),
+    notional                                DECIMAL(24,4),
+
+    last_ts                                 TIMESTAMP NOT NULL,
+
+    PRIMARY KEY(portfolio_id, resolution, asset_id, bucket_ts)
+);
+
+CREATE INDEX position_rollup_bucket_idx ON position_rollup (portfolio_id, resolution, bucket_ts);
@@ -25,7 +25,7 @@ import paper_engine_monitor.broker as broker
 import paper_engine_monitor.model as model
 from paper_engine_monitor.model.base import State
 from paper_engine_monitor.model.entity import Entity
-from paper_engine_monitor.persistance import source, target
+from paper_engine_monitor.persistance import mirror, source, target
 import paper_engine_monitor.queries as queries
 from paper_engine_monitor.queries.base import BaseQueries
 import paper_engine_monitor.queries.source_queries as source_queries
@@ -53,6 +53,14 @@ class Loader:
     _dry_run: bool
     _min_sleep: int
     _max_sleep: int
+    _copy_threshold: int
+    _persist_mode: str
+    _mirror: Optional[mirror.LatestMirror]
+    # latest entities derived on the server, with the entity they come from
+    _derived: Dict[Entity, Entity]
+    _rollups: bool
+    _stream: bool
+    _heartbeat: int
 
     _entities: Set[Entity] = {
         Entity.PORTFOLIO,
@@ -61,6 +69,26 @@ class Loader:
         Entity.POSITION,
         Entity.POSITION_LATEST,
     }
+    # entities mirrored in memory with --latest_mirror
+    _latest_entities: Set[Entity] = {
+        Entity.PORTFOLIO_LATEST,
+        Entity.POSITION_LATEST,
+    }
+    # history entity of each latest entity, for --latest_mode DERIVED
+    _latest_sources: Dict[Entity, Entity] = {
+        Entity.PORTFOLIO_LATEST: Entity.PORTFOLIO,
+        Entity.POSITION_LATEST: Entity.POSITION,
+    }
+    # rollups maintained from the history rows of each entity
+    _rollup_queries: Dict[Entity, str] = {
+        Entity.PORTFOLIO: queries.PortfolioRollupQueries.ROLLUP,
+        Entity.POSITION: queries.PositionRollupQueries.ROLLUP,
+    }
+    # entities keyed by the time of the observation, new rows on every run
+    _history_entities: Set[Entity] = {
+        Entity.PORTFOLIO,
+        Entity.POSITION,
+    }
     _queries: Dict[Entity, BaseQueries] = {
         Entity.PORTFOLIO: queries.PortfolioQueries(),
         Entity.PORTFOLIO_LATEST: queries.PortfolioLatestQueries(),
@@ -87,15 +115,32 @@ class Loader:
         self._dry_run = args.dry_run
         self._min_sleep = args.min_sleep
         self._max_sleep = args.max_sleep
+        self._copy_threshold = args.copy_threshold
+        self._persist_mode = args.persist_mode
+        self._derived = {}
+        if args.latest_mode == "DERIVED":
+            self._derived = dict(self._latest_sources)
+        self._rollups = args.rollups
+        self._stream = args.stream
+        self._heartbeat = args.heartbeat
+        self._mirror = None
+        if args.latest_mirror and self._derived:
+            logger.warning("Latest tables derived on the server, ignoring mirror.")
+        elif args.latest_mirror:
+            self._mirror = mirror.LatestMirror(
+                self._latest_entities, record_entities=(Entity.PORTFOLIO_LATEST,)
+            )
 
         # prepare persistence FROM
         self._source = source.Source(args.source)
 
         # prepare persistence
-        self._target = target.Target(args.target)
+        self._target = target.Target(args.target, id_block_size=args.id_block_size)
 
         # ALPACA
-        self._broker = broker.Alpaca(args.api_key, args.secret_key)
+        self._broker = broker.Alpaca(
+            args.api_key, args.secret_key, stream_url=args.stream_url
+        )
         self._account_id = hashlib.sha256(
             (args.api_key + args.secret_key).encode("utf-8")
         ).hexdigest()
@@ -126,10 +171,13 @@ class Loader:
         self._target.connect()
 
         # type of execution
-        if args.run_as_service:
+        if args.run_as_service and self._stream:
+            self.run_stream()
+        elif args.run_as_service:
             self.run_service()
         else:
-            self.run_once()
+            with self._broker.snapshot():
+                self.run_once()
 
         self.tear_down()
 
@@ -147,7 +195,9 @@ class Loader:
         continue_watching_folder = True
         while continue_watching_folder:
             try:
-                self.run_once()
+                # account and positions are fetched once per cycle
+                with self._broker.snapshot():
+                    self.run_once()
                 t = secrets.choice(
                     [self._min_sleep, self._max_sleep]
                     + [i for i in range(self._min_sleep, self._max_sleep)]
@@ -159,11 +209,59 @@ class Loader:
 
         logger.info("Terminating...")
 
+    def run_stream(self) -> None:
+        """Runs the application as a continuous process on the trade updates stream.
+
+        A delivery is written from the position book whenever a fill moves it,
+        and from a poll of the broker, which also reconciles the book, every
+        heartbeat seconds (fallback if the stream misses or drops updates) and
+        as soon as a fill executed during the last poll was applied over it.
+        """
+        logger.info(
+            f"Running on the trade updates stream. heartbeat={self._heartbeat}."
+        )
+        self._broker.start_stream()
+
+        last_heartbeat = None
+        stop = False
+        while not stop:
+            try:
+                now = time.monotonic()
+                if (
+                    last_heartbeat is None
+                    or now - last_heartbeat >= self._heartbeat
+                    or self._broker.book.pending
+                ):
+                    last_heartbeat = now
+                    with self._broker.snapshot():
+                        self._broker.reconcile()
+                        self.run_once()
+                    continue
+
+                timeout = last_heartbeat + self._heartbeat - now
+                if self._broker.book.wait_change(timeout):
+                    self.run_once()
+            except Exception as e:
+                logger.warning(f"error while importing: {e}")
+                stop = True
+
+        self._broker.stop_stream()
+        logger.info("Terminating...")
+
     def run_once(self) -> None:
         """Runs the synchronization process once."""
         start_time: datetime = datetime.utcnow()
         end_time: datetime
 
+        if self._mirror:
+            self._mirror.sync(
+                self._target.get_scope_delivery_id(
+                    queries.PortfolioControlQueries.LOAD_DELIVERY_ID,
+                    (self._portfolio_id,),
+                ),
+                scope=self._portfolio_id,
+            )
+
         portfolio_value = self._broker.get_portfolio_value()
         position_records = self.get_position_records(self._portfolio_id, portfolio_value)
         portfolio_records = self.get_portfolio_records(self._portfolio_id)
@@ -173,42 +271,46 @@ class Loader:
                 datetime.utcnow(),
             )
         ]
+        files: Dict[Entity, File] = {
+            Entity.PORTFOLIO: portfolio_records,
+            Entity.PORTFOLIO_LATEST: portfolio_records,
+            Entity.PORTFOLIO_CONTROL: control_records,
+            Entity.POSITION: position_records,
+            Entity.POSITION_LATEST: position_records,
+        }
+
+        # event ids of every entity in one round trip
+        self._target.reserve_event_ids(sum(len(f) for f in files.values()))
+        prev_hashes = self.prefetch_hashes(files)
+
         delivery_id: int = self._target.get_next_delivery_id()
         delivery: Dict = {
-            Entity.PORTFOLIO: self.process(
-                delivery_id=delivery_id,
-                entity=Entity.PORTFOLIO,
-                file=portfolio_records
-            ),
-            Entity.PORTFOLIO_LATEST: self.process(
-                delivery_id=delivery_id,
-                entity=Entity.PORTFOLIO_LATEST,
-                file=portfolio_records,
-            ),
-            Entity.PORTFOLIO_CONTROL: self.process(
-                delivery_id=delivery_id,
-                entity=Entity.PORTFOLIO_CONTROL,
-                file=control_records,
-            ),
-            Entity.POSITION: self.process(
+            entity: self.process(
                 delivery_id=delivery_id,
-                entity=Entity.POSITION,
-                file=position_records
-            ),
-            Entity.POSITION_LATEST: self.process(
-                delivery_id=delivery_id,
-                entity=Entity.POSITION_LATEST,
-                file=position_records,
-            ),
+                entity=entity,
+                file=file,
+                prev_hashes=prev_hashes[entity],
+            )
+            for entity, file in files.items()
         }
 
         # persist delivery
-        if not self._dry_run:
-            self.persist_delivery(
-                delivery_id=delivery_id,
-                start_time=start_time,
-                delivery=delivery,
-            )
+        if not self.has_changes(delivery) and self.advance_watermark(delivery):
+            logger.info(f"Delivery {delivery_id}: no changes, watermark advanced.")
+        elif not self._dry_run:
+            try:
+                self.persist_delivery(
+                    delivery_id=delivery_id,
+                    start_time=start_time,
+                    delivery=delivery,
+                )
+            except Exception:
+                self._target.rollback_transaction()
+                if self._mirror:
+                    self._mirror.invalidate()
+                raise
+            if self._mirror:
+                self._mirror.apply(delivery_id, delivery)
 
         del delivery
 
@@ -240,15 +342,24 @@ class Loader:
         return res
 
     def get_prev_portfolio(self, portfolio_id: int) -> Optional[model.PortfolioLatest]:
-        """Get previous state of the portfolio."""
-        db_response = self._target.get_current_state(
-            queries.PortfolioLatestQueries.LOAD_STATE, [(portfolio_id,)]
-        )
-        if not db_response:
-            return None
-        portfolio_record = db_response[0]
-        portfolio_obj = model.PortfolioLatest.from_target(portfolio_record)
-        return portfolio_obj
+        """Get previous state of the portfolio.
+
+        With --latest_mirror, the stored row is read once and then served
+        from the mirror.
+        """
+        stored = self._mirror.records(Entity.PORTFOLIO_LATEST) if self._mirror else None
+        if stored is None:
+            db_response = self._target.get_current_state(
+                queries.PortfolioLatestQueries.LOAD_STATE, [(portfolio_id,)]
+            )
+            stored = {
+                r.key: r for r in map(model.PortfolioLatest.from_target, db_response)
+            }
+            if self._mirror:
+                self._mirror.load_records(Entity.PORTFOLIO_LATEST, stored.values())
+        portfolio_obj = stored.get((portfolio_id,))
+        # mirrored rows are the ones written, rounded as the target stores them
+        return portfolio_obj.rounded() if portfolio_obj else None
 
     def get_portfolio_records(self, portfolio_id: int) -> File:
         """Get portfolio records."""
@@ -332,13 +443,67 @@ class Loader:
         """Compute cumulative return."""
         return (1 + prev_cum_rtn) * (1 + rtn) - 1
 
-    def process(self, delivery_id: int, entity: Entity, file: File) -> Dict:
+    def prefetch_hashes(
+        self, files: Dict[Entity, File]
+    ) -> Dict[Entity, Dict[Key, str]]:
+        """Gets the stored hashes of the previous state of a delivery.
+
+        One query for all the entities, returning key tuples and hashes
+        without building the state objects. With --latest_mirror, the latest
+        entities are read once and then served from memory.
+
+        Args:
+            files: Records of each entity of the delivery.
+
+        Returns:
+            By entity, the stored hash of each key.
+        """
+        mirrored: Dict[Entity, Dict[Key, str]] = {}
+        if self._mirror:
+            # synced at the start of the cycle (see run_once)
+            mirrored = {
+                e: self._mirror.hashes(e) for e in files if self._mirror.holds(e)
+            }
+
+        queries: Dict[Entity, Tuple[str, str, Tuple[str, ...], Optional[Keys]]] = {}
+        for entity, file in files.items():
+            if entity in mirrored:
+                continue
+            query: BaseQueries = self._queries[entity]
+            if entity == Entity.POSITION_LATEST:
+                queries[entity] = (
+                    query.LOAD_PORTFOLIO_HASHES,
+                    query.TABLE,
+                    query.KEY,
+                    [(self._portfolio_id,)],
+                )
+            else:
+                keys = self._state[entity].list_ids_from_source(records=file)
+                queries[entity] = (query.load_hashes(), query.TABLE, query.KEY, keys)
+
+        res = self._target.get_current_hashes(queries)
+        if self._mirror:
+            for entity, hashes in res.items():
+                self._mirror.load(entity, hashes)
+        res.update(mirrored)
+
+        return res
+
+    def process(
+        self,
+        delivery_id: int,
+        entity: Entity,
+        file: File,
+        prev_hashes: Dict[Key, str],
+    ) -> Dict:
         """Processes entity records present in delivery.
 
         Args:
             delivery_id: Delivery id.
             entity: Entity type.
             file: Entity records.
+            prev_hashes: Stored hash by key of the previous state of the
+                entity (see prefetch_hashes).
 
         Returns:
             A dictionary with EventType (CREATE, AMEND, REMOVE) as key and a list
@@ -346,38 +511,91 @@ class Loader:
         """
         logger.info(f"Delivery {delivery_id}: processing {entity}...")
 
-        query: BaseQueries = self._queries[entity]
         state_type: Type[State] = self._state[entity]
+        prev_keys: List[Key] = list(prev_hashes.keys())
 
-        # previous state
-        keys: Keys = state_type.list_ids_from_source(records=file)
-        # fetch records from state with keys
-        if entity in [Entity.POSITION_LATEST]:
-            prev_state: List[Tuple] = self._target.get_current_state(
-                query=query.LOAD_FULL_STATE, args=[(self._portfolio_id,)]
-            )
-        else:
-            prev_state: List[Tuple] = self._target.get_current_state(
-                query=query.LOAD_STATE, args=keys
-            )
-        prev_keys: List[Key] = [state_type.from_target(record=r).key for r in prev_state]
-
-        # current state
+        # current state, unchanged records are not written again
         curr_records: List[State] = [
             state_type.from_source(record=record) for record in file
         ]
-        it_event_id = self._target.get_next_event_id(n=len(curr_records))
-        for r, event_id in zip(curr_records, it_event_id):
-            r.event_id = event_id
+        curr_keys: List[Key] = [r.key for r in curr_records]
+        for latest_entity, source_entity in self._derived.items():
+            if source_entity == entity:
+                # the server derives the latest rows from these, with the hash
+                # of the latest model (see BaseQueries.derive)
+                latest_type: Type[State] = self._state[latest_entity]
+                for r, record in zip(curr_records, file):
+                    r.latest_hash = latest_type.from_source(record=record).hash
+        n_records = len(curr_records)
+        curr_records = [r for r in curr_records if prev_hashes.get(r.key) != r.hash]
+        if len(curr_records) < n_records:
+            logger.info(
+                f"Delivery {delivery_id}: {n_records - len(curr_records)} unchanged "
+                f"{entity} records suppressed."
+            )
+
+        # derived records keep the event id of their history row
+        n_ids = 0 if entity in self._derived else len(curr_records)
+        it_event_id = self._target.get_next_event_id(n=n_ids)
+        for r in curr_records:
+            r.event_id = next(it_event_id, None)
             r.delivery_id = delivery_id
 
-        curr_keys: List[Key] = [r.key for r in curr_records]
         keys_to_remove: List[Key] = list(set(prev_keys) - set(curr_keys))
 
         del file
 
         return {"records": curr_records, "keys_to_remove": keys_to_remove}
 
+    def has_changes(self, delivery: Dict) -> bool:
+        """Checks if a delivery changes anything besides its watermarks.
+
+        The control record and the history rows move on every run, they only
+        count along with a change of the other entities (see advance_watermark).
+        """
+        return any(
+            content["records"] or content["keys_to_remove"]
+            for entity, content in delivery.items()
+            if entity not in self._history_entities
+            and entity != Entity.PORTFOLIO_CONTROL
+        )
+
+    def advance_watermark(self, delivery: Dict) -> bool:
+        """Moves the control watermark of a delivery without persisting it.
+
+        A single row update of the stored control record, which keeps the event
+        and delivery ids of the last delivery persisted.
+
+        Args:
+            delivery: Delivery without changes (see has_changes).
+
+        Returns:
+            False if there is no control record to update yet, the delivery
+            has to be persisted.
+        """
+        if self._dry_run:
+            return True
+
+        for r in delivery[Entity.PORTFOLIO_CONTROL]["records"]:
+            try:
+                self._target.begin_transaction()
+                n_rows = self._target.execute_query(
+                    queries.PortfolioControlQueries.ADVANCE,
+                    {
+                        "portfolio_id": r.portfolio_id,
+                        "last_monitor_ts": r.last_monitor_ts,
+                        "hash": r.hash,
+                    },
+                )
+                self._target.commit_transaction()
+            except Exception:
+                self._target.rollback_transaction()
+                raise
+            if not n_rows:
+                return False
+
+        return True
+
     def persist_delivery(
         self,
         delivery_id: int,
@@ -391,14 +609,20 @@ class Loader:
             start_time: Time delivery started.
             delivery: Delivery to process.
         """
+        if self._persist_mode == "FUNCTION":
+            self.persist_function(delivery_id, start_time, delivery)
+            return
+
         self._target.begin_transaction()
 
         for entity, content in delivery.items():
             self.persist_postgres(
                 entity=entity,
-                records=content["records"],
+                records=[] if entity in self._derived else content["records"],
                 keys_to_remove=content["keys_to_remove"]
             )
+        self.derive_latest(delivery_id, delivery)
+        self.update_rollups(delivery_id, delivery)
 
         end_time: datetime = datetime.utcnow()
         self._target.persist_delivery(
@@ -412,6 +636,110 @@ class Loader:
         self._target.commit_transaction()
         logger.info(f"Delivery {delivery_id}: persisted to postgres.")
 
+    def persist_function(
+        self,
+        delivery_id: int,
+        start_time: datetime,
+        delivery: Dict,
+    ) -> None:
+        """Persists a delivery in a single call to a server-side function.
+
+        Args:
+            delivery_id: Delivery id.
+            start_time: Time delivery started.
+            delivery: Delivery to process.
+        """
+        entities = []
+        for entity, content in delivery.items():
+            query: BaseQueries = self._queries[entity]
+            records = []
+            for r in [] if entity in self._derived else content["records"]:
+                record = dict(zip(query.COLUMNS, r.as_tuple()))
+                for column in query.JSON_COLUMNS:
+                    if record[column] is not None:
+                        record[column] = json.loads(record[column])
+                records.append(record)
+            entities.append(
+                {
+                    "table": query.TABLE,
+                    "key": query.KEY,
+                    "columns": query.COLUMNS,
+                    "records": records,
+                    "keys_to_remove": [
+                        dict(zip(query.KEY, k)) for k in content["keys_to_remove"]
+                    ],
+                }
+            )
+
+        runtime = datetime.utcnow() - start_time
+        self._target.begin_transaction()
+        self._target.persist_delivery_payload(
+            {
+                "entities": entities,
+                "delivery": {
+                    "delivery_id": delivery_id,
+                    "delivery_ts": datetime.utcnow(),
+                    "runtime": f"{runtime.total_seconds()} seconds",
+                },
+            }
+        )
+        self.derive_latest(delivery_id, delivery)
+        self.update_rollups(delivery_id, delivery)
+        self._target.commit_transaction()
+        logger.info(f"Delivery {delivery_id}: persisted to postgres (function).")
+
+    def derive_latest(self, delivery_id: int, delivery: Dict) -> None:
+        """Upserts the derived latest tables from the history rows of a delivery.
+
+        Runs in the transaction of the delivery, after its history rows.
+
+        Args:
+            delivery_id: Delivery id.
+            delivery: Delivery being persisted.
+        """
+        for entity, source_entity in self._derived.items():
+            if entity not in delivery or not delivery[entity]["records"]:
+                continue
+            query: BaseQueries = self._queries[entity]
+            source_query: BaseQueries = self._queries[source_entity]
+            n_rows = self._target.execute_query(
+                query.derive(source_query.TABLE), {"delivery_id": delivery_id}
+            )
+            logger.debug(f"Delivery {delivery_id}: {n_rows} {entity} rows derived.")
+
+    def update_rollups(self, delivery_id: int, delivery: Dict) -> None:
+        """Folds the portfolio and position rows of a delivery into the rollups.
+
+        Positions that left the portfolio (removed from position_latest) close
+        their buckets with a zero row. Runs in the transaction of the delivery,
+        after its history rows.
+
+        Args:
+            delivery_id: Delivery id.
+            delivery: Delivery being persisted.
+        """
+        if not self._rollups:
+            return
+
+        for entity, query in self._rollup_queries.items():
+            if entity not in delivery or not delivery[entity]["records"]:
+                continue
+            n_rows = self._target.execute_query(query, {"delivery_id": delivery_id})
+            logger.debug(f"Delivery {delivery_id}: {n_rows} {entity} rollups updated.")
+
+        closed = [
+            asset_id
+            for _, asset_id in delivery.get(Entity.POSITION_LATEST, {}).get(
+                "keys_to_remove", []
+            )
+        ]
+        if closed:
+            n_rows = self._target.execute_query(
+                queries.PositionRollupQueries.CLOSE,
+                {"delivery_id": delivery_id, "asset_ids": closed},
+            )
+            logger.debug(f"Delivery {delivery_id}: {n_rows} position rollups closed.")
+
     def persist_postgres(self, entity: Entity, records: List[State], keys_to_remove: Keys) -> None:
         """Persists records of entity to postgres.
 
@@ -422,28 +750,41 @@ class Loader:
         """
         query: BaseQueries = self._queries[entity]
 
-        # if multiple instructions have the same primary key
-        # db instructions can't be in batch
-        batch_records = len(set(r.key for r in records)) == len(records)
+        # an upsert batch can't hold the same primary key twice, only the last
+        # write of each key is kept
+        n_records = len(records)
+        records = State.last_writes(records)
+        if len(records) < n_records:
+            logger.debug(
+                f"{entity}: {n_records - len(records)} overwritten records dropped."
+            )
 
         # PERSIST RECORDS
-        if batch_records:
+        if len(records) >= self._copy_threshold:
+            self._target.copy_upsert(
+                table=query.TABLE,
+                columns=query.COLUMNS,
+                key=query.KEY,
+                logs=[r.as_tuple() for r in records],
+            )
+        else:
             self._target.execute(
                 instruction=query.UPSERT,
                 logs=[r.as_tuple() for r in records],
             )
-        else:
-            for r in records:
-                self._target.execute(
-                    instruction=query.UPSERT,
-                    logs=[r.as_tuple()],
-                )
 
         # REMOVE
-        self._target.execute(
-            instruction=query.DELETE,
-            logs=[k for k in keys_to_remove],
-        )
+        if len(keys_to_remove) >= self._copy_threshold:
+            self._target.copy_delete(
+                table=query.TABLE,
+                key=query.KEY,
+                keys_to_remove=list(keys_to_remove),
+            )
+        else:
+            self._target.execute(
+                instruction=query.DELETE,
+                logs=[k for k in keys_to_remove],
+            )
 
 
 def parse_args() -> argparse.Namespace:
@@ -562,6 +903,117 @@ def parse_args() -> argparse.Namespace:
         help="Secret key.",
     )
 
+    parser.add_argument(
+        "--copy_threshold",
+        dest="copy_threshold",
+        default=int(os.getenv("COPY_THRESHOLD", "1000")),
+        type=int,
+        required=False,
+        help="Records from which an entity is persisted with COPY into a staging table.",
+    )
+
+    parser.add_argument(
+        "--id_block_size",
+        dest="id_block_size",
+        default=int(os.getenv("ID_BLOCK_SIZE", "1")),
+        type=int,
+        required=False,
+        help="Delivery and event ids reserved per round trip.",
+    )
+
+    parser.add_argument(
+        "--persist_mode",
+        dest="persist_mode",
+        default=os.getenv("PERSIST_MODE", "STATEMENTS"),
+        choices=["STATEMENTS", "FUNCTION"],
+        type=str,
+        required=False,
+        help="Persist a delivery with one statement per entity (STATEMENTS) "
+        "or in one call to persist_delivery_monitor (FUNCTION).",
+    )
+
+    parser.add_argument(
+        "--latest_mirror",
+        dest="latest_mirror",
+        action="store_true",
+        required=False,
+        help=(
+            "Keep the latest tables in memory, read again only on rollback or when"
+            " another writer moved them."
+        ),
+    )
+    parser.add_argument(
+        "--no-latest_mirror",
+        dest="latest_mirror",
+        action="store_false",
+        required=False,
+        help="Read the latest tables every cycle (default).",
+    )
+    parser.set_defaults(
+        latest_mirror=ast.literal_eval(os.environ.get("LATEST_MIRROR", "False"))
+    )
+
+    parser.add_argument(
+        "--latest_mode",
+        dest="latest_mode",
+        default=os.getenv("LATEST_MODE", "CLIENT"),
+        choices=["CLIENT", "DERIVED"],
+        type=str,
+        required=False,
+        help="Latest tables written by the loader (CLIENT) "
+        "or merged on the server from the history rows of the delivery (DERIVED).",
+    )
+
+    parser.add_argument(
+        "--rollups",
+        dest="rollups",
+        action="store_true",
+        required=False,
+        help="Maintain the 1m/1h/1d portfolio and position rollups.",
+    )
+    parser.add_argument(
+        "--no-rollups",
+        dest="rollups",
+        action="store_false",
+        required=False,
+        help="Do not maintain the rollups (default).",
+    )
+    parser.set_defaults(rollups=ast.literal_eval(os.environ.get("ROLLUPS", "False")))
+
+    parser.add_argument(
+        "--stream",
+        dest="stream",
+        action="store_true",
+        required=False,
+        help="Write on the trade updates stream, polling only every heartbeat.",
+    )
+    parser.add_argument(
+        "--no-stream",
+        dest="stream",
+        action="store_false",
+        required=False,
+        help="Poll the broker every cycle (default).",
+    )
+    parser.set_defaults(stream=ast.literal_eval(os.environ.get("STREAM", "False")))
+
+    parser.add_argument(
+        "--heartbeat",
+        dest="heartbeat",
+        default=int(os.getenv("HEARTBEAT", "300")),
+        type=int,
+        required=False,
+        help="Seconds between polls of the broker when on the stream.",
+    )
+
+    parser.add_argument(
+        "--stream_url",
+        dest="stream_url",
+        type=str,
+        required=False,
+        default=os.environ.get("STREAM_URL"),
+        help="Trade updates stream URL override (e.g. a local stand-in server).",
+    )
+
     a = parser.parse_args()
 
     return a
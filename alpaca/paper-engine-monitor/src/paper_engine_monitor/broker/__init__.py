@@ -1,6 +1,7 @@
 """Broker connection implementation."""
 
 from .alpaca import Alpaca
+from .book import PositionBook
 
 
-__all__ = ["Alpaca"]
+__all__ = ["Alpaca", "PositionBook"]
@@ -1,34 +1,185 @@
 """Alpaca connection."""
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from decimal import Decimal
 import logging
-from typing import Dict, List
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from alpaca.data.historical import StockHistoricalDataClient
 from alpaca.trading.client import TradingClient
-from alpaca.trading.models import Position, TradeAccount
+from alpaca.trading.models import Position, TradeAccount, TradeUpdate
 from alpaca.trading.stream import TradingStream
 
 from paper_engine_monitor.broker.base import Broker
+from paper_engine_monitor.broker.book import PositionBook
 
 logger = logging.getLogger(__name__)
 
 
+class BrokerSnapshot(object):
+    """Account and positions of the broker, fetched together.
+
+    Both are requested concurrently the first time either is needed and then
+    served as is, so the figures of a cycle come from the same instant.
+    """
+
+    _account: Optional[TradeAccount]
+    _positions: Optional[List[Position]]
+    # start and end (UTC) of the fetch
+    polled: Optional[Tuple[datetime, datetime]]
+
+    def __init__(self, trading_client: TradingClient) -> None:
+        """Broker snapshot.
+
+        Args:
+            trading_client: Trading client the snapshot is fetched with.
+        """
+        self._trading_client = trading_client
+        self._account = None
+        self._positions = None
+        self.polled = None
+
+    def fetch(self) -> None:
+        """Fetches the account and the positions concurrently (once)."""
+        if self._account is not None:
+            return
+        started = datetime.now(timezone.utc)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            account = executor.submit(self._trading_client.get_account)
+            positions = executor.submit(self._trading_client.get_all_positions)
+            self._account, self._positions = account.result(), positions.result()
+        self.polled = (started, datetime.now(timezone.utc))
+
+    def refresh(self) -> None:
+        """Drops the fetched account and positions, fetched again on next use."""
+        self._account = None
+        self._positions = None
+        self.polled = None
+
+    @property
+    def account(self) -> TradeAccount:
+        """Trading account."""
+        self.fetch()
+        return self._account
+
+    @property
+    def positions(self) -> List[Position]:
+        """All open positions."""
+        self.fetch()
+        return self._positions
+
+
 class Alpaca(Broker):
     """Alpaca connection class."""
 
     latest_order = None
     positions: List[Position]
+    _snapshot: Optional[BrokerSnapshot] = None
+    # kept from the trade updates stream once started
+    book: Optional[PositionBook] = None
+    _stream_thread: Optional[threading.Thread] = None
 
-    def __init__(self, api_key: str, secret_key: str) -> None:
+    def __init__(
+        self, api_key: str, secret_key: str, stream_url: Optional[str] = None
+    ) -> None:
         self.trading_client = TradingClient(api_key, secret_key, paper=True)
-        self.trading_stream = TradingStream(api_key, secret_key, paper=True)
+        self.trading_stream = TradingStream(
+            api_key, secret_key, paper=True, url_override=stream_url
+        )
 
         self.data_client = StockHistoricalDataClient(api_key, secret_key)
 
+    @contextmanager
+    def snapshot(self) -> Iterator[BrokerSnapshot]:
+        """Scope (e.g. a loader cycle) sharing one snapshot of the broker.
+
+        Account and positions reads inside the scope are served from a single
+        snapshot, fetched on first use. Nested scopes reuse the outer one.
+        """
+        if self._snapshot is not None:
+            yield self._snapshot
+            return
+        self._snapshot = BrokerSnapshot(self.trading_client)
+        try:
+            yield self._snapshot
+        finally:
+            self._snapshot = None
+
+    def get_account(self) -> TradeAccount:
+        """Get trading account, from the snapshot inside a snapshot scope."""
+        if self._snapshot is not None:
+            return self._snapshot.account
+        return self.trading_client.get_account()
+
+    def get_broker_positions(self) -> List[Position]:
+        """Get all open positions, from the snapshot inside a snapshot scope."""
+        if self._snapshot is not None:
+            return self._snapshot.positions
+        return self.trading_client.get_all_positions()
+
+    def start_stream(self) -> None:
+        """Keeps the position book from the trade updates stream.
+
+        The stream runs in a daemon thread and reconnects by itself, the book
+        is served outside snapshot scopes once reconciled (see reconcile).
+        """
+        self.book = PositionBook()
+        self.trading_stream.subscribe_trade_updates(self._on_trade_update)
+        self._stream_thread = threading.Thread(
+            target=self.trading_stream.run, name="trading-stream", daemon=True
+        )
+        self._stream_thread.start()
+
+    def stop_stream(self) -> None:
+        """Stops the trade updates stream."""
+        if self._stream_thread is not None and self._stream_thread.is_alive():
+            self.trading_stream.stop()
+            self._stream_thread.join(timeout=10)
+        self._stream_thread = None
+
+    async def _on_trade_update(self, update: TradeUpdate) -> None:
+        """Trade updates stream handler."""
+        if self.book.apply(update):
+            logger.debug(
+                f"{update.event} {update.order.symbol}: position {update.position_qty}."
+            )
+
+    def reconcile(self, attempts: int = 3) -> bool:
+        """Reconciles the position book with the account and positions.
+
+        A poll overlapped by a fill is retried at once, with a fresh snapshot
+        (also the one of the enclosing snapshot scope).
+
+        Args:
+            attempts: Polls before giving up until the next reconciliation.
+
+        Returns:
+            True if the book was reconciled.
+        """
+        with self.snapshot() as snapshot:
+            for attempt in range(attempts):
+                version = self.book.version
+                if attempt:
+                    logger.info("Fills during the poll, polling again.")
+                    snapshot.refresh()
+                account, positions = snapshot.account, snapshot.positions
+                if self.book.reconcile(account, positions, version, snapshot.polled):
+                    return True
+        logger.warning("Fills during every poll, position book not reconciled.")
+        return False
+
+    def from_book(self) -> bool:
+        """Checks if reads are served from the position book."""
+        return self._snapshot is None and self.book is not None and self.book.reconciled
+
     def get_portfolio_value(self, side: str = "ALL") -> Decimal:
         """Get portfolio value."""
-        account: TradeAccount = self.trading_client.get_account()
+        if self.from_book():
+            return self.book.portfolio_value(side)
+        account: TradeAccount = self.get_account()
         if side == "LONG":
             return Decimal(account.long_market_value)
         elif side == "SHORT":
@@ -38,7 +189,9 @@ class Alpaca(Broker):
 
     def get_all_positions(self) -> Dict:
         """Get ticker: quantity dict."""
-        self.positions = self.trading_client.get_all_positions()
+        if self.from_book():
+            return self.book.positions()
+        self.positions = self.get_broker_positions()
         res = {
             p.symbol: {
                 "quantity": p.qty,
@@ -50,5 +203,7 @@ class Alpaca(Broker):
         return res
 
     def get_cash_value(self):
-        account_cash = Decimal(self.trading_client.get_account().cash)
+        if self.from_book():
+            return self.book.cash_value()
+        account_cash = Decimal(self.get_account().cash)
         return account_cash
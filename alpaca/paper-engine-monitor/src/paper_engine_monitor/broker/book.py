@@ -0,0 +1,166 @@
+"""In-memory positions and account book."""
+
+from datetime import datetime
+from decimal import Decimal
+import threading
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from alpaca.trading.enums import OrderSide, PositionSide, TradeEvent
+from alpaca.trading.models import Position, TradeAccount, TradeUpdate
+
+
+class PositionBook(object):
+    """Positions and cash of the account, kept up to date by trade updates.
+
+    Reconciled with the polled account and positions, then moved by the fills
+    of the trade updates stream in between. Fills mark the position of their
+    symbol at the fill price, market moves of the other positions are only
+    picked up by the next reconciliation.
+
+    Every applied fill bumps the version: a poll started before a fill is not
+    reconciled over it (see reconcile). Fills executed before the poll are
+    already in the polled positions and redelivered fills were already
+    applied, neither moves the cash twice (see apply).
+    """
+
+    _positions: Dict[str, Dict]
+    _cash: Decimal
+    # start and end of the reconciled poll
+    _polled: Optional[Tuple[datetime, datetime]]
+    # time of the fills applied since the poll, by execution id
+    _executions: Dict[UUID, datetime]
+    version: int
+
+    def __init__(self) -> None:
+        """Position book."""
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._positions = {}
+        self._cash = Decimal(0)
+        self._polled = None
+        self._executions = {}
+        self.version = 0
+        self.reconciled = False
+        # a fill executed during the poll was applied over it
+        self.pending = False
+
+    def reconcile(
+        self,
+        account: TradeAccount,
+        positions: List[Position],
+        version: int,
+        polled: Tuple[datetime, datetime],
+    ) -> bool:
+        """Replaces the book with the account and positions of the broker.
+
+        Args:
+            account: Polled account.
+            positions: Polled positions.
+            version: Version of the book when the poll started.
+            polled: Start and end (UTC) of the poll.
+
+        Returns:
+            False if a fill was applied since the poll started, the book is kept
+            (the poll may predate the fill) and the poll is to be retried.
+        """
+        with self._lock:
+            if version != self.version:
+                return False
+            self._polled = polled
+            self._executions = {
+                e: ts for e, ts in self._executions.items() if ts > polled[0]
+            }
+            self.pending = False
+            self._cash = Decimal(account.cash)
+            self._positions = {
+                p.symbol: {
+                    "quantity": p.qty,
+                    "side": p.side,
+                    "notional": Decimal(p.market_value),
+                }
+                for p in positions
+            }
+            self.reconciled = True
+        return True
+
+    def apply(self, update: TradeUpdate) -> bool:
+        """Applies a trade update, only fills move the book.
+
+        A fill executed before the reconciled poll started is skipped, it is
+        in the polled positions. One executed during the poll may or may not
+        be: it is applied and the book marked pending, to be reconciled again.
+        Fill times are the broker's, compared with the local clock.
+
+        Returns:
+            True if the book changed.
+        """
+        if update.event not in (TradeEvent.FILL, TradeEvent.PARTIAL_FILL):
+            return False
+        if update.price is None or update.qty is None or update.position_qty is None:
+            return False
+
+        price = Decimal(str(update.price))
+        fill_notional = Decimal(str(update.qty)) * price
+        position_qty = Decimal(str(update.position_qty))
+        symbol = update.order.symbol
+        ts = update.timestamp
+        with self._lock:
+            if update.execution_id in self._executions:
+                # redelivered
+                return False
+            if self._polled is not None and ts <= self._polled[0]:
+                # already in the book (polled after the fill)
+                return False
+            if self._polled is not None and ts <= self._polled[1]:
+                self.pending = True
+            if update.execution_id is not None:
+                self._executions[update.execution_id] = ts
+            self.version += 1
+            if update.order.side == OrderSide.BUY:
+                self._cash -= fill_notional
+            else:
+                self._cash += fill_notional
+            if position_qty == 0:
+                self._positions.pop(symbol, None)
+            else:
+                side = PositionSide.LONG if position_qty > 0 else PositionSide.SHORT
+                self._positions[symbol] = {
+                    "quantity": str(position_qty),
+                    "side": side,
+                    "notional": position_qty * price,
+                }
+        self._changed.set()
+        return True
+
+    def positions(self) -> Dict:
+        """Get ticker: quantity dict (see Alpaca.get_all_positions)."""
+        with self._lock:
+            return {symbol: dict(p) for symbol, p in self._positions.items()}
+
+    def portfolio_value(self, side: str = "ALL") -> Decimal:
+        """Get portfolio value (see Alpaca.get_portfolio_value)."""
+        with self._lock:
+            notionals = [p["notional"] for p in self._positions.values()]
+            cash = self._cash
+        if side == "LONG":
+            return sum((n for n in notionals if n > 0), Decimal(0))
+        elif side == "SHORT":
+            return -sum((n for n in notionals if n < 0), Decimal(0))
+        else:
+            return cash + sum(notionals, Decimal(0))
+
+    def cash_value(self) -> Decimal:
+        """Get cash value."""
+        with self._lock:
+            return self._cash
+
+    def wait_change(self, timeout: float) -> bool:
+        """Waits for the book to change, consuming the change.
+
+        Returns:
+            True if the book changed, False on timeout.
+        """
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
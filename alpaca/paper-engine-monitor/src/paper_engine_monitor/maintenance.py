@@ -0,0 +1,255 @@
+"""History tables partitions maintenance.
+
+Creates the monthly partitions of the history tables ahead of time, moving
+into them the rows that landed in the default partition, and detaches or drops
+the ones past the retention. Meant to run daily, e.g.:
+
+    python -m paper_engine_monitor.maintenance --premake 3 --retention 24
+"""
+
+import argparse
+import ast
+from datetime import date, datetime
+import logging
+import os
+import re
+from sys import stdout
+from typing import Dict, List, Optional
+
+import psycopg2
+
+from paper_engine_monitor.persistance import target
+
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s [%(filename)s:%(lineno)d] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    stream=stdout,
+)
+logger = logging.getLogger(__name__)
+
+# partitioned table -> partition column (see db/)
+PARTITIONED: Dict[str, str] = {
+    "portfolio": "portfolio_ts",
+    "position": "position_ts",
+}
+
+LIST_PARTITIONS = (
+    "SELECT c.relname "
+    "FROM pg_inherits i "
+    "JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = %s::REGCLASS;"
+)
+
+DEFAULT_HAS_ROWS = (
+    "SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {column} >= %s AND {column} < %s);"  # noqa: B950
+)
+
+
+def add_months(d: date, n: int) -> date:
+    """First day of the month n months after the month of d."""
+    months = d.year * 12 + d.month - 1 + n
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Name of the partition of a month, {table}_pYYYYMM."""
+    return f"{table}_p{month:%Y%m}"
+
+
+def partition_month(table: str, name: str) -> Optional[date]:
+    """Month of a partition from its name, None if not a monthly partition."""
+    match = re.fullmatch(rf"{re.escape(table)}_p(\d{{4}})(\d{{2}})", name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+class Maintenance:
+    """Partitions maintenance main class."""
+
+    _target: target.Target
+    _premake: int
+    _retention: Optional[int]
+    _drop: bool
+
+    def setup(self, args: argparse.Namespace) -> None:
+        """Prepares maintenance components.
+
+        Args:
+            args: Variables given by user when starting maintenance process.
+        """
+        self._target = target.Target(args.target)
+        self._premake = args.premake
+        self._retention = args.retention
+        self._drop = args.drop
+
+    def run(self, args: argparse.Namespace) -> None:
+        """Maintains the partitions of every history table once."""
+        self.setup(args=args)
+        self._target.connect()
+
+        month = datetime.utcnow().date().replace(day=1)
+        for table in PARTITIONED:
+            self.create_partitions(table, month)
+            if self._retention is not None:
+                self.expire_partitions(table, add_months(month, -self._retention))
+
+        self._target.disconnect()
+
+    def list_partitions(self, table: str) -> Dict[date, str]:
+        """Gets the monthly partitions of a table, by month."""
+        cursor = self._target.cursor
+        cursor.execute(LIST_PARTITIONS, (table,))
+        res = {}
+        for (name,) in cursor.fetchall():
+            month = partition_month(table, name)
+            if month:
+                res[month] = name
+        return res
+
+    def create_partitions(self, table: str, month: date) -> None:
+        """Creates the missing partitions from month to premake months ahead.
+
+        Args:
+            table: Partitioned table.
+            month: First month to cover.
+        """
+        existing = self.list_partitions(table)
+        for n in range(self._premake + 1):
+            start = add_months(month, n)
+            if start in existing:
+                continue
+            self.create_partition(table, start)
+
+    def create_partition(self, table: str, start: date) -> None:
+        """Creates the partition of a month.
+
+        A partition can't be created while the default partition holds rows of
+        its range, in that case the default partition is detached, the rows are
+        moved into the new partition and it is attached back, in one
+        transaction.
+
+        Args:
+            table: Partitioned table.
+            start: First day of the month.
+        """
+        name = partition_name(table, start)
+        end = add_months(start, 1)
+        column = PARTITIONED[table]
+        statement = (
+            f"CREATE TABLE {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}');"
+        )
+
+        cursor = self._target.cursor
+        cursor.execute(
+            DEFAULT_HAS_ROWS.format(table=table, column=column), (start, end)
+        )
+        if not cursor.fetchone()[0]:
+            self.execute(statement, f"{name} created")
+            return
+
+        in_range = f"WHERE {column} >= '{start}' AND {column} < '{end}'"
+        self.execute(
+            f"ALTER TABLE {table} DETACH PARTITION {table}_default; "
+            f"{statement} "
+            f"INSERT INTO {name} SELECT * FROM {table}_default {in_range}; "
+            f"DELETE FROM {table}_default {in_range}; "
+            f"ALTER TABLE {table} ATTACH PARTITION {table}_default DEFAULT;",
+            f"{name} created, rows moved from {table}_default",
+        )
+
+    def expire_partitions(self, table: str, cutoff: date) -> None:
+        """Detaches (or drops) the partitions of the months before cutoff.
+
+        Args:
+            table: Partitioned table.
+            cutoff: First month kept.
+        """
+        partitions = self.list_partitions(table)
+        expired: List[str] = [
+            name for month, name in sorted(partitions.items()) if month < cutoff
+        ]
+        for name in expired:
+            detached = self.execute(
+                f"ALTER TABLE {table} DETACH PARTITION {name};", f"{name} detached"
+            )
+            if detached and self._drop:
+                self.execute(f"DROP TABLE {name};", f"{name} dropped")
+
+    def execute(self, statement: str, message: str) -> bool:
+        """Runs DDL statements in their own transaction, logging failures."""
+        self._target.begin_transaction()
+        try:
+            self._target.execute_query(statement, {})
+            self._target.commit_transaction()
+        except psycopg2.Error as e:
+            self._target.rollback_transaction()
+            logger.warning(f"{statement} failed: {e}")
+            return False
+
+        logger.info(f"{message}.")
+        return True
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses user input arguments when starting maintenance process."""
+    parser = argparse.ArgumentParser(
+        prog="python -m paper_engine_monitor.maintenance"
+    )
+
+    parser.add_argument(
+        "--target",
+        dest="target",
+        type=str,
+        required=False,
+        default=os.environ.get("TARGET"),
+        help="Postgres connection URL. e.g.: "
+        "user=username password=password host=localhost port=5432 dbname=paper_engine",
+    )
+
+    parser.add_argument(
+        "--premake",
+        dest="premake",
+        default=int(os.getenv("PARTITION_PREMAKE", "3")),
+        type=int,
+        required=False,
+        help="Monthly partitions created ahead of the current month.",
+    )
+
+    parser.add_argument(
+        "--retention",
+        dest="retention",
+        default=ast.literal_eval(os.getenv("PARTITION_RETENTION", "None")),
+        type=int,
+        required=False,
+        help="Months of history kept, older partitions are detached (kept if not set).",
+    )
+
+    parser.add_argument(
+        "--drop",
+        dest="drop",
+        action="store_true",
+        required=False,
+        help="Drop expired partitions.",
+    )
+    parser.add_argument(
+        "--no-drop",
+        dest="drop",
+        action="store_false",
+        required=False,
+        help="Only detach expired partitions (default).",
+    )
+    parser.set_defaults(
+        drop=ast.literal_eval(os.environ.get("PARTITION_DROP", "False"))
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    parsed_args = parse_args()
+
+    maintenance = Maintenance()
+    maintenance.run(parsed_args)
@@ -1,7 +1,7 @@
 """Base data model."""
 
 from abc import ABC, abstractmethod
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from paper_engine_monitor._types import Key, Keys, Record
 
@@ -45,3 +45,16 @@ class State(ABC):
     @abstractmethod
     def as_tuple(self) -> Tuple:
         """Returns object values as a tuple."""
+
+    @staticmethod
+    def last_writes(records: List["State"]) -> List["State"]:
+        """Collapses records sharing a key into the one with the highest event id.
+
+        Keeps the order in which keys first appear.
+        """
+        last: Dict[Key, "State"] = {}
+        for r in records:
+            prev = last.get(r.key)
+            if prev is None or r.event_id >= prev.event_id:
+                last[r.key] = r
+        return list(last.values())
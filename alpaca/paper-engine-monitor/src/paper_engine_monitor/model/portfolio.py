@@ -28,6 +28,8 @@ class Portfolio(State):
     short_cum_rtn: Optional[Decimal]
     rtn: Optional[Decimal]
     cum_rtn: Optional[Decimal]
+    # hash of the latest model, copied by --latest_mode DERIVED
+    latest_hash: Optional[str] = None
 
     @property
     def hash(self) -> str:
@@ -97,6 +99,7 @@ class Portfolio(State):
         _ = record[13]  # hash
         res.event_id = record[14]
         res.delivery_id = record[15]
+        res.latest_hash = record[16]
 
         return res
 
@@ -134,4 +137,5 @@ class Portfolio(State):
             self.hash,
             self.event_id,
             self.delivery_id,
+            self.latest_hash,
         )
@@ -1,7 +1,8 @@
 """Portfolio Latest data model."""
 
+import copy
 from datetime import datetime
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 from hashlib import sha256
 import logging
 from typing import List, Optional, Tuple
@@ -11,6 +12,9 @@ from paper_engine_monitor.model.base import State
 
 logger = logging.getLogger(__name__)
 
+# scale of the DECIMAL columns of portfolio_latest
+SCALE = Decimal("0.0001")
+
 
 class PortfolioLatest(State):
     """Portfolio Latest state."""
@@ -31,10 +35,9 @@ class PortfolioLatest(State):
 
     @property
     def hash(self) -> str:
-        """Object sha256 hash value."""
+        """Object sha256 hash value (observation timestamp excluded)."""
         res = (
             f"{self.portfolio_id}, "
-            f"{self.portfolio_ts}, "
             f"{self.long_notional}, "
             f"{self.short_notional}, "
             f"{self.notional}, "
@@ -117,6 +120,28 @@ class PortfolioLatest(State):
         """Creates a list with all entity keys from source file."""
         return [(r[0],) for r in records]
 
+    def rounded(self) -> "PortfolioLatest":
+        """Copy with the values rounded as the target stores them."""
+        res = copy.copy(self)
+        for field in (
+            "long_notional",
+            "short_notional",
+            "notional",
+            "long_wgt",
+            "short_wgt",
+            "long_rtn",
+            "long_cum_rtn",
+            "short_rtn",
+            "short_cum_rtn",
+            "rtn",
+            "cum_rtn",
+        ):
+            value = getattr(self, field)
+            if value is not None:
+                setattr(res, field, Decimal(value).quantize(SCALE, ROUND_HALF_UP))
+
+        return res
+
     def as_tuple(self) -> Tuple:
         """Returns object values as a tuple."""
         return (
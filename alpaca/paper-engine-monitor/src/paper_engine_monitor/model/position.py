@@ -23,6 +23,8 @@ class Position(State):
     wgt: Optional[datetime] = None
     quantity: Optional[Decimal] = None
     notional: Optional[Decimal] = None
+    # hash of the latest model, copied by --latest_mode DERIVED
+    latest_hash: Optional[str] = None
 
     @property
     def hash(self) -> str:
@@ -79,6 +81,7 @@ class Position(State):
         _ = record[8]  # hash
         res.event_id = record[9]
         res.delivery_id = record[10]
+        res.latest_hash = record[11]
 
         return res
 
@@ -111,4 +114,5 @@ class Position(State):
             self.hash,
             self.event_id,
             self.delivery_id,
+            self.latest_hash,
         )
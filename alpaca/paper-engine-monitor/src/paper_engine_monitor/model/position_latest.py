@@ -26,13 +26,12 @@ class PositionLatest(State):
 
     @property
     def hash(self) -> str:
-        """Object sha256 hash value."""
+        """Object sha256 hash value (observation timestamp excluded)."""
         res = (
             f"{self.portfolio_id}, "
             f"{self.side}, "
             f"{self.asset_id_type}, "
             f"{self.asset_id}, "
-            f"{self.position_ts}, "
             f"{self.wgt}, "
             f"{self.quantity}, "
             f"{self.notional}"
@@ -1,6 +1,7 @@
 """Data source interactions."""
 
+from .mirror import LatestMirror
 from .source import Source
 from .target import Target
 
-__all__ = ["Source", "Target"]
+__all__ = ["LatestMirror", "Source", "Target"]
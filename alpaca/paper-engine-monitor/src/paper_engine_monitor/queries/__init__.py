@@ -3,8 +3,10 @@
 from .portfolio import Queries as PortfolioQueries
 from .portfolio_control import Queries as PortfolioControlQueries
 from .portfolio_latest import Queries as PortfolioLatestQueries
+from .portfolio_rollup import Queries as PortfolioRollupQueries
 from .position import Queries as PositionQueries
 from .position_latest import Queries as PositionLatestQueries
+from .position_rollup import Queries as PositionRollupQueries
 
 __all__ = [
     "PositionQueries",
@@ -12,4 +14,6 @@ __all__ = [
     "PortfolioQueries",
     "PositionLatestQueries",
     "PortfolioControlQueries",
+    "PortfolioRollupQueries",
+    "PositionRollupQueries",
 ]
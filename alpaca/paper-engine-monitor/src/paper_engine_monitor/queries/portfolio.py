@@ -6,6 +6,28 @@ from paper_engine_monitor.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Portfolio queries."""
 
+    TABLE = "portfolio"
+    KEY = ("portfolio_id", "portfolio_ts")
+    COLUMNS = (
+        "portfolio_id",
+        "portfolio_ts",
+        "long_notional",
+        "short_notional",
+        "notional",
+        "long_wgt",
+        "short_wgt",
+        "long_rtn",
+        "long_cum_rtn",
+        "short_rtn",
+        "short_cum_rtn",
+        "rtn",
+        "cum_rtn",
+        "hash",
+        "event_id",
+        "delivery_id",
+        "latest_hash",
+    )
+
     LOAD_STATE = (
         "SELECT * FROM portfolio WHERE (portfolio_id, portfolio_ts) IN (VALUES %s);"
     )
@@ -24,7 +46,7 @@ class Queries(BaseQueries):
         "    short_cum_rtn,"
         "    rtn,"
         "    cum_rtn,"
-        "    hash, event_id, delivery_id"
+        "    hash, event_id, delivery_id, latest_hash"
         ") VALUES %s "
         "ON CONFLICT (portfolio_id, portfolio_ts) DO "
         "UPDATE SET "
@@ -43,6 +65,7 @@ class Queries(BaseQueries):
         "    cum_rtn=EXCLUDED.cum_rtn,"
         "    hash=EXCLUDED.hash,"
         "    event_id=EXCLUDED.event_id,"
-        "    delivery_id=EXCLUDED.delivery_id;"
+        "    delivery_id=EXCLUDED.delivery_id,"
+        "    latest_hash=EXCLUDED.latest_hash;"
     )
     DELETE = "DELETE FROM portfolio WHERE (portfolio_id, portfolio_ts) IN (VALUES %s);"
@@ -6,7 +6,21 @@ from paper_engine_monitor.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Portfolio Control queries."""
 
+    TABLE = "portfolio_control"
+    KEY = ("portfolio_id",)
+    COLUMNS = (
+        "portfolio_id",
+        "last_monitor_ts",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
     LOAD_STATE = "SELECT * FROM portfolio_control WHERE (portfolio_id) IN (VALUES %s);"
+    # last delivery that wrote the scope of the loader (see LatestMirror.sync)
+    LOAD_DELIVERY_ID = (
+        "SELECT delivery_id FROM portfolio_control WHERE portfolio_id = %s;"
+    )
     UPSERT = (
         "INSERT INTO portfolio_control ("
         "    portfolio_id, "
@@ -21,5 +35,12 @@ class Queries(BaseQueries):
         "    event_id=EXCLUDED.event_id,"
         "    delivery_id=EXCLUDED.delivery_id;"
     )
+    # moves the watermark of a skipped delivery, the row keeps its event and
+    # delivery ids
+    ADVANCE = (
+        "UPDATE portfolio_control "
+        "SET last_monitor_ts = %(last_monitor_ts)s, hash = %(hash)s "
+        "WHERE portfolio_id = %(portfolio_id)s;"
+    )
     DELETE = "DELETE FROM portfolio_control WHERE portfolio_id IN (VALUES %s);"
 
@@ -6,6 +6,27 @@ from paper_engine_monitor.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Portfolio Latest queries."""
 
+    TABLE = "portfolio_latest"
+    KEY = ("portfolio_id",)
+    COLUMNS = (
+        "portfolio_id",
+        "portfolio_ts",
+        "long_notional",
+        "short_notional",
+        "notional",
+        "long_wgt",
+        "short_wgt",
+        "long_rtn",
+        "long_cum_rtn",
+        "short_rtn",
+        "short_cum_rtn",
+        "rtn",
+        "cum_rtn",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
     LOAD_STATE = "SELECT * FROM portfolio_latest WHERE (portfolio_id) IN (VALUES %s);"
 
     UPSERT = (
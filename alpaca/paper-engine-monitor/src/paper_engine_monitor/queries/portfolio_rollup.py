@@ -0,0 +1,99 @@
+"""Portfolio rollup queries."""
+
+from typing import Dict
+
+from paper_engine_monitor.queries.base import BaseQueries
+
+# rollup resolution -> DATE_TRUNC unit of its buckets
+RESOLUTIONS: Dict[str, str] = {
+    "1m": "minute",
+    "1h": "hour",
+    "1d": "day",
+}
+RESOLUTIONS_VALUES = ", ".join(f"('{r}', '{u}')" for r, u in RESOLUTIONS.items())
+
+_OHLC_COLUMNS = ("notional", "cum_rtn")
+
+
+def _ohlc_updates() -> str:
+    updates = []
+    for c in _OHLC_COLUMNS:
+        updates += [
+            f"{c}_open=CASE WHEN EXCLUDED.first_ts < portfolio_rollup.first_ts "
+            f"THEN EXCLUDED.{c}_open ELSE portfolio_rollup.{c}_open END",
+            f"{c}_high=GREATEST(portfolio_rollup.{c}_high, EXCLUDED.{c}_high)",
+            f"{c}_low=LEAST(portfolio_rollup.{c}_low, EXCLUDED.{c}_low)",
+            f"{c}_close=CASE WHEN EXCLUDED.last_ts >= portfolio_rollup.last_ts "
+            f"THEN EXCLUDED.{c}_close ELSE portfolio_rollup.{c}_close END",
+        ]
+    return ", ".join(updates)
+
+
+class Queries(BaseQueries):
+    """Portfolio rollup queries."""
+
+    TABLE = "portfolio_rollup"
+    KEY = ("portfolio_id", "resolution", "bucket_ts")
+    COLUMNS = (
+        "portfolio_id",
+        "resolution",
+        "bucket_ts",
+        "notional_open",
+        "notional_high",
+        "notional_low",
+        "notional_close",
+        "cum_rtn_open",
+        "cum_rtn_high",
+        "cum_rtn_low",
+        "cum_rtn_close",
+        "first_ts",
+        "last_ts",
+        "n_obs",
+    )
+
+    # folds the portfolio rows of a delivery (one per portfolio) into the
+    # bucket of every resolution
+    ROLLUP = (
+        f"INSERT INTO portfolio_rollup ({', '.join(COLUMNS)}) "
+        "SELECT p.portfolio_id, "
+        "       r.resolution, "
+        "       DATE_TRUNC(r.unit, p.portfolio_ts), "
+        "       p.notional, p.notional, p.notional, p.notional, "
+        "       p.cum_rtn, p.cum_rtn, p.cum_rtn, p.cum_rtn, "
+        "       p.portfolio_ts, p.portfolio_ts, 1 "
+        "FROM portfolio p "
+        f"CROSS JOIN (VALUES {RESOLUTIONS_VALUES}) AS r(resolution, unit) "
+        "WHERE p.delivery_id = %(delivery_id)s "
+        "ON CONFLICT (portfolio_id, resolution, bucket_ts) DO "
+        f"UPDATE SET {_ohlc_updates()}, "
+        "    first_ts=LEAST(portfolio_rollup.first_ts, EXCLUDED.first_ts),"
+        "    last_ts=GREATEST(portfolio_rollup.last_ts, EXCLUDED.last_ts),"
+        "    n_obs=portfolio_rollup.n_obs + EXCLUDED.n_obs;"
+    )
+
+    # first bucket of the rollup (rollups start with --rollups)
+    FIRST_BUCKET = (
+        "SELECT MIN(bucket_ts) "
+        "FROM portfolio_rollup "
+        "WHERE portfolio_id = %(portfolio_id)s AND resolution = %(resolution)s;"
+    )
+    LOAD_RANGE = (
+        "SELECT bucket_ts, "
+        "       notional_open, notional_high, notional_low, notional_close, "
+        "       cum_rtn_open, cum_rtn_high, cum_rtn_low, cum_rtn_close "
+        "FROM portfolio_rollup "
+        "WHERE portfolio_id = %(portfolio_id)s "
+        "  AND resolution = %(resolution)s "
+        "  AND bucket_ts >= %(start)s AND bucket_ts < %(end)s "
+        "ORDER BY bucket_ts;"
+    )
+    # same layout, from the portfolio rows
+    LOAD_RAW_RANGE = (
+        "SELECT portfolio_ts, "
+        "       notional, notional, notional, notional, "
+        "       cum_rtn, cum_rtn, cum_rtn, cum_rtn "
+        "FROM portfolio "
+        "WHERE portfolio_id = %(portfolio_id)s "
+        "  AND portfolio_ts >= %(start)s AND portfolio_ts < %(end)s "
+        "ORDER BY portfolio_ts;"
+    )
@@ -6,6 +6,23 @@ from paper_engine_monitor.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Position queries."""
 
+    TABLE = "position"
+    KEY = ("portfolio_id", "asset_id", "position_ts")
+    COLUMNS = (
+        "portfolio_id",
+        "side",
+        "asset_id_type",
+        "asset_id",
+        "position_ts",
+        "wgt",
+        "quantity",
+        "notional",
+        "hash",
+        "event_id",
+        "delivery_id",
+        "latest_hash",
+    )
+
     LOAD_STATE = "SELECT * FROM position WHERE (portfolio_id, asset_id, position_ts) IN (VALUES %s);"  # noqa: B950
     UPSERT = (
         "INSERT INTO position ("
@@ -17,7 +34,7 @@ class Queries(BaseQueries):
         "    wgt,"
         "    quantity,"
         "    notional,"
-        "    hash, event_id, delivery_id"
+        "    hash, event_id, delivery_id, latest_hash"
         ") VALUES %s "
         "ON CONFLICT (portfolio_id, asset_id, position_ts) DO "
         "UPDATE SET "
@@ -31,6 +48,7 @@ class Queries(BaseQueries):
         "    notional=EXCLUDED.notional,"
         "    hash=EXCLUDED.hash,"
         "    event_id=EXCLUDED.event_id,"
-        "    delivery_id=EXCLUDED.delivery_id;"
+        "    delivery_id=EXCLUDED.delivery_id,"
+        "    latest_hash=EXCLUDED.latest_hash;"
     )
     DELETE = "DELETE FROM position WHERE (portfolio_id, asset_id, position_ts) IN (VALUES %s);"  # noqa: B950
@@ -6,12 +6,32 @@ from paper_engine_monitor.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Position queries."""
 
+    TABLE = "position_latest"
+    KEY = ("portfolio_id", "asset_id")
+    COLUMNS = (
+        "portfolio_id",
+        "side",
+        "asset_id_type",
+        "asset_id",
+        "position_ts",
+        "wgt",
+        "quantity",
+        "notional",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
     LOAD_STATE = (
         "SELECT * FROM position_latest WHERE (portfolio_id, asset_id) IN (VALUES %s);"
     )
     LOAD_FULL_STATE = (
         "SELECT * FROM position_latest WHERE (portfolio_id) IN (VALUES %s);"
     )
+    LOAD_PORTFOLIO_HASHES = (
+        "SELECT portfolio_id, asset_id, hash "
+        "FROM position_latest WHERE (portfolio_id) IN (VALUES %s);"
+    )
     UPSERT = (
         "INSERT INTO position_latest ("
         "    portfolio_id, "
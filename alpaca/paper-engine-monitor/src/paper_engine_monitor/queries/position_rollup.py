@@ -0,0 +1,102 @@
+"""Position rollup queries."""
+
+from paper_engine_monitor.queries.base import BaseQueries
+from paper_engine_monitor.queries.portfolio_rollup import RESOLUTIONS_VALUES
+
+
+class Queries(BaseQueries):
+    """Position rollup queries."""
+
+    TABLE = "position_rollup"
+    KEY = ("portfolio_id", "resolution", "asset_id", "bucket_ts")
+    COLUMNS = (
+        "portfolio_id",
+        "resolution",
+        "asset_id",
+        "bucket_ts",
+        "asset_id_type",
+        "side",
+        "wgt",
+        "quantity",
+        "notional",
+        "last_ts",
+    )
+
+    # keeps the last position of each bucket, from the position rows of a
+    # delivery (one per asset)
+    ROLLUP = (
+        f"INSERT INTO position_rollup ({', '.join(COLUMNS)}) "
+        "SELECT p.portfolio_id, "
+        "       r.resolution, "
+        "       p.asset_id, "
+        "       DATE_TRUNC(r.unit, p.position_ts), "
+        "       p.asset_id_type, "
+        "       p.side, "
+        "       p.wgt, "
+        "       p.quantity, "
+        "       p.notional, "
+        "       p.position_ts "
+        "FROM position p "
+        f"CROSS JOIN (VALUES {RESOLUTIONS_VALUES}) AS r(resolution, unit) "
+        "WHERE p.delivery_id = %(delivery_id)s "
+        "ON CONFLICT (portfolio_id, resolution, asset_id, bucket_ts) DO "
+        "UPDATE SET "
+        "    asset_id_type=EXCLUDED.asset_id_type,"
+        "    side=EXCLUDED.side,"
+        "    wgt=EXCLUDED.wgt,"
+        "    quantity=EXCLUDED.quantity,"
+        "    notional=EXCLUDED.notional,"
+        "    last_ts=EXCLUDED.last_ts "
+        "WHERE EXCLUDED.last_ts >= position_rollup.last_ts;"
+    )
+
+    # closes the buckets of the positions that left the portfolio in a
+    # delivery: zero row at the time of its portfolio row
+    CLOSE = (
+        f"INSERT INTO position_rollup ({', '.join(COLUMNS)}) "
+        "SELECT p.portfolio_id, "
+        "       r.resolution, "
+        "       a.asset_id, "
+        "       DATE_TRUNC(r.unit, p.portfolio_ts), "
+        "       NULL, "
+        "       NULL, "
+        "       0, "
+        "       0, "
+        "       0, "
+        "       p.portfolio_ts "
+        "FROM portfolio p "
+        "CROSS JOIN UNNEST(%(asset_ids)s::VARCHAR[]) AS a(asset_id) "
+        f"CROSS JOIN (VALUES {RESOLUTIONS_VALUES}) AS r(resolution, unit) "
+        "WHERE p.delivery_id = %(delivery_id)s "
+        "ON CONFLICT (portfolio_id, resolution, asset_id, bucket_ts) DO "
+        "UPDATE SET "
+        "    side=EXCLUDED.side,"
+        "    wgt=EXCLUDED.wgt,"
+        "    quantity=EXCLUDED.quantity,"
+        "    notional=EXCLUDED.notional,"
+        "    last_ts=EXCLUDED.last_ts "
+        "WHERE EXCLUDED.last_ts >= position_rollup.last_ts;"
+    )
+
+    # first bucket of the rollup (rollups start with --rollups)
+    FIRST_BUCKET = (
+        "SELECT MIN(bucket_ts) "
+        "FROM position_rollup "
+        "WHERE portfolio_id = %(portfolio_id)s AND resolution = %(resolution)s;"
+    )
+    LOAD_RANGE = (
+        "SELECT bucket_ts, asset_id, side, wgt, quantity, notional "
+        "FROM position_rollup "
+        "WHERE portfolio_id = %(portfolio_id)s "
+        "  AND resolution = %(resolution)s "
+        "  AND bucket_ts >= %(start)s AND bucket_ts < %(end)s "
+        "ORDER BY bucket_ts, asset_id;"
+    )
+    # same layout, from the position rows
+    LOAD_RAW_RANGE = (
+        "SELECT position_ts, asset_id, side, wgt, quantity, notional "
+        "FROM position "
+        "WHERE portfolio_id = %(portfolio_id)s "
+        "  AND position_ts >= %(start)s AND position_ts < %(end)s "
+        "ORDER BY position_ts, asset_id;"
+    )
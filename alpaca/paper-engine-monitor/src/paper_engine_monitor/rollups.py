@@ -0,0 +1,128 @@
+"""Portfolio and position history at a requested resolution."""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import paper_engine_monitor.queries as queries
+from paper_engine_monitor.persistance import target
+from paper_engine_monitor.queries.portfolio_rollup import RESOLUTIONS
+
+# width of the buckets of each DATE_TRUNC unit
+_UNIT_WIDTHS: Dict[str, timedelta] = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def pick_resolution(requested: timedelta) -> Optional[str]:
+    """Gets the coarsest rollup with buckets no wider than the requested resolution.
+
+    Args:
+        requested: Resolution needed by the caller (e.g. one point per hour).
+
+    Returns:
+        Rollup resolution (see RESOLUTIONS), None if only the raw rows are fine
+        enough.
+    """
+    widths = {r: _UNIT_WIDTHS[u] for r, u in RESOLUTIONS.items()}
+    fitting = [r for r, w in widths.items() if w <= requested]
+    if not fitting:
+        return None
+    return max(fitting, key=lambda r: widths[r])
+
+
+def load_portfolio_history(
+    tgt: target.Target,
+    portfolio_id: int,
+    start: datetime,
+    end: datetime,
+    requested: timedelta,
+) -> List[Tuple]:
+    """Gets the notional and cum_rtn OHLC of a portfolio between start and end.
+
+    Read from the coarsest rollup that meets the requested resolution, raw rows
+    come with open = high = low = close (see _load for the range before the
+    rollups started).
+
+    Returns:
+        (bucket_ts, notional OHLC, cum_rtn OHLC) rows, sorted by bucket_ts.
+    """
+    return _load(
+        tgt,
+        queries.PortfolioRollupQueries.FIRST_BUCKET,
+        queries.PortfolioRollupQueries.LOAD_RANGE,
+        queries.PortfolioRollupQueries.LOAD_RAW_RANGE,
+        portfolio_id,
+        start,
+        end,
+        requested,
+    )
+
+
+def load_position_history(
+    tgt: target.Target,
+    portfolio_id: int,
+    start: datetime,
+    end: datetime,
+    requested: timedelta,
+) -> List[Tuple]:
+    """Gets the last position of each asset of a portfolio in each bucket.
+
+    Read from the coarsest rollup that meets the requested resolution (see
+    _load for the range before the rollups started).
+
+    Returns:
+        (bucket_ts, asset_id, side, wgt, quantity, notional) rows, sorted by
+        bucket_ts and asset_id.
+    """
+    return _load(
+        tgt,
+        queries.PositionRollupQueries.FIRST_BUCKET,
+        queries.PositionRollupQueries.LOAD_RANGE,
+        queries.PositionRollupQueries.LOAD_RAW_RANGE,
+        portfolio_id,
+        start,
+        end,
+        requested,
+    )
+
+
+def _load(
+    tgt: target.Target,
+    first_bucket_query: str,
+    rollup_query: str,
+    raw_query: str,
+    portfolio_id: int,
+    start: datetime,
+    end: datetime,
+    requested: timedelta,
+) -> List[Tuple]:
+    """Reads a range from the rollup, or the raw rows where it has no buckets.
+
+    Rollups are only maintained from the first delivery run with --rollups:
+    the part of the range before their first bucket is read from the raw rows.
+    """
+    resolution = pick_resolution(requested)
+    cursor = tgt.cursor
+    params = {"portfolio_id": portfolio_id, "resolution": resolution}
+    if not resolution:
+        cursor.execute(raw_query, vars={**params, "start": start, "end": end})
+        return cursor.fetchall()
+
+    cursor.execute(first_bucket_query, vars=params)
+    first_bucket = cursor.fetchone()[0]
+    rollup_start = max(start, first_bucket) if first_bucket else end
+
+    res: List[Tuple] = []
+    if start < rollup_start:
+        cursor.execute(
+            raw_query, vars={**params, "start": start, "end": min(rollup_start, end)}
+        )
+        res += cursor.fetchall()
+    if rollup_start < end:
+        cursor.execute(
+            rollup_query, vars={**params, "start": rollup_start, "end": end}
+        )
+        res += cursor.fetchall()
+    return res
@@ -0,0 +1,15 @@
+"""Shared fixtures."""
+
+from typing import Iterator
+
+import pytest
+
+from stream_server import StreamServer
+
+
+@pytest.fixture
+def stream_server() -> Iterator[StreamServer]:
+    """Local stand-in trade updates stream."""
+    server = StreamServer().start()
+    yield server
+    server.stop()
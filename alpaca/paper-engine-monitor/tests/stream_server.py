@@ -0,0 +1,119 @@
+"""Local stand-in for the alpaca trade updates stream."""
+
+import asyncio
+from datetime import datetime
+import json
+import threading
+from typing import Any, Dict, Optional, Set
+import uuid
+
+from websockets.asyncio.server import serve, ServerConnection
+
+
+def trade_update(
+    event: str,
+    symbol: str,
+    side: str,
+    qty: float,
+    price: float,
+    position_qty: float,
+    timestamp: Optional[datetime] = None,
+    execution_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Data of a trade_updates message (see alpaca.trading.models.TradeUpdate).
+
+    Executed now with a new execution id unless given.
+    """
+    ts = (timestamp or datetime.utcnow()).isoformat() + "Z"
+    return {
+        "event": event,
+        "execution_id": execution_id or str(uuid.uuid4()),
+        "timestamp": ts,
+        "price": str(price),
+        "qty": str(qty),
+        "position_qty": str(position_qty),
+        "order": {
+            "id": str(uuid.uuid4()),
+            "client_order_id": str(uuid.uuid4()),
+            "created_at": ts,
+            "updated_at": ts,
+            "submitted_at": ts,
+            "asset_id": str(uuid.uuid4()),
+            "symbol": symbol,
+            "asset_class": "us_equity",
+            "order_class": "simple",
+            "order_type": "market",
+            "type": "market",
+            "side": side,
+            "time_in_force": "gtc",
+            "status": "filled" if event == "fill" else "partially_filled",
+            "extended_hours": False,
+            "qty": str(qty),
+            "filled_qty": str(qty),
+        },
+    }
+
+
+class StreamServer(object):
+    """Trade updates websocket server on localhost, in a daemon thread.
+
+    Speaks the alpaca protocol (authenticate, listen) and pushes the trade
+    updates given to send to every subscribed client.
+    """
+
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _clients: Set[ServerConnection]
+
+    def __init__(self) -> None:
+        """Stand-in stream server, started with start."""
+        self._loop = None
+        self._clients = set()
+        self._started = threading.Event()
+        self._stop: Optional[asyncio.Event] = None
+        self.listening = threading.Event()
+        self.port = 0
+
+    @property
+    def url(self) -> str:
+        """Stream URL (TradingStream url_override)."""
+        return f"ws://127.0.0.1:{self.port}"
+
+    def start(self) -> "StreamServer":
+        """Starts the server, returns once it accepts connections."""
+        threading.Thread(target=asyncio.run, args=(self._serve(),), daemon=True).start()
+        self._started.wait(timeout=5)
+        return self
+
+    def stop(self) -> None:
+        """Stops the server."""
+        self._loop.call_soon_threadsafe(self._stop.set)
+
+    def send(self, data: Dict[str, Any]) -> None:
+        """Pushes a trade update to the subscribed clients."""
+        message = json.dumps({"stream": "trade_updates", "data": data})
+        asyncio.run_coroutine_threadsafe(self._broadcast(message), self._loop).result()
+
+    async def _broadcast(self, message: str) -> None:
+        for ws in list(self._clients):
+            await ws.send(message)
+
+    async def _handler(self, ws: ServerConnection) -> None:
+        auth = json.loads(await ws.recv())
+        status = "authorized" if auth.get("action") == "authenticate" else "failed"
+        data = {"action": "authenticate", "status": status}
+        await ws.send(json.dumps({"stream": "authorization", "data": data}))
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg.get("action") == "listen":
+                self._clients.add(ws)
+                await ws.send(json.dumps({"stream": "listening", "data": msg["data"]}))
+                self.listening.set()
+        self._clients.discard(ws)
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        async with serve(self._handler, "127.0.0.1", 0) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._started.set()
+            await self._stop.wait()
@@ -0,0 +1,254 @@
+"""Trade updates stream, position book and streaming loader tests."""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import socket
+import threading
+import time
+from types import SimpleNamespace
+from typing import List, Tuple
+
+from alpaca.trading.models import TradeUpdate
+import pytest
+
+from paper_engine_monitor.__main__ import Loader
+from paper_engine_monitor.broker import Alpaca, PositionBook
+from stream_server import StreamServer, trade_update
+
+
+class TradingClient(object):
+    """Trading client stand-in: an account with 30 cash and 7 X at 10."""
+
+    def __init__(self) -> None:
+        self.account_calls = 0
+        self.cash = "30"
+        self.positions = [
+            SimpleNamespace(symbol="X", qty="7", side="long", market_value="70")
+        ]
+
+    def get_account(self) -> SimpleNamespace:
+        self.account_calls += 1
+        return SimpleNamespace(
+            equity="100", long_market_value="70", short_market_value="0", cash=self.cash
+        )
+
+    def get_all_positions(self) -> List[SimpleNamespace]:
+        return list(self.positions)
+
+
+class Stop(Exception):
+    """Ends run_stream (any error ends the loop)."""
+
+
+def update(*args) -> TradeUpdate:
+    return TradeUpdate(**trade_update(*args))
+
+
+def polled(seconds: float = 0) -> Tuple[datetime, datetime]:
+    """Poll that started seconds ago and just ended."""
+    now = datetime.now(timezone.utc)
+    return now - timedelta(seconds=seconds), now
+
+
+def reconciled_book(seconds: float = 0) -> PositionBook:
+    client = TradingClient()
+    book = PositionBook()
+    assert book.reconcile(
+        client.get_account(), client.get_all_positions(), 0, polled(seconds)
+    )
+    return book
+
+
+def broker(stream_url: str) -> Alpaca:
+    res = Alpaca("key", "secret", stream_url=stream_url)
+    res.trading_client = TradingClient()
+    return res
+
+
+def test_book_applies_partial_fill_then_fill() -> None:
+    book = reconciled_book()
+
+    assert book.apply(update("partial_fill", "Y", "sell", 2, 10, -2))
+    assert book.apply(update("fill", "Y", "sell", 3, 12, -5))
+
+    assert Decimal(book.positions()["Y"]["quantity"]) == -5
+    assert book.positions()["Y"]["side"] == "short"
+    assert book.cash_value() == Decimal(30 + 20 + 36)
+    assert book.portfolio_value("LONG") == Decimal(70)
+    assert book.portfolio_value("SHORT") == Decimal(60)
+    assert book.portfolio_value() == Decimal(86 + 70 - 60)
+    assert book.version == 2
+
+
+def test_book_closes_position_on_fill_to_zero() -> None:
+    book = reconciled_book()
+
+    assert book.apply(update("fill", "X", "sell", 7, 11, 0))
+
+    assert "X" not in book.positions()
+    assert book.portfolio_value() == Decimal(30 + 77)
+
+
+def test_book_ignores_other_events() -> None:
+    book = reconciled_book()
+
+    assert not book.apply(update("new", "Y", "buy", 1, 10, 1))
+    assert not book.apply(update("canceled", "Y", "buy", 1, 10, 1))
+    assert book.version == 0
+    assert not book.wait_change(0)
+
+
+def test_book_fills_already_polled_are_not_applied_twice() -> None:
+    book = reconciled_book()
+    before = datetime.utcnow() - timedelta(seconds=1)
+
+    # the poll already holds the 7 X of these fills, streamed late
+    assert not book.apply(update("partial_fill", "X", "buy", 1, 10, 6, before))
+    assert not book.apply(update("fill", "X", "buy", 1, 10, 7, before))
+    assert Decimal(book.positions()["X"]["quantity"]) == 7
+    assert book.cash_value() == Decimal(30)
+    assert book.version == 0
+
+
+def test_book_redelivered_fill_is_not_applied_twice() -> None:
+    book = reconciled_book()
+
+    fill = update("fill", "Y", "buy", 1, 10, 1)
+    assert book.apply(fill)
+    assert not book.apply(fill)
+    assert book.cash_value() == Decimal(20)
+
+
+def test_book_applies_fill_back_to_the_polled_quantity() -> None:
+    book = reconciled_book()
+
+    # round trip after the poll, the sell was not streamed yet
+    assert book.apply(update("fill", "X", "buy", 2, 10, 7))
+    assert book.cash_value() == Decimal(10)
+    assert not book.pending
+
+
+def test_book_pending_after_a_fill_during_the_poll() -> None:
+    book = reconciled_book(seconds=5)
+    during = datetime.utcnow() - timedelta(seconds=1)
+
+    # may or may not be in the polled positions
+    assert book.apply(update("fill", "Y", "buy", 1, 10, 1, during))
+    assert book.pending
+    assert book.reconcile(
+        TradingClient().get_account(), [], book.version, polled()
+    )
+    assert not book.pending
+
+
+def test_book_not_reconciled_over_a_fill_during_the_poll() -> None:
+    book = reconciled_book()
+    client = TradingClient()
+
+    version = book.version
+    account, positions = client.get_account(), client.get_all_positions()
+    book.apply(update("fill", "Y", "buy", 1, 10, 1))
+
+    assert not book.reconcile(account, positions, version, polled())
+    assert "Y" in book.positions()
+    assert book.reconcile(account, positions, book.version, polled())
+    assert "Y" not in book.positions()
+
+
+def test_reconcile_polls_again_after_a_fill_during_the_poll() -> None:
+    b = broker("ws://127.0.0.1:1")
+    b.book = PositionBook()
+    get_account = b.trading_client.get_account
+
+    def get_account_during_fill() -> SimpleNamespace:
+        if b.trading_client.account_calls == 0:
+            b.book.apply(update("fill", "Y", "buy", 1, 10, 1))
+        return get_account()
+
+    b.trading_client.get_account = get_account_during_fill
+    with b.snapshot():
+        assert b.reconcile()
+        assert b.trading_client.account_calls == 2
+        # the cycle reads the second poll, not a third one
+        assert b.get_cash_value() == Decimal(30)
+        assert b.trading_client.account_calls == 2
+    assert "Y" not in b.book.positions()
+
+
+def test_stream_moves_the_book(stream_server: StreamServer) -> None:
+    b = broker(stream_server.url)
+    b.start_stream()
+    with b.snapshot():
+        b.reconcile()
+    assert stream_server.listening.wait(5)
+
+    stream_server.send(trade_update("partial_fill", "X", "buy", 1, 10, 8))
+    stream_server.send(trade_update("fill", "X", "buy", 2, 10, 10))
+    deadline = time.monotonic() + 5
+    while b.book.version < 2 and time.monotonic() < deadline:
+        b.book.wait_change(0.1)
+    b.stop_stream()
+
+    assert b.from_book()
+    assert Decimal(b.get_all_positions()["X"]["quantity"]) == 10
+    assert b.get_cash_value() == Decimal(0)
+    assert b.get_portfolio_value() == Decimal(100)
+
+
+def run_stream(b: Alpaca, heartbeat: float, on_delivery) -> List[str]:
+    """Runs the streaming loader, on_delivery decides when it stops."""
+    loader = Loader()
+    loader._broker = b
+    loader._heartbeat = heartbeat
+    deliveries: List[str] = []
+
+    def run_once() -> None:
+        deliveries.append("book" if b.from_book() else "poll")
+        on_delivery(deliveries)
+
+    loader.run_once = run_once
+    thread = threading.Thread(target=loader.run_stream, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    return deliveries
+
+
+def test_run_stream_writes_on_fills_and_heartbeats(
+    stream_server: StreamServer,
+) -> None:
+    b = broker(stream_server.url)
+
+    def on_delivery(deliveries: List[str]) -> None:
+        if len(deliveries) == 1:
+            assert stream_server.listening.wait(5)
+            stream_server.send(trade_update("fill", "Y", "buy", 1, 10, 1))
+        elif len(deliveries) == 3:
+            raise Stop()
+
+    deliveries = run_stream(b, 1, on_delivery)
+
+    # first heartbeat, the fill, then the next heartbeat
+    assert deliveries == ["poll", "book", "poll"]
+    assert b.trading_client.account_calls == 2
+
+
+def test_run_stream_falls_back_to_polling_without_stream() -> None:
+    # nothing listens on the port, the stream keeps reconnecting
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        url = f"ws://127.0.0.1:{s.getsockname()[1]}"
+    b = broker(url)
+
+    def on_delivery(deliveries: List[str]) -> None:
+        # market moves only reach the book through the polls
+        b.trading_client.cash = str(30 + len(deliveries))
+        if len(deliveries) == 3:
+            raise Stop()
+
+    started = time.monotonic()
+    deliveries = run_stream(b, 0.2, on_delivery)
+
+    assert deliveries == ["poll", "poll", "poll"]
+    assert time.monotonic() - started == pytest.approx(0.4, abs=0.3)
+    assert b.book.cash_value() == Decimal(32)
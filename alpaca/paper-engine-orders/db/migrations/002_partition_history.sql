@@ -0,0 +1,77 @@
+-- Partitions by month the history tables (orders) of a database
+-- created before they were partitioned. Each table is renamed to
+-- <table>_unpartitioned, created again from db/ with monthly partitions from
+-- its first row, and its rows are copied over, in one transaction. Run after
+-- 001_latest_hash.sql, with the loader stopped:
+--
+--     psql "$TARGET" -f db/migrations/002_partition_history.sql
+--
+-- then drop orders_unpartitioned once checked.
+\set ON_ERROR_STOP on
+BEGIN;
+
+-- orders: the old table and its indexes are renamed out of the way
+ALTER TABLE orders RENAME TO orders_unpartitioned;
+DO $$
+DECLARE
+    idx TEXT;
+BEGIN
+    FOR idx IN
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'orders_unpartitioned'
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I;', idx, idx || '_unpartitioned');
+    END LOOP;
+END $$;
+
+\ir ../orders.sql
+
+-- monthly partitions of the existing rows, up to the ones orders.sql premade
+DO $$
+DECLARE
+    m TIMESTAMP;
+BEGIN
+    SELECT date_trunc('month', MIN(order_ts)) INTO m FROM orders_unpartitioned;
+    WHILE m < date_trunc('month', now() AT TIME ZONE 'UTC') LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L);',
+            'orders_p' || to_char(m, 'YYYYMM'),
+            m,
+            m + interval '1 month'
+        );
+        m := m + interval '1 month';
+    END LOOP;
+END $$;
+
+INSERT INTO orders (
+    portfolio_id,
+    side,
+    asset_id_type,
+    asset_id,
+    order_ts,
+    target_wgt,
+    real_wgt,
+    quantity,
+    notional,
+    hash,
+    event_id,
+    delivery_id,
+    latest_hash
+)
+SELECT
+    portfolio_id,
+    side,
+    asset_id_type,
+    asset_id,
+    order_ts,
+    target_wgt,
+    real_wgt,
+    quantity,
+    notional,
+    hash,
+    event_id,
+    delivery_id,
+    latest_hash
+FROM orders_unpartitioned;
+
+COMMIT;
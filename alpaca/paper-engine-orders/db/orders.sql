@@ -12,8 +12,36 @@ CREATE TABLE orders
 
     hash                                    VARCHAR NOT NULL,
 
-    event_id                                BIGINT NOT NULL UNIQUE,
+    event_id                                BIGINT NOT NULL,
     delivery_id                             BIGINT NOT NULL,
+    -- hash of the latest model, copied by --latest_mode DERIVED
+    latest_hash                             VARCHAR,
 
-    PRIMARY KEY(portfolio_id, asset_id, order_ts)
-);
+    PRIMARY KEY(portfolio_id, asset_id, order_ts),
+    -- unique constraints of a partitioned table include the partition key
+    UNIQUE(event_id, order_ts)
+) PARTITION BY RANGE (order_ts);
+
+CREATE INDEX orders_delivery_id_idx ON orders (delivery_id);
+CREATE INDEX orders_order_ts_brin ON orders USING BRIN (order_ts);
+
+-- monthly partitions orders_pYYYYMM are created and expired by
+-- python -m paper_engine_orders.maintenance (daily, see README), rows outside
+-- them land here
+CREATE TABLE orders_default PARTITION OF orders DEFAULT;
+
+-- current month and the 3 premade by maintenance, so rows don't start in the
+-- default partition
+DO $$
+DECLARE
+    m TIMESTAMP := date_trunc('month', now() AT TIME ZONE 'UTC');
+BEGIN
+    FOR i IN 0..3 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF orders FOR VALUES FROM (%L) TO (%L);',
+            'orders_p' || to_char(m + make_interval(months => i), 'YYYYMM'),
+            m + make_interval(months => i),
+            m + make_interval(months => i + 1)
+        );
+    END LOOP;
+END $$;
@@ -0,0 +1,58 @@
+CREATE OR REPLACE FUNCTION persist_delivery_orders(payload JSONB)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+-- Persists a whole delivery in one call.
+-- payload: {
+--     "entities": [{
+--         "table": ..., "key": [...], "columns": [...],
+--         "records": [{column: value}], "keys_to_remove": [{key column: value}]
+--     }],
+--     "delivery": {"delivery_id": ..., "delivery_ts": ..., "runtime": ...}
+-- }
+-- Records with the same key keep the one with the highest event_id.
+DECLARE
+    entity          JSONB;
+    columns         TEXT;
+    updates         TEXT;
+    key_columns     TEXT;
+    key_condition   TEXT;
+BEGIN
+    FOR entity IN SELECT * FROM jsonb_array_elements(payload -> 'entities')
+    LOOP
+        SELECT string_agg(quote_ident(c), ', '),
+               string_agg(format('%1$I=EXCLUDED.%1$I', c), ', ')
+        INTO columns, updates
+        FROM jsonb_array_elements_text(entity -> 'columns') AS c;
+
+        SELECT string_agg(quote_ident(c), ', '),
+               string_agg(format('t.%1$I = s.%1$I', c), ' AND ')
+        INTO key_columns, key_condition
+        FROM jsonb_array_elements_text(entity -> 'key') AS c;
+
+        IF jsonb_array_length(entity -> 'records') > 0 THEN
+            EXECUTE format(
+                'INSERT INTO %1$I (%2$s) '
+                'SELECT DISTINCT ON (%3$s) %2$s '
+                'FROM jsonb_populate_recordset(NULL::%1$I, $1) '
+                'ORDER BY %3$s, event_id DESC '
+                'ON CONFLICT (%3$s) DO UPDATE SET %4$s',
+                entity ->> 'table', columns, key_columns, updates
+            ) USING entity -> 'records';
+        END IF;
+
+        IF jsonb_array_length(entity -> 'keys_to_remove') > 0 THEN
+            EXECUTE format(
+                'DELETE FROM %1$I t '
+                'USING jsonb_populate_recordset(NULL::%1$I, $1) s '
+                'WHERE %2$s',
+                entity ->> 'table', key_condition
+            ) USING entity -> 'keys_to_remove';
+        END IF;
+    END LOOP;
+
+    INSERT INTO loader_orders (delivery_id, delivery_ts, runtime)
+    SELECT delivery_id, delivery_ts, runtime
+    FROM jsonb_populate_record(NULL::loader_orders, payload -> 'delivery');
+END;
+$$;
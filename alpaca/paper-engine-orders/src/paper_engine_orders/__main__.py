@@ -6,6 +6,7 @@ from datetime import datetime
 from datetime import time as dt_time
 from decimal import Decimal
 import hashlib
+import json
 import logging
 import os
 import secrets
@@ -29,7 +30,7 @@ import paper_engine_orders.model as model
 from paper_engine_orders.model.base import State
 from paper_engine_orders.model.entity import Entity
 import paper_engine_orders.model.source_model as source_model
-from paper_engine_orders.persistance import source, target
+from paper_engine_orders.persistance import mirror, source, target
 import paper_engine_orders.queries as queries
 from paper_engine_orders.queries.base import BaseQueries
 import paper_engine_orders.queries.source_queries as source_queries
@@ -62,7 +63,13 @@ class Loader:
     _dry_orders: bool
     _min_sleep: int
     _max_sleep: int
+    _copy_threshold: int
+    _persist_mode: str
+    _mirror: Optional[mirror.LatestMirror]
+    # latest entities derived on the server, with the entity they come from
+    _derived: Dict[Entity, Entity]
     _portfolio_name: str
+    _portfolio_id: Optional[int] = None
     _cash_allocation: Decimal
     _strategy_id: int
     _crypto: bool
@@ -73,6 +80,14 @@ class Loader:
         Entity.ORDERS_CONFIG,
         Entity.ORDERS_CONTROL,
     }
+    # entities mirrored in memory with --latest_mirror
+    _latest_entities: Set[Entity] = {
+        Entity.ORDERS_LATEST,
+    }
+    # history entity of each latest entity, for --latest_mode DERIVED
+    _latest_sources: Dict[Entity, Entity] = {
+        Entity.ORDERS_LATEST: Entity.ORDERS,
+    }
     _queries: Dict[Entity, BaseQueries] = {
         Entity.ORDERS: queries.OrdersQueries(),
         Entity.ORDERS_LATEST: queries.OrdersLatestQueries(),
@@ -98,15 +113,32 @@ class Loader:
         self._dry_orders = args.dry_orders
         self._min_sleep = args.min_sleep
         self._max_sleep = args.max_sleep
+        self._copy_threshold = args.copy_threshold
+        self._persist_mode = args.persist_mode
+        self._derived = {}
+        if args.latest_mode == "DERIVED":
+            self._derived = dict(self._latest_sources)
+        self._mirror = None
+        if args.latest_mirror and self._derived:
+            logger.warning("Latest tables derived on the server, ignoring mirror.")
+        elif args.latest_mirror:
+            self._mirror = mirror.LatestMirror(self._latest_entities)
 
         # prepare persistence FROM
         self._source = source.Source(args.source)
 
         # prepare persistence
-        self._target = target.Target(args.target)
+        self._target = target.Target(args.target, id_block_size=args.id_block_size)
 
         # ALPACA CONNECTION
-        self._broker = broker.Alpaca(args.api_key, args.secret_key)
+        self._broker = broker.Alpaca(
+            args.api_key,
+            args.secret_key,
+            catalog_ttl=args.asset_catalog_ttl,
+            catalog_refresh=args.asset_catalog_refresh,
+            rate_limit=args.rate_limit,
+            max_workers=args.order_workers,
+        )
         self._account_id = hashlib.sha256(
             (args.api_key + args.secret_key).encode("utf-8")
         ).hexdigest()
@@ -144,7 +176,8 @@ class Loader:
         if args.run_as_service:
             self.run_service()
         else:
-            self.run_once()
+            with self._broker.snapshot():
+                self.run_once()
 
         self.tear_down()
 
@@ -162,7 +195,9 @@ class Loader:
         stop = False
         while not stop:
             try:
-                self.run_once()
+                # account and positions are fetched once per cycle
+                with self._broker.snapshot():
+                    self.run_once()
                 t = secrets.choice(
                     [self._min_sleep, self._max_sleep]
                     + [i for i in range(self._min_sleep, self._max_sleep)]
@@ -203,7 +238,7 @@ class Loader:
                 return
 
         asset_ids = [s.asset_id for s in strategy_records]
-        tradable_asset_ids = self._broker.check_tradable(asset_ids)
+        tradable_asset_ids = set(self._broker.check_tradable(asset_ids))
         strategy_records = [
             s for s in strategy_records if s.asset_id in tradable_asset_ids
         ]
@@ -214,11 +249,14 @@ class Loader:
         closed_symbols = []
         if current_positions:
             current_symbols = list(current_positions.keys())
-            strategy_symbols = [s.asset_id for s in strategy_records]
+            strategy_symbols = {s.asset_id for s in strategy_records}
             closed_symbols = [s for s in current_symbols if s not in strategy_symbols]
         closed_records = []
         if closed_symbols and not self._dry_orders:
-            closed_records = self._broker.close_positions(portfolio_id, closed_symbols)
+            # reuses the positions of the cycle
+            closed_records = self._broker.close_positions(
+                portfolio_id, closed_symbols, positions=current_positions
+            )
 
         open_positions = [s for s in strategy_records if s.asset_id not in closed_symbols]
 
@@ -231,7 +269,7 @@ class Loader:
             if p.decision == -1 and p.asset_id not in long_asset_ids
         ]
         short_asset_ids = list({p.asset_id for p in short_portfolio})
-        shortable_ids = self._broker.check_shortable(short_asset_ids)
+        shortable_ids = set(self._broker.check_shortable(short_asset_ids))
         short_portfolio = [
             p for p in short_portfolio if p.asset_id in shortable_ids
         ]
@@ -269,8 +307,10 @@ class Loader:
         opening_orders = long_orders["buy"] + short_orders["sell"]
 
         if not self._dry_orders:
-            self._broker.submit_orders(closing_orders)
-            self._broker.submit_orders(opening_orders)
+            # one batch per decision, resubmitting it never places orders twice
+            batch_id = f"{portfolio_id}-{latest_decision_delivery_id}"
+            self._broker.submit_orders(closing_orders, batch_id=f"{batch_id}-close")
+            self._broker.submit_orders(opening_orders, batch_id=f"{batch_id}-open")
 
         long_records = long_weighting.get_orders_records(portfolio_id) if long_weighting else []
         short_records = short_weighting.get_orders_records(portfolio_id) if short_weighting else []
@@ -284,39 +324,47 @@ class Loader:
             )]
         config_records = [self.get_config_record(portfolio_id, strategy_id)]
 
-        delivery_id: int = self._target.get_next_delivery_id()
-        delivery: Dict = {
-            Entity.ORDERS_CONTROL: self.process(
-                delivery_id=delivery_id,
-                entity=Entity.ORDERS_CONTROL,
-                file=control_records,
-            ),
-            Entity.ORDERS_CONFIG: self.process(
-                delivery_id=delivery_id,
-                entity=Entity.ORDERS_CONFIG,
-                file=config_records,
-            ),
+        files: Dict[Entity, File] = {
+            Entity.ORDERS_CONTROL: control_records,
+            Entity.ORDERS_CONFIG: config_records,
         }
         if orders_records:
             logger.info('New orders placed.')
-            delivery[Entity.ORDERS] = self.process(
-                delivery_id=delivery_id,
-                entity=Entity.ORDERS,
-                file=orders_records,
-            )
-            delivery[Entity.ORDERS_LATEST] = self.process(
+            files[Entity.ORDERS] = orders_records
+            files[Entity.ORDERS_LATEST] = orders_records
+
+        # event ids of every entity in one round trip
+        self._target.reserve_event_ids(sum(len(f) for f in files.values()))
+        prev_hashes = self.prefetch_hashes(files)
+
+        delivery_id: int = self._target.get_next_delivery_id()
+        delivery: Dict = {
+            entity: self.process(
                 delivery_id=delivery_id,
-                entity=Entity.ORDERS_LATEST,
-                file=orders_records,
+                entity=entity,
+                file=file,
+                prev_hashes=prev_hashes[entity],
             )
+            for entity, file in files.items()
+        }
 
         # persist delivery
-        if not self._dry_run:
-            self.persist_delivery(
-                delivery_id=delivery_id,
-                start_time=start_time,
-                delivery=delivery,
-            )
+        if not self.has_changes(delivery):
+            logger.info(f"Delivery {delivery_id}: no changes, skipped.")
+        elif not self._dry_run:
+            try:
+                self.persist_delivery(
+                    delivery_id=delivery_id,
+                    start_time=start_time,
+                    delivery=delivery,
+                )
+            except Exception:
+                self._target.rollback_transaction()
+                if self._mirror:
+                    self._mirror.invalidate()
+                raise
+            if self._mirror:
+                self._mirror.apply(delivery_id, delivery)
 
         del delivery
 
@@ -335,9 +383,13 @@ class Loader:
 
     def get_portfolio_id(self, strategy_id: int) -> int:
         """Get portfolio id."""
+        if self._portfolio_id:
+            return self._portfolio_id
+
         portfolio_id = self._target.get_portfolio_id(self._portfolio_name)
         if not portfolio_id:
             portfolio_id = self._target.get_next_portfolio_id()
+        self._portfolio_id = portfolio_id
         return portfolio_id
 
     def check_new_decisions(self) -> Optional[Record]:
@@ -399,52 +451,127 @@ class Loader:
 
         return config_record
 
-    def process(self, delivery_id: int, entity: Entity, file: File) -> Dict:
+    def prefetch_hashes(
+        self, files: Dict[Entity, File]
+    ) -> Dict[Entity, Dict[Key, str]]:
+        """Gets the stored hashes of the previous state of a delivery.
+
+        One query for all the entities, returning key tuples and hashes
+        without building the state objects. With --latest_mirror, the latest
+        entities are read once and then served from memory.
+
+        Args:
+            files: Records of each entity of the delivery.
+
+        Returns:
+            By entity, the stored hash of each key.
+        """
+        mirrored: Dict[Entity, Dict[Key, str]] = {}
+        if self._mirror:
+            self._mirror.sync(
+                self._target.get_scope_delivery_id(
+                    queries.OrdersControlQueries.LOAD_DELIVERY_ID,
+                    (self._portfolio_id,),
+                ),
+                scope=self._portfolio_id,
+            )
+            mirrored = {
+                e: self._mirror.hashes(e) for e in files if self._mirror.holds(e)
+            }
+
+        queries: Dict[Entity, Tuple[str, str, Tuple[str, ...], Optional[Keys]]] = {}
+        for entity, file in files.items():
+            if entity in mirrored:
+                continue
+            query: BaseQueries = self._queries[entity]
+            if entity == Entity.ORDERS_LATEST:
+                queries[entity] = (
+                    query.LOAD_PORTFOLIO_HASHES,
+                    query.TABLE,
+                    query.KEY,
+                    [(self._portfolio_id,)],
+                )
+            else:
+                keys = self._state[entity].list_ids_from_source(records=file)
+                queries[entity] = (query.load_hashes(), query.TABLE, query.KEY, keys)
+
+        res = self._target.get_current_hashes(queries)
+        if self._mirror:
+            for entity, hashes in res.items():
+                self._mirror.load(entity, hashes)
+        res.update(mirrored)
+
+        return res
+
+    def process(
+        self,
+        delivery_id: int,
+        entity: Entity,
+        file: File,
+        prev_hashes: Dict[Key, str],
+    ) -> Dict:
         """Processes entity records present in delivery.
 
         Args:
             delivery_id: Delivery id.
             entity: Entity type.
             file: Entity records.
+            prev_hashes: Stored hash by key of the previous state of the
+                entity (see prefetch_hashes).
 
         Returns:
             A dictionary with records and keys to remove.
         """
         logger.info(f"Delivery {delivery_id}: processing {entity}...")
 
-        query: BaseQueries = self._queries[entity]
         state_type: Type[State] = self._state[entity]
+        prev_keys: List[Key] = list(prev_hashes.keys())
 
-        # previous state
-        keys: Keys = state_type.list_ids_from_source(records=file)
-        # fetch records from state with keys
-        if entity == Entity.ORDERS_LATEST:
-            prev_state: List[Tuple] = self._target.get_current_state(
-                query=query.LOAD_FULL_STATE
-            )
-        else:
-            prev_state: List[Tuple] = self._target.get_current_state(
-                query=query.LOAD_STATE, args=keys
-            )
-        prev_keys: List[Key] = [state_type.from_target(record=r).key for r in prev_state]
-
-        # current state
+        # current state, unchanged records are not written again
         curr_records: List[State] = [
             state_type.from_source(record=record) for record in file
         ]
+        curr_keys: List[Key] = [r.key for r in curr_records]
+        for latest_entity, source_entity in self._derived.items():
+            if source_entity == entity:
+                # the server derives the latest rows from these, with the hash
+                # of the latest model (see BaseQueries.derive)
+                latest_type: Type[State] = self._state[latest_entity]
+                for r, record in zip(curr_records, file):
+                    r.latest_hash = latest_type.from_source(record=record).hash
+        n_records = len(curr_records)
+        curr_records = [r for r in curr_records if prev_hashes.get(r.key) != r.hash]
+        if len(curr_records) < n_records:
+            logger.info(
+                f"Delivery {delivery_id}: {n_records - len(curr_records)} unchanged "
+                f"{entity} records suppressed."
+            )
 
-        it_event_id = self._target.get_next_event_id(n=len(curr_records))
-        for r, event_id in zip(curr_records, it_event_id):
-            r.event_id = event_id
+        # derived records keep the event id of their history row
+        n_ids = 0 if entity in self._derived else len(curr_records)
+        it_event_id = self._target.get_next_event_id(n=n_ids)
+        for r in curr_records:
+            r.event_id = next(it_event_id, None)
             r.delivery_id = delivery_id
 
-        curr_keys: List[Key] = [r.key for r in curr_records]
         keys_to_remove: List[Key] = list(set(prev_keys) - set(curr_keys))
 
         del file
 
         return {"records": curr_records, "keys_to_remove": keys_to_remove}
 
+    @staticmethod
+    def has_changes(delivery: Dict) -> bool:
+        """Checks if a delivery writes anything.
+
+        Control records are part of the changes, they keep track of the last
+        decision read.
+        """
+        return any(
+            content["records"] or content["keys_to_remove"]
+            for content in delivery.values()
+        )
+
     def persist_delivery(
         self,
         delivery_id: int,
@@ -458,14 +585,19 @@ class Loader:
             start_time: Time delivery started.
             delivery: Delivery to process.
         """
+        if self._persist_mode == "FUNCTION":
+            self.persist_function(delivery_id, start_time, delivery)
+            return
+
         self._target.begin_transaction()
 
         for entity, content in delivery.items():
             self.persist_postgres(
                 entity=entity,
-                records=content["records"],
+                records=[] if entity in self._derived else content["records"],
                 keys_to_remove=content["keys_to_remove"]
             )
+        self.derive_latest(delivery_id, delivery)
 
         end_time: datetime = datetime.utcnow()
         self._target.persist_delivery(
@@ -479,6 +611,76 @@ class Loader:
         self._target.commit_transaction()
         logger.info(f"Delivery {delivery_id}: persisted to postgres.")
 
+    def persist_function(
+        self,
+        delivery_id: int,
+        start_time: datetime,
+        delivery: Dict,
+    ) -> None:
+        """Persists a delivery in a single call to a server-side function.
+
+        Args:
+            delivery_id: Delivery id.
+            start_time: Time delivery started.
+            delivery: Delivery to process.
+        """
+        entities = []
+        for entity, content in delivery.items():
+            query: BaseQueries = self._queries[entity]
+            records = []
+            for r in [] if entity in self._derived else content["records"]:
+                record = dict(zip(query.COLUMNS, r.as_tuple()))
+                for column in query.JSON_COLUMNS:
+                    if record[column] is not None:
+                        record[column] = json.loads(record[column])
+                records.append(record)
+            entities.append(
+                {
+                    "table": query.TABLE,
+                    "key": query.KEY,
+                    "columns": query.COLUMNS,
+                    "records": records,
+                    "keys_to_remove": [
+                        dict(zip(query.KEY, k)) for k in content["keys_to_remove"]
+                    ],
+                }
+            )
+
+        runtime = datetime.utcnow() - start_time
+        self._target.begin_transaction()
+        self._target.persist_delivery_payload(
+            {
+                "entities": entities,
+                "delivery": {
+                    "delivery_id": delivery_id,
+                    "delivery_ts": datetime.utcnow(),
+                    "runtime": f"{runtime.total_seconds()} seconds",
+                },
+            }
+        )
+        self.derive_latest(delivery_id, delivery)
+        self._target.commit_transaction()
+        logger.info(f"Delivery {delivery_id}: persisted to postgres (function).")
+
+    def derive_latest(self, delivery_id: int, delivery: Dict) -> None:
+        """Upserts the derived latest tables from the history rows of a delivery.
+
+        Runs in the transaction of the delivery, after its history rows.
+
+        Args:
+            delivery_id: Delivery id.
+            delivery: Delivery being persisted.
+        """
+        for entity, source_entity in self._derived.items():
+            if entity not in delivery or not delivery[entity]["records"]:
+                continue
+            query: BaseQueries = self._queries[entity]
+            source_query: BaseQueries = self._queries[source_entity]
+            n_rows = self._target.execute_query(
+                query.derive(source_query.TABLE), {"delivery_id": delivery_id}
+            )
+            logger.debug(f"Delivery {delivery_id}: {n_rows} {entity} rows derived.")
+
     def persist_postgres(self, entity: Entity, records: List[State], keys_to_remove: Keys) -> None:
         """Persists records of entity to postgres.
 
@@ -489,28 +691,41 @@ class Loader:
         """
         query: BaseQueries = self._queries[entity]
 
-        # if multiple instructions have the same primary key
-        # db instructions can't be in batch
-        batch_records = len(set(r.key for r in records)) == len(records)
+        # an upsert batch can't hold the same primary key twice, only the last
+        # write of each key is kept
+        n_records = len(records)
+        records = State.last_writes(records)
+        if len(records) < n_records:
+            logger.debug(
+                f"{entity}: {n_records - len(records)} overwritten records dropped."
+            )
 
         # PERSIST RECORDS
-        if batch_records:
+        if len(records) >= self._copy_threshold:
+            self._target.copy_upsert(
+                table=query.TABLE,
+                columns=query.COLUMNS,
+                key=query.KEY,
+                logs=[r.as_tuple() for r in records],
+            )
+        else:
             self._target.execute(
                 instruction=query.UPSERT,
                 logs=[r.as_tuple() for r in records],
             )
-        else:
-            for r in records:
-                self._target.execute(
-                    instruction=query.UPSERT,
-                    logs=[r.as_tuple()],
-                )
 
         # REMOVE
-        self._target.execute(
-            instruction=query.DELETE,
-            logs=[k for k in keys_to_remove],
-        )
+        if len(keys_to_remove) >= self._copy_threshold:
+            self._target.copy_delete(
+                table=query.TABLE,
+                key=query.KEY,
+                keys_to_remove=list(keys_to_remove),
+            )
+        else:
+            self._target.execute(
+                instruction=query.DELETE,
+                logs=[k for k in keys_to_remove],
+            )
 
 
 def parse_args() -> argparse.Namespace:
@@ -654,6 +869,112 @@ def parse_args() -> argparse.Namespace:
         help="Strategy ID.",
     )
 
+    parser.add_argument(
+        "--copy_threshold",
+        dest="copy_threshold",
+        default=int(os.getenv("COPY_THRESHOLD", "1000")),
+        type=int,
+        required=False,
+        help="Records from which an entity is persisted with COPY into a staging table.",
+    )
+
+    parser.add_argument(
+        "--id_block_size",
+        dest="id_block_size",
+        default=int(os.getenv("ID_BLOCK_SIZE", "1")),
+        type=int,
+        required=False,
+        help="Delivery and event ids reserved per round trip.",
+    )
+
+    parser.add_argument(
+        "--persist_mode",
+        dest="persist_mode",
+        default=os.getenv("PERSIST_MODE", "STATEMENTS"),
+        choices=["STATEMENTS", "FUNCTION"],
+        type=str,
+        required=False,
+        help="Persist a delivery with one statement per entity (STATEMENTS) "
+        "or in one call to persist_delivery_orders (FUNCTION).",
+    )
+
+    parser.add_argument(
+        "--latest_mirror",
+        dest="latest_mirror",
+        action="store_true",
+        required=False,
+        help=(
+            "Keep the latest tables in memory, read again only on rollback or when"
+            " another writer moved them."
+        ),
+    )
+    parser.add_argument(
+        "--no-latest_mirror",
+        dest="latest_mirror",
+        action="store_false",
+        required=False,
+        help="Read the latest tables every cycle (default).",
+    )
+    parser.set_defaults(
+        latest_mirror=ast.literal_eval(os.environ.get("LATEST_MIRROR", "False"))
+    )
+
+    parser.add_argument(
+        "--latest_mode",
+        dest="latest_mode",
+        default=os.getenv("LATEST_MODE", "CLIENT"),
+        choices=["CLIENT", "DERIVED"],
+        type=str,
+        required=False,
+        help="Latest tables written by the loader (CLIENT) "
+        "or merged on the server from the history rows of the delivery (DERIVED).",
+    )
+
+    parser.add_argument(
+        "--asset_catalog_ttl",
+        dest="asset_catalog_ttl",
+        default=float(os.getenv("ASSET_CATALOG_TTL", "3600")),
+        type=float,
+        required=False,
+        help="Seconds the broker assets catalog is cached for.",
+    )
+    parser.add_argument(
+        "--asset_catalog_refresh",
+        dest="asset_catalog_refresh",
+        action="store_true",
+        required=False,
+        help="Refresh the assets catalog in a background thread.",
+    )
+    parser.add_argument(
+        "--no-asset_catalog_refresh",
+        dest="asset_catalog_refresh",
+        action="store_false",
+        required=False,
+        help="Refresh the assets catalog when it expires (default).",
+    )
+    parser.set_defaults(
+        asset_catalog_refresh=ast.literal_eval(
+            os.environ.get("ASSET_CATALOG_REFRESH", "False")
+        )
+    )
+
+    parser.add_argument(
+        "--rate_limit",
+        dest="rate_limit",
+        default=float(os.getenv("RATE_LIMIT", "200")),
+        type=float,
+        required=False,
+        help="Broker trading API calls per minute.",
+    )
+    parser.add_argument(
+        "--order_workers",
+        dest="order_workers",
+        default=int(os.getenv("ORDER_WORKERS", "8")),
+        type=int,
+        required=False,
+        help="Orders submitted concurrently.",
+    )
+
     a = parser.parse_args()
 
     return a
@@ -3,7 +3,7 @@
 from datetime import date, datetime
 from decimal import Decimal
 import json
-from typing import Any, Optional, Union
+from typing import Any, Iterable, Optional, Tuple, Union
 
 
 class MessagesEncoder(json.JSONEncoder):
@@ -18,6 +18,18 @@ class MessagesEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+class PayloadEncoder(json.JSONEncoder):
+    """Encodes json for postgres, decimals as strings to keep their precision."""
+
+    def default(self, obj: Any) -> Union[str, json.JSONEncoder]:
+        """Casts object into string."""
+        if isinstance(obj, Decimal):
+            return str(obj)
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        return json.JSONEncoder.default(self, obj)
+
+
 def cast_money(s: str, cur: Any) -> Optional[Decimal]:
     """Casts money type to decimal."""
     if s is None:
@@ -55,3 +67,46 @@ def dt_to_str(dt: datetime) -> Optional[str]:
             pass
 
     return None
+
+
+def to_text(value: Any) -> str:
+    """Encodes a non NULL scalar value as postgres text input."""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, float) and value != value:
+        return "NaN"
+    if isinstance(value, dict):
+        return json.dumps(value, cls=MessagesEncoder)
+    return str(value)
+
+
+def to_array_literal(values: Union[list, tuple]) -> str:
+    """Encodes a list as a postgres array literal, every element quoted."""
+    elements = []
+    for v in values:
+        if v is None:
+            elements.append("NULL")
+        elif isinstance(v, (list, tuple)):
+            elements.append(to_array_literal(v))
+        else:
+            text = to_text(v).replace("\\", "\\\\").replace('"', '\\"')
+            elements.append('"' + text + '"')
+    return "{" + ",".join(elements) + "}"
+
+
+def to_csv_field(value: Any) -> str:
+    """Encodes a value as a postgres CSV field (empty for NULL)."""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        value = to_array_literal(value)
+    elif not isinstance(value, (str, dict)):
+        return to_text(value)
+    return '"' + to_text(value).replace('"', '""') + '"'
+
+
+def to_csv(rows: Iterable[Tuple]) -> str:
+    """Encodes rows as postgres CSV (COPY ... WITH (FORMAT CSV))."""
+    return "".join(",".join(to_csv_field(v) for v in row) + "\n" for row in rows)
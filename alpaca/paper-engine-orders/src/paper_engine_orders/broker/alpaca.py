@@ -1,15 +1,31 @@
 """Alpaca connection."""
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from decimal import Decimal
+import hashlib
 import logging
-from typing import Dict, List, Tuple
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
+from alpaca.common.exceptions import APIError
 from alpaca.data.historical import StockHistoricalDataClient, CryptoHistoricalDataClient
 from alpaca.data.requests import StockLatestQuoteRequest, CryptoLatestQuoteRequest
 from alpaca.trading.client import Order, Position, TradingClient
 from alpaca.trading.enums import AssetClass, OrderSide, TimeInForce
-from alpaca.trading.models import Asset
+from alpaca.trading.models import Asset, TradeAccount
 from alpaca.trading.requests import (
     GetAssetsRequest,
     LimitOrderRequest,
@@ -22,24 +38,247 @@ from paper_engine_orders.broker.base import Broker
 logger = logging.getLogger(__name__)
 
 
+class TokenBucket(object):
+    """Thread safe token bucket rate limiter.
+
+    Tokens are added continuously at the rate, up to the capacity (burst), and
+    each call takes one.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: int = 10) -> None:
+        """Token bucket.
+
+        Args:
+            rate_per_minute: Sustained calls per minute.
+            capacity: Calls that can be made at once after an idle period.
+        """
+        self._rate = rate_per_minute / 60
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Takes a token, waiting for one if the bucket is empty."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity, self._tokens + (now - self._updated_at) * self._rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+class _Catalog(NamedTuple):
+    symbols: FrozenSet[str]
+    shortable: FrozenSet[str]
+    easy_to_borrow: FrozenSet[str]
+    fetched_at: float  # time.monotonic()
+
+
+class AssetCatalog(object):
+    """Broker assets, fetched at most once per ttl.
+
+    Lookups are set memberships, built once per fetch. With a background
+    refresh, a daemon thread fetches the catalog before it expires, so loader
+    cycles never wait for it (a stale catalog is served if a refresh fails).
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], List[Asset]],
+        ttl: float = 3600,
+        background: bool = False,
+    ) -> None:
+        """Asset catalog.
+
+        Args:
+            fetch: Gets all the assets from the broker.
+            ttl: Seconds a fetched catalog is used for.
+            background: Refreshes the catalog in a background thread.
+        """
+        self._fetch = fetch
+        self._ttl = ttl
+        self._catalog: Optional[_Catalog] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._thread = threading.Thread(
+                target=self._run, name="asset-catalog", daemon=True
+            )
+            self._thread.start()
+
+    @property
+    def symbols(self) -> FrozenSet[str]:
+        """Symbols of all the assets."""
+        return self._get().symbols
+
+    @property
+    def shortable(self) -> FrozenSet[str]:
+        """Symbols of the shortable assets."""
+        return self._get().shortable
+
+    @property
+    def easy_to_borrow(self) -> FrozenSet[str]:
+        """Symbols of the easy to borrow assets."""
+        return self._get().easy_to_borrow
+
+    def refresh(self) -> None:
+        """Fetches the catalog from the broker."""
+        assets = self._fetch()
+        # swapped in one assignment, readers never see a partial catalog
+        self._catalog = _Catalog(
+            symbols=frozenset(a.symbol for a in assets),
+            shortable=frozenset(a.symbol for a in assets if a.shortable),
+            easy_to_borrow=frozenset(a.symbol for a in assets if a.easy_to_borrow),
+            fetched_at=time.monotonic(),
+        )
+        logger.debug(f"Asset catalog refreshed ({len(assets)} assets).")
+
+    def stop(self) -> None:
+        """Stops the background refresh."""
+        self._stop.set()
+
+    def _expired(self, catalog: Optional[_Catalog]) -> bool:
+        if catalog is None:
+            return True
+        return time.monotonic() - catalog.fetched_at >= self._ttl
+
+    def _get(self) -> _Catalog:
+        catalog = self._catalog
+        # kept fresh by the background thread, a stale catalog beats waiting
+        background = self._thread is not None
+        if catalog is not None and (background or not self._expired(catalog)):
+            return catalog
+
+        with self._lock:
+            if self._expired(self._catalog):
+                self.refresh()
+        return self._catalog
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"Asset catalog refresh failed: {e}")
+            # ahead of the expiration
+            if self._stop.wait(self._ttl * 0.8):
+                return
+
+
+class BrokerSnapshot(object):
+    """Account and positions of the broker, fetched together.
+
+    Both are requested concurrently the first time either is needed and then
+    served as is, so the figures of a cycle come from the same instant.
+    """
+
+    _account: Optional[TradeAccount]
+    _positions: Optional[List[Position]]
+
+    def __init__(self, trading_client: TradingClient) -> None:
+        """Broker snapshot.
+
+        Args:
+            trading_client: Trading client the snapshot is fetched with.
+        """
+        self._trading_client = trading_client
+        self._account = None
+        self._positions = None
+
+    def fetch(self) -> None:
+        """Fetches the account and the positions concurrently (once)."""
+        if self._account is not None:
+            return
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            account = executor.submit(self._trading_client.get_account)
+            positions = executor.submit(self._trading_client.get_all_positions)
+            self._account, self._positions = account.result(), positions.result()
+
+    @property
+    def account(self) -> TradeAccount:
+        """Trading account."""
+        self.fetch()
+        return self._account
+
+    @property
+    def positions(self) -> List[Position]:
+        """All open positions."""
+        self.fetch()
+        return self._positions
+
+
 class Alpaca(Broker):
     """Alpaca connection class."""
 
     latest_order = None
     positions: List[Position]
+    _snapshot: Optional[BrokerSnapshot] = None
 
     crypto: bool
 
-    def __init__(self, api_key: str, secret_key: str) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        secret_key: str,
+        catalog_ttl: float = 3600,
+        catalog_refresh: bool = False,
+        rate_limit: float = 200,
+        max_workers: int = 8,
+    ) -> None:
         self.trading_client = TradingClient(api_key, secret_key, paper=True)
         self.trading_stream = TradingStream(api_key, secret_key, paper=True)
 
         self.stock_data_client = StockHistoricalDataClient(api_key, secret_key)
         self.crypto_data_client = CryptoHistoricalDataClient(api_key, secret_key)
 
+        self.asset_catalog = AssetCatalog(
+            self.get_all_assets, ttl=catalog_ttl, background=catalog_refresh
+        )
+
+        # trading API calls per minute (200 per account on alpaca)
+        self.rate_limiter = TokenBucket(rate_limit)
+        self.max_workers = max_workers
+
+    @contextmanager
+    def snapshot(self) -> Iterator[BrokerSnapshot]:
+        """Scope (e.g. a loader cycle) sharing one snapshot of the broker.
+
+        Account and positions reads inside the scope are served from a single
+        snapshot, fetched on first use. Nested scopes reuse the outer one.
+        """
+        if self._snapshot is not None:
+            yield self._snapshot
+            return
+        self._snapshot = BrokerSnapshot(self.trading_client)
+        try:
+            yield self._snapshot
+        finally:
+            self._snapshot = None
+
+    def get_account(self) -> TradeAccount:
+        """Get trading account, from the snapshot inside a snapshot scope."""
+        if self._snapshot is not None:
+            return self._snapshot.account
+        return self.trading_client.get_account()
+
+    def get_broker_positions(self) -> List[Position]:
+        """Get all open positions, from the snapshot inside a snapshot scope."""
+        if self._snapshot is not None:
+            return self._snapshot.positions
+        return self.trading_client.get_all_positions()
+
     def get_account_capital(self) -> Decimal:
         """Get account capital (equity + cash)."""
-        account_capital = Decimal(self.trading_client.get_account().equity)
+        account_capital = Decimal(self.get_account().equity)
         return account_capital
 
     def get_all_assets(self) -> List[Asset]:
@@ -58,8 +297,7 @@ class Alpaca(Broker):
         """Get all available tickers from the broker."""
         if self.crypto:
             symbols = [f'{s[:-3]}/{s[-3:]}' for s in symbols]
-        assets = self.get_all_assets()
-        available_asset_ids = [a.symbol for a in assets]
+        available_asset_ids = self.asset_catalog.symbols
         tradable_asset_ids = [s for s in symbols if s in available_asset_ids]
 
         if self.crypto:
@@ -69,10 +307,7 @@ class Alpaca(Broker):
 
     def check_shortable(self, symbols: List[str]) -> List[str]:
         """Get shortable tickers."""
-        available_assets_info = self.get_all_assets()
-        easy_to_borrow_tickers = [
-            a.symbol for a in available_assets_info if a.easy_to_borrow
-        ]
+        easy_to_borrow_tickers = self.asset_catalog.easy_to_borrow
         shortable = [s for s in symbols if s in easy_to_borrow_tickers]
 
         return shortable
@@ -94,7 +329,11 @@ class Alpaca(Broker):
         return latest_asks, latest_bids
 
     def submit_order(self, order_type: str, config: Dict) -> None:
-        """Submit provided order to the broker."""
+        """Submit provided order to the broker.
+
+        A config with a client_order_id already used is an order already placed
+        (e.g. a retried request), it is not placed twice.
+        """
         if order_type == "MARKET":
             # preparing orders
             order_data = MarketOrderRequest(
@@ -102,6 +341,7 @@ class Alpaca(Broker):
                 qty=config["quantity"],
                 side=OrderSide(config["side"]),
                 time_in_force=TimeInForce.GTC,
+                client_order_id=config.get("client_order_id"),
             )
         elif order_type == "LIMIT":
             order_data = LimitOrderRequest(
@@ -110,53 +350,164 @@ class Alpaca(Broker):
                 limit_price=config["limit_price"],
                 side=OrderSide(config["side"]),
                 time_in_force=TimeInForce.GTC,
+                client_order_id=config.get("client_order_id"),
             )
         else:
             logger.info("No valid order type was provided.")
             return None
 
-        self.latest_order = self.trading_client.submit_order(order_data=order_data)
+        self.rate_limiter.acquire()
+        try:
+            self.latest_order = self.trading_client.submit_order(order_data=order_data)
+        except APIError:
+            client_order_id = config.get("client_order_id")
+            if not client_order_id or not self.order_exists(client_order_id):
+                raise
+            logger.info(f"Order {client_order_id} already placed.")
+
+    def order_exists(self, client_order_id: str) -> bool:
+        """Checks if an order with the client order id was already placed."""
+        self.rate_limiter.acquire()
+        try:
+            self.trading_client.get_order_by_client_id(client_order_id)
+        except APIError as e:
+            if e.status_code == 404:
+                return False
+            raise
+        return True
+
+    def submit_orders(self, orders: List[Dict], batch_id: Optional[str] = None) -> None:
+        """Submit provided orders to the broker, concurrently.
+
+        Returns once every order went through (or failed), so a batch of closing
+        orders is done before the opening ones are submitted.
 
-    def submit_orders(self, orders: List[Dict]) -> None:
-        """Submit provided orders to the broker."""
-        for order in orders:
+        Args:
+            orders: Orders params.
+            batch_id: Identifies the batch (e.g. the decision it executes), gives
+                each order a deterministic client_order_id so resubmitting the
+                batch never places an order twice.
+        """
+        if batch_id is not None:
+            orders = [
+                {**o, "client_order_id": self.client_order_id(batch_id, o)}
+                for o in orders
+            ]
+
+        def submit(order: Dict) -> None:
             try:
                 self.submit_order("MARKET", order)
             except Exception as e:
                 logger.warning(f"Order: {order} did not go through. {e}")
-                continue
+
+        if not orders:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(orders))) as pool:
+            list(pool.map(submit, orders))
+
+    @staticmethod
+    def client_order_id(batch_id: str, order: Dict) -> str:
+        """Deterministic client order id of an order of a batch.
+
+        The quantity is left out, it is recomputed from live prices and capital
+        when a decision is retried.
+        """
+        order_string = f"{batch_id}|{order['symbol']}|{order['side']}"
+        return hashlib.sha256(order_string.encode("utf-8")).hexdigest()[:48]
 
     def get_positions(self) -> Dict:
         """Get ticker: quantity dict."""
-        self.positions = self.trading_client.get_all_positions()
+        self.positions = self.get_broker_positions()
         res = {p.symbol: Decimal(p.qty) for p in self.positions}
         return res
 
-    def close_positions(self, portfolio_id: int, tickers: List[str]) -> List:
-        """Close positions on the provided tickers."""
-        # attempt to cancel all open orders
-        positions = self.get_positions()
-        position_tickers = list(positions.keys())
-        orders_records = []
-        if len(tickers) > 0:
-            for t in tickers:
-                if t in position_tickers:
-
-                    closed_position: Order = self.trading_client.close_position(t)
-                    side = 1 if closed_position.side == "buy" else -1
-                    asset_id_type = "CRYPTO_TICKER" if self.crypto else "STOCK_TICKER"
-                    orders_record = (
-                        portfolio_id,
-                        side,  # side
-                        asset_id_type,
-                        closed_position.symbol,
-                        datetime.utcnow(),  # order timestamp
-                        0,
-                        0,
-                        closed_position.qty,  # quantity of the order
-                        closed_position.notional,  # notional value of the order
-                    )
-                    orders_records.append(orders_record)
+    def close_positions(
+        self,
+        portfolio_id: int,
+        tickers: List[str],
+        positions: Optional[Dict] = None,
+        cancel_orders: bool = False,
+    ) -> List:
+        """Close positions on the provided tickers.
+
+        Positions are closed concurrently under the rate limiter, or with the
+        bulk close endpoint when every position is closed.
+
+        Args:
+            portfolio_id: Portfolio id of the orders records.
+            tickers: Tickers to close.
+            positions: Current positions (see get_positions), fetched if not
+                provided.
+            cancel_orders: Cancel every open order of the account (including GTC
+                orders of earlier cycles) when every position is closed.
+
+        Returns:
+            Orders records of the closing orders.
+
+        Raises:
+            RuntimeError: Some positions were not closed, once every close went
+                through (or failed).
+        """
+        if positions is None:
+            positions = self.get_positions()
+        to_close = [t for t in dict.fromkeys(tickers) if t in positions]
+        if not to_close:
+            return []
+
+        closing_orders: List[Order] = []
+        failed: Dict[str, Any] = {}
+        if len(to_close) == len(positions):
+            self.rate_limiter.acquire()
+            responses = self.trading_client.close_all_positions(
+                cancel_orders=cancel_orders
+            )
+            for r in responses:
+                if isinstance(r.body, Order):
+                    closing_orders.append(r.body)
+                else:
+                    failed[r.symbol] = r.body
+        else:
+
+            def close(ticker: str) -> Tuple[str, Any]:
+                self.rate_limiter.acquire()
+                try:
+                    return ticker, self.trading_client.close_position(ticker)
+                except Exception as e:
+                    return ticker, e
+
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(to_close))
+            ) as pool:
+                for ticker, res in pool.map(close, to_close):
+                    if isinstance(res, Exception):
+                        failed[ticker] = res
+                    else:
+                        closing_orders.append(res)
+
+        if failed:
+            for ticker, error in failed.items():
+                logger.warning(f"Position {ticker} was not closed. {error}")
+            raise RuntimeError(
+                f"Positions {sorted(failed)} were not closed "
+                f"({len(closing_orders)} closing orders placed)."
+            )
+
+        asset_id_type = "CRYPTO_TICKER" if self.crypto else "STOCK_TICKER"
+        order_ts = datetime.utcnow()  # order timestamp
+        orders_records = [
+            (
+                portfolio_id,
+                1 if o.side == "buy" else -1,  # side
+                asset_id_type,
+                o.symbol,
+                order_ts,
+                0,
+                0,
+                o.qty,  # quantity of the order
+                o.notional,  # notional value of the order
+            )
+            for o in closing_orders
+        ]
 
         return orders_records
 
@@ -2,7 +2,7 @@
 
 from abc import ABC, abstractmethod
 from decimal import Decimal
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 
 class Broker(ABC):
@@ -24,7 +24,13 @@ class Broker(ABC):
         """Get all positions."""
 
     @abstractmethod
-    def close_positions(self, portfolio_id: int, tickers: List[str]) -> List:
+    def close_positions(
+        self,
+        portfolio_id: int,
+        tickers: List[str],
+        positions: Optional[Dict] = None,
+        cancel_orders: bool = False,
+    ) -> List:
         """Close (liquidate) all positions."""
 
     @abstractmethod
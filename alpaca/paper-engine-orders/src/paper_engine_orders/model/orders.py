@@ -24,6 +24,8 @@ class Orders(State):
     real_wgt: Optional[Decimal] = None
     quantity: Optional[Decimal] = None
     notional: Optional[Decimal] = None
+    # hash of the latest model, copied by --latest_mode DERIVED
+    latest_hash: Optional[str] = None
 
     @property
     def hash(self) -> str:
@@ -83,6 +85,7 @@ class Orders(State):
         _ = record[9]  # hash
         res.event_id = record[10]
         res.delivery_id = record[11]
+        res.latest_hash = record[12]
 
         return res
 
@@ -116,4 +119,5 @@ class Orders(State):
             self.hash,
             self.event_id,
             self.delivery_id,
+            self.latest_hash,
         )
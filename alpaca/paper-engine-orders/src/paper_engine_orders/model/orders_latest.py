@@ -27,13 +27,12 @@ class OrdersLatest(State):
 
     @property
     def hash(self) -> str:
-        """Object sha256 hash value."""
+        """Object sha256 hash value (observation timestamp excluded)."""
         res = (
             f"{self.portfolio_id}, "
             f"{self.side}, "
             f"{self.asset_id_type}, "
             f"{self.asset_id}, "
-            f"{self.order_ts}, "
             f"{self.target_wgt}, "
             f"{self.real_wgt}, "
             f"{self.quantity}, "
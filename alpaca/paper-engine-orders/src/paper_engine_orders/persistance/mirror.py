@@ -0,0 +1,114 @@
+"""In-process mirror of the latest tables."""
+
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from paper_engine_orders._types import Key
+
+logger = logging.getLogger(__name__)
+
+
+class LatestMirror(object):
+    """Write-through copy of the stored hashes of the *_latest tables.
+
+    Loaded from the target the first time an entity is needed, then kept in
+    sync with the deliveries committed by this process, so the previous state
+    of the latest entities is not read again every cycle. The rows themselves
+    can also be kept, for the entities the loader reads back (see records).
+
+    The loader is expected to be the only writer of its scope (e.g. strategy
+    id): the mirror is dropped on rollback and whenever the last delivery that
+    wrote the scope, as recorded by its control row, is not the last one the
+    mirror saw (another writer), then reloaded.
+    """
+
+    _hashes: Dict[Any, Dict[Key, str]]
+    _records: Dict[Any, Dict[Key, Any]]
+    _delivery_id: Optional[int]
+    _scope: Any
+
+    def __init__(
+        self, entities: Iterable[Any], record_entities: Iterable[Any] = ()
+    ) -> None:
+        """Latest tables mirror.
+
+        Args:
+            entities: Entities that can be mirrored.
+            record_entities: Entities whose rows can be mirrored too.
+        """
+        self._entities = set(entities)
+        self._record_entities = set(record_entities)
+        self._hashes = {}
+        self._records = {}
+        self._delivery_id = None
+        self._scope = None
+
+    def sync(self, delivery_id: Optional[int], scope: Any = None) -> None:
+        """Drops the mirror if the tables moved since the last delivery it saw.
+
+        Args:
+            delivery_id: Last delivery that wrote the scope, compared for
+                equality only (delivery ids are not monotonic across writers).
+            scope: What the mirrored rows are restricted to (e.g. strategy id),
+                the mirror is dropped when it changes.
+        """
+        loaded = self._hashes or self._records
+        if loaded and (delivery_id, scope) != (self._delivery_id, self._scope):
+            logger.info(
+                f"Latest mirror stale (delivery {self._delivery_id} -> {delivery_id}),"
+                f" reloading."
+            )
+            self._hashes = {}
+            self._records = {}
+        self._delivery_id = delivery_id
+        self._scope = scope
+
+    def holds(self, entity: Any) -> bool:
+        """Checks if the entity is mirrored and loaded."""
+        return entity in self._hashes
+
+    def load(self, entity: Any, hashes: Dict[Key, str]) -> None:
+        """Loads the stored hashes of an entity (ignored if not mirrored)."""
+        if entity in self._entities:
+            self._hashes[entity] = dict(hashes)
+
+    def hashes(self, entity: Any) -> Dict[Key, str]:
+        """Gets the stored hash of each key of an entity (not a copy)."""
+        return self._hashes[entity]
+
+    def records(self, entity: Any) -> Optional[Dict[Key, Any]]:
+        """Gets the stored rows of an entity by key, None if not loaded."""
+        return self._records.get(entity)
+
+    def load_records(self, entity: Any, records: Iterable[Any]) -> None:
+        """Loads the stored rows of an entity (ignored if not mirrored)."""
+        if entity in self._record_entities:
+            self._records[entity] = {r.key: r for r in records}
+
+    def apply(self, delivery_id: int, delivery: Dict) -> None:
+        """Applies a committed delivery to the mirror.
+
+        Args:
+            delivery_id: Delivery id.
+            delivery: Records and keys to remove, by entity.
+        """
+        for entity, content in delivery.items():
+            hashes = self._hashes.get(entity)
+            if hashes is not None:
+                for r in content["records"]:
+                    hashes[r.key] = r.hash
+                for k in content["keys_to_remove"]:
+                    hashes.pop(k, None)
+            records = self._records.get(entity)
+            if records is not None:
+                for r in content["records"]:
+                    records[r.key] = r
+                for k in content["keys_to_remove"]:
+                    records.pop(k, None)
+        self._delivery_id = delivery_id
+
+    def invalidate(self) -> None:
+        """Drops the mirror, it is reloaded on next use."""
+        self._hashes = {}
+        self._records = {}
+        self._delivery_id = None
@@ -6,6 +6,24 @@ from paper_engine_orders.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Orders queries."""
 
+    TABLE = "orders"
+    KEY = ("portfolio_id", "asset_id", "order_ts")
+    COLUMNS = (
+        "portfolio_id",
+        "side",
+        "asset_id_type",
+        "asset_id",
+        "order_ts",
+        "target_wgt",
+        "real_wgt",
+        "quantity",
+        "notional",
+        "hash",
+        "event_id",
+        "delivery_id",
+        "latest_hash",
+    )
+
     LOAD_STATE = (
         "SELECT * FROM orders WHERE (portfolio_id, asset_id, order_ts) IN (VALUES %s);"
     )
@@ -20,7 +38,7 @@ class Queries(BaseQueries):
         "    real_wgt,"
         "    quantity,"
         "    notional,"
-        "    hash, event_id, delivery_id"
+        "    hash, event_id, delivery_id, latest_hash"
         ") VALUES %s "
         "ON CONFLICT (portfolio_id, asset_id, order_ts) DO "
         "UPDATE SET "
@@ -35,7 +53,8 @@ class Queries(BaseQueries):
         "    notional=EXCLUDED.notional,"
         "    hash=EXCLUDED.hash,"
         "    event_id=EXCLUDED.event_id,"
-        "    delivery_id=EXCLUDED.delivery_id;"
+        "    delivery_id=EXCLUDED.delivery_id,"
+        "    latest_hash=EXCLUDED.latest_hash;"
     )
     DELETE = (
         "DELETE FROM orders WHERE (portfolio_id, asset_id, order_ts) IN (VALUES %s);"
@@ -6,6 +6,18 @@ from paper_engine_orders.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Orders Config queries."""
 
+    TABLE = "orders_config"
+    KEY = ("portfolio_id",)
+    COLUMNS = (
+        "portfolio_id",
+        "strategy_id",
+        "portfolio_name",
+        "account_id",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
     LOAD_STATE = "SELECT * FROM orders_config WHERE (portfolio_id) IN (VALUES %s);"
     UPSERT = (
         "INSERT INTO orders_config ("
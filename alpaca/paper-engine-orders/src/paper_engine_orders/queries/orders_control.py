@@ -6,7 +6,23 @@ from paper_engine_orders.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Orders Control queries."""
 
+    TABLE = "orders_control"
+    KEY = ("portfolio_id",)
+    COLUMNS = (
+        "portfolio_id",
+        "last_read_delivery_id",
+        "last_decision_datadate",
+        "last_rebal_ts",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
     LOAD_STATE = "SELECT * FROM orders_control WHERE (portfolio_id) IN (VALUES %s);"
+    # last delivery that wrote the scope of the loader (see LatestMirror.sync)
+    LOAD_DELIVERY_ID = (
+        "SELECT delivery_id FROM orders_control WHERE portfolio_id = %s;"
+    )
     UPSERT = (
         "INSERT INTO orders_control ("
         "    portfolio_id, "
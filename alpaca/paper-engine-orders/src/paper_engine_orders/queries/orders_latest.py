@@ -6,12 +6,33 @@ from paper_engine_orders.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Orders Latest queries."""
 
+    TABLE = "orders_latest"
+    KEY = ("portfolio_id", "asset_id")
+    COLUMNS = (
+        "portfolio_id",
+        "side",
+        "asset_id_type",
+        "asset_id",
+        "order_ts",
+        "target_wgt",
+        "real_wgt",
+        "quantity",
+        "notional",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
     LOAD_STATE = (
         "SELECT * FROM orders_latest WHERE (portfolio_id, asset_id) IN (VALUES %s);"
     )
     LOAD_FULL_STATE = (
         "SELECT * FROM orders_latest;"
     )
+    LOAD_PORTFOLIO_HASHES = (
+        "SELECT portfolio_id, asset_id, hash "
+        "FROM orders_latest WHERE (portfolio_id) IN (VALUES %s);"
+    )
 
     UPSERT = (
         "INSERT INTO orders_latest ("
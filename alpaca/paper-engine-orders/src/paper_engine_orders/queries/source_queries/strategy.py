@@ -7,9 +7,10 @@ class Queries(BaseSourceQueries):
     """SOURCE strategy queries."""
 
     LOAD_LATEST_DELIVERY_METADATA = (
-        "SELECT strategy_id, delivery_id, datadate "
+        "SELECT strategy_id, MAX(delivery_id), MAX(datadate) "
         "FROM strategy_latest "
-        "WHERE strategy_id = %s;"
+        "WHERE strategy_id = %s "
+        "GROUP BY strategy_id;"
     )
 
     LOAD_LATEST = (
@@ -0,0 +1,24 @@
+CREATE TABLE indicator_state
+(
+    strategy_id                             BIGINT,
+    asset_id                                VARCHAR(20),
+    datadate                                TIMESTAMP,
+    close_price                             DOUBLE PRECISION,
+    ema_short                               DOUBLE PRECISION,
+    ema_long                                DOUBLE PRECISION,
+    ema_signal                              DOUBLE PRECISION,
+    rsi_gain                                DOUBLE PRECISION,
+    rsi_loss                                DOUBLE PRECISION,
+    -- last 4 MACD histogram values, oldest first
+    histogram                               DOUBLE PRECISION[],
+    -- decayed quantile sketch of the positive histogram values (<= 128 buckets)
+    sketch_index                            INTEGER[],
+    sketch_weight                           DOUBLE PRECISION[],
+
+    hash                                    VARCHAR NOT NULL,
+
+    event_id                                BIGINT NOT NULL UNIQUE,
+    delivery_id                             BIGINT NOT NULL,
+
+    PRIMARY KEY(strategy_id, asset_id)
+);
@@ -0,0 +1,3 @@
+-- history rows carry the hash of their latest model, which --latest_mode DERIVED
+-- copies into the *_latest tables (see BaseQueries.derive)
+ALTER TABLE strategy ADD COLUMN IF NOT EXISTS latest_hash VARCHAR;
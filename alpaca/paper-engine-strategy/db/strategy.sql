@@ -10,8 +10,36 @@ CREATE TABLE strategy
 
     hash                                    VARCHAR NOT NULL,
 
-    event_id                                BIGINT NOT NULL UNIQUE,
+    event_id                                BIGINT NOT NULL,
     delivery_id                             BIGINT NOT NULL,
+    -- hash of the latest model, copied by --latest_mode DERIVED
+    latest_hash                             VARCHAR,
 
-    PRIMARY KEY(strategy_id, asset_id_type, asset_id, datadate)
-);
+    PRIMARY KEY(strategy_id, asset_id_type, asset_id, datadate),
+    -- unique constraints of a partitioned table include the partition key
+    UNIQUE(event_id, datadate)
+) PARTITION BY RANGE (datadate);
+
+CREATE INDEX strategy_delivery_id_idx ON strategy (delivery_id);
+CREATE INDEX strategy_datadate_brin ON strategy USING BRIN (datadate);
+
+-- monthly partitions strategy_pYYYYMM are created and expired by
+-- python -m paper_engine_strategy.maintenance (daily, see README), rows outside
+-- them land here
+CREATE TABLE strategy_default PARTITION OF strategy DEFAULT;
+
+-- current month and the 3 premade by maintenance, so rows don't start in the
+-- default partition
+DO $$
+DECLARE
+    m TIMESTAMP := date_trunc('month', now() AT TIME ZONE 'UTC');
+BEGIN
+    FOR i IN 0..3 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF strategy FOR VALUES FROM (%L) TO (%L);',
+            'strategy_p' || to_char(m + make_interval(months => i), 'YYYYMM'),
+            m + make_interval(months => i),
+            m + make_interval(months => i + 1)
+        );
+    END LOOP;
+END $$;
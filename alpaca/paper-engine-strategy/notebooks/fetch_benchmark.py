@@ -0,0 +1,76 @@
+"""Benchmark of the spot prices fetch paths.
+
+Times the rows (fetchall), columnar (fetchmany) and COPY reads of the close
+prices over a lookback, against the SOURCE database.
+
+    SOURCE=postgresql://... python notebooks/fetch_benchmark.py \\
+        --schema binance --interval 1h --days 90
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import os
+import time
+
+from paper_engine_strategy.model.source_model.spot_prices import SpotPrices
+from paper_engine_strategy.persistance.source import Source
+from paper_engine_strategy.queries.source_queries import SpotPricesQueries
+
+
+def timed(label, f, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = f()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<10} {best:8.3f}s")
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default=os.environ.get("SOURCE"))
+    parser.add_argument("--schema", default="binance")
+    parser.add_argument("--interval", default="1h")
+    parser.add_argument("--days", default=90, type=int)
+    parser.add_argument("--repeat", default=3, type=int)
+    args = parser.parse_args()
+
+    source = Source(args.source)
+    source.connect()
+    start_date = datetime.utcnow() - timedelta(days=args.days)
+
+    records_query = SpotPricesQueries.LOAD_RECORDS.format(
+        schema=args.schema, interval=args.interval
+    )
+    closes_query = SpotPricesQueries.LOAD_CLOSES.format(
+        schema=args.schema, interval=args.interval
+    )
+
+    records = timed(
+        "ROWS",
+        lambda: [
+            SpotPrices.from_source(r)
+            for r in source.get_file(records_query, (start_date,))
+        ],
+        args.repeat,
+    )
+    columnar = timed(
+        "COLUMNAR",
+        lambda: source.get_price_matrix(closes_query, (start_date,)),
+        args.repeat,
+    )
+    bulk = timed(
+        "COPY",
+        lambda: source.get_price_matrix(closes_query, (start_date,), bulk=True),
+        args.repeat,
+    )
+
+    print(f"{len(records)} bars, {columnar} / {bulk}")
+    print("same prices:", columnar.to_frame().equals(bulk.to_frame()))
+    source.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,11 @@ from datetime import datetime
 import hashlib
 import logging
 import os
+import resource
 import secrets
 from sys import stdout
 import time
-from typing import Any, Dict, List, Set, Tuple, Type, Optional
+from typing import Any, Dict, List, Set, Tuple, Type, Optional, Union
 
 import paper_engine_strategy._filters as filters
 from paper_engine_strategy._types import File, Key, Keys
@@ -19,9 +20,10 @@ import paper_engine_strategy._date_helpers as date_helpers
 import paper_engine_strategy._helpers as helpers
 import paper_engine_strategy.model as model
 from paper_engine_strategy.model.base import State
+from paper_engine_strategy.model.source_model.price_matrix import PriceMatrix
 from paper_engine_strategy.model.source_model.spot_prices import SpotPrices
 from paper_engine_strategy.model.entity import Entity
-from paper_engine_strategy.persistance import source, target
+from paper_engine_strategy.persistance import cache, mirror, source, target
 import paper_engine_strategy.queries as queries
 from paper_engine_strategy.queries.base import BaseQueries
 from paper_engine_strategy.queries.source_queries import SpotPricesQueries
@@ -58,26 +60,54 @@ class Loader:
     _dry_run: bool
     _min_sleep: int
     _max_sleep: int
+    _copy_threshold: int
+    _persist_mode: str
+    _mirror: Optional[mirror.LatestMirror]
+    # latest entities derived on the server, with the entity they come from
+    _derived: Dict[Entity, Entity]
+    _price_cache: Optional[cache.PriceCache]
+    _fetch_mode: str
+    _sql_pushdown: bool
+    _itersize: int
+    _incremental_indicators: bool
+    _indicator_records: File
 
     _new_strategy: bool
+    # strategy id of the strategy hashes already persisted
+    _strategy_ids: Dict[str, int]
 
     _entities: Set[Entity] = {
         Entity.STRATEGY,
         Entity.STRATEGY_CONFIG,
         Entity.STRATEGY_CONTROL,
         Entity.STRATEGY_LATEST,
+        Entity.INDICATOR_STATE,
+    }
+    # entities mirrored in memory with --latest_mirror
+    _latest_entities: Set[Entity] = {
+        Entity.STRATEGY_LATEST,
+    }
+    # history entity of each latest entity, for --latest_mode DERIVED
+    _latest_sources: Dict[Entity, Entity] = {
+        Entity.STRATEGY_LATEST: Entity.STRATEGY,
+    }
+    # entities keyed by the time of the observation, new rows on every run
+    _history_entities: Set[Entity] = {
+        Entity.STRATEGY,
     }
     _queries: Dict[Entity, BaseQueries] = {
         Entity.STRATEGY: queries.StrategyQueries(),
         Entity.STRATEGY_CONFIG: queries.StrategyConfigQueries(),
         Entity.STRATEGY_CONTROL: queries.StrategyControlQueries(),
         Entity.STRATEGY_LATEST: queries.StrategyLatestQueries(),
+        Entity.INDICATOR_STATE: queries.IndicatorStateQueries(),
     }
     _state: Dict[Entity, Type[State]] = {
         Entity.STRATEGY: model.Strategy,
         Entity.STRATEGY_CONFIG: model.StrategyConfig,
         Entity.STRATEGY_CONTROL: model.StrategyControl,
         Entity.STRATEGY_LATEST: model.StrategyLatest,
+        Entity.INDICATOR_STATE: model.IndicatorState,
     }
     _strategies: Dict[str, BaseStrategy] = {
         "PO_HURST_EXPONENT": strat.POHurstExpStrategy,
@@ -99,12 +129,41 @@ class Loader:
         self._requires_prev_weights = args.requires_prev_weights
         self._min_sleep = args.min_sleep
         self._max_sleep = args.max_sleep
+        self._copy_threshold = args.copy_threshold
+        self._persist_mode = args.persist_mode
+        self._derived = {}
+        if args.latest_mode == "DERIVED":
+            self._derived = dict(self._latest_sources)
+        self._mirror = None
+        if args.latest_mirror and self._derived:
+            logger.warning("Latest tables derived on the server, ignoring mirror.")
+        elif args.latest_mirror:
+            self._mirror = mirror.LatestMirror(self._latest_entities)
+        self._strategy_ids = {}
 
         # prepare persistence FROM
         self._source = source.Source(args.source)
 
         # prepare persistence
-        self._target = target.Target(args.target)
+        self._target = target.Target(args.target, id_block_size=args.id_block_size)
+
+        # prices cache
+        self._price_cache = None
+        if args.price_cache:
+            self._price_cache = cache.PriceCache(args.price_cache_dir)
+            self._price_cache.load()
+
+        self._sql_pushdown = args.sql_pushdown
+        self._fetch_mode = args.fetch_mode
+        self._itersize = args.itersize
+        if self._price_cache and self._fetch_mode != "ROWS":
+            logger.warning(
+                f"Prices cache enabled, ignoring {self._fetch_mode} fetch mode."
+            )
+            self._fetch_mode = "ROWS"
+
+        self._incremental_indicators = args.incremental_indicators
+        self._indicator_records = []
 
         if self._requires_prev_weights:
             # ALPACA CONNECTION
@@ -180,11 +239,17 @@ class Loader:
         """Runs the synchronization process once."""
         start_time: datetime = datetime.utcnow()
         end_time: datetime
+        # ru_maxrss is the high-water mark of the process (KiB on linux)
+        start_peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
 
         logger.debug("Resolving Strategy ID...")
         self._new_strategy = False
         strategy_hash = self.get_strat_hash()
-        self._strategy_id = self._target.get_strategy_id(strategy_hash)
+        self._strategy_id = self._strategy_ids.get(strategy_hash)
+        if not self._strategy_id:
+            self._strategy_id = self._target.get_strategy_id(strategy_hash)
+            if self._strategy_id:
+                self._strategy_ids[strategy_hash] = self._strategy_id
         if not self._strategy_id:
             self._new_strategy = True
             self._strategy_id = self._target.get_next_strategy_id()
@@ -204,43 +269,56 @@ class Loader:
 
         control_records: File = [(self._strategy_id, datetime.utcnow())]
 
+        files: Dict[Entity, File] = {
+            Entity.STRATEGY: strategy_records,
+            Entity.STRATEGY_LATEST: strategy_records,
+            Entity.STRATEGY_CONFIG: config_records,
+            Entity.STRATEGY_CONTROL: control_records,
+        }
+        if self._incremental_indicators:
+            files[Entity.INDICATOR_STATE] = self._indicator_records
+
+        # event ids of every entity in one round trip
+        self._target.reserve_event_ids(sum(len(f) for f in files.values()))
+        prev_hashes = self.prefetch_hashes(files)
+
         delivery_id: int = self._target.get_next_delivery_id()
         delivery: Dict = {
-            Entity.STRATEGY: self.process(
-                delivery_id=delivery_id,
-                entity=Entity.STRATEGY,
-                file=strategy_records
-            ),
-            Entity.STRATEGY_LATEST: self.process(
-                delivery_id=delivery_id,
-                entity=Entity.STRATEGY_LATEST,
-                file=strategy_records,
-            ),
-            Entity.STRATEGY_CONFIG: self.process(
+            entity: self.process(
                 delivery_id=delivery_id,
-                entity=Entity.STRATEGY_CONFIG,
-                file=config_records,
-            ),
-            Entity.STRATEGY_CONTROL: self.process(
-                delivery_id=delivery_id,
-                entity=Entity.STRATEGY_CONTROL,
-                file=control_records,
-            ),
+                entity=entity,
+                file=file,
+                prev_hashes=prev_hashes[entity],
+            )
+            for entity, file in files.items()
         }
 
         # persist delivery
-        if not self._dry_run:
-            self.persist_delivery(
-                delivery_id=delivery_id,
-                start_time=start_time,
-                delivery=delivery,
-            )
+        if not self.has_changes(delivery) and self.advance_watermark(delivery):
+            logger.info(f"Delivery {delivery_id}: no changes, watermark advanced.")
+        elif not self._dry_run:
+            try:
+                self.persist_delivery(
+                    delivery_id=delivery_id,
+                    start_time=start_time,
+                    delivery=delivery,
+                )
+            except Exception:
+                self._target.rollback_transaction()
+                if self._mirror:
+                    self._mirror.invalidate()
+                raise
+            if self._mirror:
+                self._mirror.apply(delivery_id, delivery)
 
         del delivery, strategy_data
 
         end_time = datetime.utcnow()
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
         logger.info(
-            f"Delivery {delivery_id}: processed ({end_time - start_time} seconds)."
+            f"Delivery {delivery_id}: processed ({end_time - start_time} seconds, "
+            f"process peak RSS {peak_rss / 1024:.0f} MiB, "
+            f"+{(peak_rss - start_peak_rss) / 1024:.0f} MiB this delivery)."
         )
 
     def check_new_data(self):
@@ -264,19 +342,149 @@ class Loader:
         else:
             return None
 
-    def get_strategy_data(self, latest_date) -> List[SpotPrices]:
+    def get_strategy_data(self, latest_date) -> Union[List[SpotPrices], PriceMatrix]:
         if self._asset_type == "CRYPTO":
             start_date = date_helpers.go_days_back(latest_date, n=self._lookback)
         else:
             start_date = date_helpers.go_business_days_back(latest_date, n=self._lookback)
         schema = self._schemas[self._asset_type]
-        query = SpotPricesQueries.LOAD_RECORDS.format(schema=schema, interval=self._interval)
 
-        raw_records = self._source.get_file(query, variable=(start_date,))
+        if self._fetch_mode in ("COLUMNAR", "COPY"):
+            query = self.get_prices_query(SpotPricesQueries.CLOSE_COLUMNS).format(
+                schema=schema, interval=self._interval
+            )
+            matrix = self._source.get_price_matrix(
+                query,
+                variable=self.get_prices_variable(start_date),
+                bulk=self._fetch_mode == "COPY",
+            )
+            logger.debug(f"Fetched {matrix}.")
+            return matrix
+
+        if self._fetch_mode == "STREAM":
+            query = self.get_prices_query(SpotPricesQueries.CLOSE_COLUMNS).format(
+                schema=schema, interval=self._interval
+            )
+            matrix = self._source.stream_price_matrix(
+                query,
+                variable=self.get_prices_variable(start_date),
+                itersize=self._itersize,
+            )
+            logger.debug(f"Streamed {matrix}.")
+            return matrix
+
+        query = self.get_prices_query(SpotPricesQueries.RECORD_COLUMNS).format(
+            schema=schema, interval=self._interval
+        )
+
+        if not self._price_cache:
+            raw_records = self._source.get_file(
+                query, variable=self.get_prices_variable(start_date)
+            )
+            records = [SpotPrices.from_source(r) for r in raw_records]
+            return records
+
+        # symbols are already mapped to alpaca when pushed down
+        cache_schema = f"{schema}/universe" if self._sql_pushdown else schema
+        watermarks = self._price_cache.watermarks(
+            cache_schema, self._interval, start_date
+        )
+        frontier = max(watermarks.values(), default=start_date)
+        raw_records = self._source.get_file(
+            query, variable=self.get_prices_variable(frontier)
+        )
         records = [SpotPrices.from_source(r) for r in raw_records]
-        return records
+        logger.debug(f"Fetched {len(records)} bars past {frontier}.")
+
+        if watermarks:
+            # symbols behind the frontier (lagging or delisted) catch up from
+            # their own watermark, symbols new to the cache get the lookback
+            behind = {s: w for s, w in watermarks.items() if w < frontier}
+            for r in records:
+                if r.symbol not in watermarks:
+                    behind[r.symbol] = start_date
+            if behind:
+                records += self.get_bars_past(schema, behind)
+
+        self._price_cache.update(cache_schema, self._interval, start_date, records)
+        self._price_cache.save()
+
+        return self._price_cache.records(cache_schema, self._interval)
+
+    def get_bars_past(
+        self, schema: str, watermarks: Dict[str, datetime]
+    ) -> List[SpotPrices]:
+        """Gets the bars past a watermark per symbol.
+
+        Args:
+            schema: Source schema.
+            watermarks: Open time past which bars are fetched, by cache symbol.
+
+        Returns:
+            Bars of the provided symbols.
+        """
+        alpaca_symbols = self._sql_pushdown and self._asset_type == "CRYPTO"
+        query = SpotPricesQueries.load(
+            SpotPricesQueries.RECORD_COLUMNS,
+            required=(
+                SpotPricesQueries.STRATEGY_COLUMNS
+                if self._sql_pushdown
+                else SpotPricesQueries.RECORD_COLUMNS
+            ),
+            alpaca_symbols=alpaca_symbols,
+            watermarks=True,
+        ).format(schema=schema, interval=self._interval)
+        symbols = [
+            helpers.alpaca_2_binance_symbol(s) if alpaca_symbols else s
+            for s in watermarks.keys()
+        ]
+        raw_records = self._source.get_file(
+            query, variable=(symbols, list(watermarks.values()))
+        )
+        logger.debug(
+            f"Fetched {len(raw_records)} bars of {len(symbols)} symbols behind."
+        )
+
+        return [SpotPrices.from_source(r) for r in raw_records]
+
+    def get_prices_query(self, layout: Tuple[str, ...]) -> str:
+        """Gets the spot prices query for the provided layout.
+
+        Args:
+            layout: Columns of the result (see SpotPricesQueries).
+
+        Returns:
+            Query with {schema} and {interval} placeholders.
+        """
+        float_prices = layout == SpotPricesQueries.CLOSE_COLUMNS
+        if not self._sql_pushdown:
+            if float_prices:
+                return SpotPricesQueries.LOAD_CLOSES
+            return SpotPricesQueries.LOAD_RECORDS
+
+        return SpotPricesQueries.load(
+            layout,
+            required=SpotPricesQueries.STRATEGY_COLUMNS,
+            universe=True,
+            alpaca_symbols=self._asset_type == "CRYPTO",
+            float_prices=float_prices,
+        )
+
+    def get_prices_variable(self, start_date: datetime) -> Tuple:
+        """Gets the spot prices query parameters."""
+        if not self._sql_pushdown:
+            return (start_date,)
+
+        if self._asset_type == "CRYPTO":
+            universe = [helpers.alpaca_2_binance_symbol(s) for s in filters.CRYPTO]
+        else:
+            universe = list(filters.STOCK)
+        return (start_date, universe)
+
+    def filter_data(self, strategy_data: Union[List[SpotPrices], PriceMatrix]):
+        if isinstance(strategy_data, PriceMatrix):
+            return self.filter_matrix(strategy_data)
 
-    def filter_data(self, strategy_data: List[SpotPrices]):
         if self._asset_type == "STOCK":
             res = [s for s in strategy_data if s.symbol in filters.STOCK]
         elif self._asset_type == "CRYPTO":
@@ -288,11 +496,39 @@ class Loader:
             return None
         return res
 
+    def filter_matrix(self, matrix: PriceMatrix) -> Optional[PriceMatrix]:
+        """Same as filter_data, on the columns of a prices matrix."""
+        if self._asset_type == "STOCK":
+            symbols = matrix.symbols
+            universe = set(filters.STOCK)
+        elif self._asset_type == "CRYPTO":
+            symbols = [
+                helpers.binance_2_alpaca_symbol(s) if s[-4:] == "USDT" else s
+                for s in matrix.symbols
+            ]
+            universe = set(filters.CRYPTO)
+        else:
+            return None
+
+        columns = [i for i, s in enumerate(symbols) if s in universe]
+        return matrix.take(columns, [symbols[i] for i in columns])
+
     def run_strategy(self, data) -> File:
         prev_wgts = self._broker.get_current_weights()
 
+        indicator_state = None
+        if self._incremental_indicators:
+            indicator_state = self.get_indicator_state()
+
         strategy = self._strategy.setup(self._strategy_config)
-        raw_strategy_records = strategy.get_weights(data, prev_wgts)
+        raw_strategy_records = strategy.get_weights(
+            data, prev_wgts, indicator_state=indicator_state
+        )
+        if self._incremental_indicators:
+            self._indicator_records = model.IndicatorState.records_from_indicators(
+                self._strategy_id, strategy.indicator_state
+            )
+
         strategy_records = [
             [
                 self._strategy_id,
@@ -307,6 +543,20 @@ class Loader:
         ]
         return strategy_records
 
+    def get_indicator_state(self) -> Dict[str, Dict[str, Any]]:
+        """Gets the persisted indicator state of the strategy, by asset."""
+        if self._new_strategy:
+            return {}
+
+        records = self._target.get_current_state(
+            query=queries.IndicatorStateQueries.LOAD_STRATEGY_STATE,
+            args=[(self._strategy_id,)],
+        )
+        states = [model.IndicatorState.from_target(r) for r in records]
+        logger.debug(f"Loaded indicator state of {len(states)} assets.")
+
+        return {s.asset_id: s.as_indicators() for s in states}
+
     def get_strat_hash(self) -> str:
         """Get portfolio_optimization hash from portfolio_optimization params."""
         ordered_keys = sorted(self._strategy_config.keys())
@@ -337,54 +587,166 @@ class Loader:
         ]
         return config_records
 
-    def process(self, delivery_id: int, entity: Entity, file: File) -> Optional[Dict]:
+    def prefetch_hashes(
+        self, files: Dict[Entity, File]
+    ) -> Dict[Entity, Dict[Key, str]]:
+        """Gets the stored hashes of the previous state of a delivery.
+
+        One query for all the entities, returning key tuples and hashes
+        without building the state objects. With --latest_mirror, the latest
+        entities are read once and then served from memory.
+
+        Args:
+            files: Records of each entity of the delivery.
+
+        Returns:
+            By entity, the stored hash of each key.
+        """
+        mirrored: Dict[Entity, Dict[Key, str]] = {}
+        if self._mirror:
+            self._mirror.sync(
+                self._target.get_scope_delivery_id(
+                    queries.StrategyControlQueries.LOAD_DELIVERY_ID,
+                    (self._strategy_id,),
+                ),
+                scope=self._strategy_id,
+            )
+            mirrored = {
+                e: self._mirror.hashes(e) for e in files if self._mirror.holds(e)
+            }
+
+        queries: Dict[Entity, Tuple[str, str, Tuple[str, ...], Optional[Keys]]] = {}
+        for entity, file in files.items():
+            if entity in mirrored:
+                continue
+            query: BaseQueries = self._queries[entity]
+            if entity in (Entity.STRATEGY_LATEST, Entity.INDICATOR_STATE):
+                # every key of this strategy, assets it no longer holds are
+                # removed
+                queries[entity] = (
+                    query.LOAD_STRATEGY_HASHES,
+                    query.TABLE,
+                    query.KEY,
+                    [(self._strategy_id,)],
+                )
+            else:
+                keys = self._state[entity].list_ids_from_source(records=file)
+                queries[entity] = (query.load_hashes(), query.TABLE, query.KEY, keys)
+
+        res = self._target.get_current_hashes(queries)
+        if self._mirror:
+            for entity, hashes in res.items():
+                self._mirror.load(entity, hashes)
+        res.update(mirrored)
+
+        return res
+
+    def process(
+        self,
+        delivery_id: int,
+        entity: Entity,
+        file: File,
+        prev_hashes: Dict[Key, str],
+    ) -> Optional[Dict]:
         """Processes entity records present in delivery.
 
         Args:
             delivery_id: Delivery id.
             entity: Entity type.
             file: Entity records.
+            prev_hashes: Stored hash by key of the previous state of the
+                entity (see prefetch_hashes).
 
         Returns:
             A dictionary with records and keys to remove.
         """
         logger.info(f"Delivery {delivery_id}: processing {entity}...")
 
-        query: BaseQueries = self._queries[entity]
         state_type: Type[State] = self._state[entity]
+        prev_keys: List[Key] = list(prev_hashes.keys())
 
-        # previous state
-        keys: Keys = state_type.list_ids_from_source(records=file)
-        # fetch records from state with keys
-        if entity == Entity.STRATEGY_LATEST:
-            prev_state: List[Tuple] = self._target.get_current_state(
-                query=query.LOAD_FULL_STATE
-            )
-        else:
-            prev_state: List[Tuple] = self._target.get_current_state(
-                query=query.LOAD_STATE, args=keys
-            )
-        prev_keys: List[Key] = [
-            state_type.from_target(record=r).key for r in prev_state
-        ]
-
-        # current state
+        # current state, unchanged records are not written again
         curr_records: List[State] = [
             state_type.from_source(record=record) for record in file
         ]
+        curr_keys: List[Key] = [r.key for r in curr_records]
+        for latest_entity, source_entity in self._derived.items():
+            if source_entity == entity:
+                # the server derives the latest rows from these, with the hash
+                # of the latest model (see BaseQueries.derive)
+                latest_type: Type[State] = self._state[latest_entity]
+                for r, record in zip(curr_records, file):
+                    r.latest_hash = latest_type.from_source(record=record).hash
+        n_records = len(curr_records)
+        curr_records = [r for r in curr_records if prev_hashes.get(r.key) != r.hash]
+        if len(curr_records) < n_records:
+            logger.info(
+                f"Delivery {delivery_id}: {n_records - len(curr_records)} unchanged "
+                f"{entity} records suppressed."
+            )
 
-        it_event_id = self._target.get_next_event_id(n=len(curr_records))
-        for r, event_id in zip(curr_records, it_event_id):
-            r.event_id = event_id
+        # derived records keep the event id of their history row
+        n_ids = 0 if entity in self._derived else len(curr_records)
+        it_event_id = self._target.get_next_event_id(n=n_ids)
+        for r in curr_records:
+            r.event_id = next(it_event_id, None)
             r.delivery_id = delivery_id
 
-        curr_keys: List[Key] = [r.key for r in curr_records]
         keys_to_remove: List[Key] = list(set(prev_keys) - set(curr_keys))
 
         del file
 
         return {"records": curr_records, "keys_to_remove": keys_to_remove}
 
+    def has_changes(self, delivery: Dict) -> bool:
+        """Checks if a delivery changes anything besides its watermarks.
+
+        The control record and the history rows move on every run, they only
+        count along with a change of the other entities (see advance_watermark).
+        """
+        return any(
+            content["records"] or content["keys_to_remove"]
+            for entity, content in delivery.items()
+            if entity not in self._history_entities
+            and entity != Entity.STRATEGY_CONTROL
+        )
+
+    def advance_watermark(self, delivery: Dict) -> bool:
+        """Moves the control watermark of a delivery without persisting it.
+
+        A single row update of the stored control record, which keeps the event
+        and delivery ids of the last delivery persisted.
+
+        Args:
+            delivery: Delivery without changes (see has_changes).
+
+        Returns:
+            False if there is no control record to update yet, the delivery
+            has to be persisted.
+        """
+        if self._dry_run:
+            return True
+
+        for r in delivery[Entity.STRATEGY_CONTROL]["records"]:
+            try:
+                self._target.begin_transaction()
+                n_rows = self._target.execute_query(
+                    queries.StrategyControlQueries.ADVANCE,
+                    {
+                        "strategy_id": r.strategy_id,
+                        "last_decision_ts": r.last_decision_date,
+                        "hash": r.hash,
+                    },
+                )
+                self._target.commit_transaction()
+            except Exception:
+                self._target.rollback_transaction()
+                raise
+            if not n_rows:
+                return False
+
+        return True
+
     def persist_delivery(
         self,
         delivery_id: int,
@@ -398,14 +760,19 @@ class Loader:
             start_time: Time delivery started.
             delivery: Delivery to process.
         """
+        if self._persist_mode == "FUNCTION":
+            self.persist_function(delivery_id, start_time, delivery)
+            return
+
         self._target.begin_transaction()
 
         for entity, content in delivery.items():
             self.persist_postgres(
                 entity=entity,
-                records=content["records"],
+                records=[] if entity in self._derived else content["records"],
                 keys_to_remove=content["keys_to_remove"],
             )
+        self.derive_latest(delivery_id, delivery)
 
         end_time: datetime = datetime.utcnow()
         self._target.persist_delivery(
@@ -419,6 +786,76 @@ class Loader:
         self._target.commit_transaction()
         logger.info(f"Delivery {delivery_id}: persisted to postgres.")
 
+    def persist_function(
+        self,
+        delivery_id: int,
+        start_time: datetime,
+        delivery: Dict,
+    ) -> None:
+        """Persists a delivery in a single call to a server-side function.
+
+        Args:
+            delivery_id: Delivery id.
+            start_time: Time delivery started.
+            delivery: Delivery to process.
+        """
+        entities = []
+        for entity, content in delivery.items():
+            query: BaseQueries = self._queries[entity]
+            records = []
+            for r in [] if entity in self._derived else content["records"]:
+                record = dict(zip(query.COLUMNS, r.as_tuple()))
+                for column in query.JSON_COLUMNS:
+                    if record[column] is not None:
+                        record[column] = json.loads(record[column])
+                records.append(record)
+            entities.append(
+                {
+                    "table": query.TABLE,
+                    "key": query.KEY,
+                    "columns": query.COLUMNS,
+                    "records": records,
+                    "keys_to_remove": [
+                        dict(zip(query.KEY, k)) for k in content["keys_to_remove"]
+                    ],
+                }
+            )
+
+        runtime = datetime.utcnow() - start_time
+        self._target.begin_transaction()
+        self._target.persist_delivery_payload(
+            {
+                "entities": entities,
+                "delivery": {
+                    "delivery_id": delivery_id,
+                    "delivery_ts": datetime.utcnow(),
+                    "runtime": f"{runtime.total_seconds()} seconds",
+                },
+            }
+        )
+        self.derive_latest(delivery_id, delivery)
+        self._target.commit_transaction()
+        logger.info(f"Delivery {delivery_id}: persisted to postgres (function).")
+
+    def derive_latest(self, delivery_id: int, delivery: Dict) -> None:
+        """Upserts the derived latest tables from the history rows of a delivery.
+
+        Runs in the transaction of the delivery, after its history rows.
+
+        Args:
+            delivery_id: Delivery id.
+            delivery: Delivery being persisted.
+        """
+        for entity, source_entity in self._derived.items():
+            if entity not in delivery or not delivery[entity]["records"]:
+                continue
+            query: BaseQueries = self._queries[entity]
+            source_query: BaseQueries = self._queries[source_entity]
+            n_rows = self._target.execute_query(
+                query.derive(source_query.TABLE), {"delivery_id": delivery_id}
+            )
+            logger.debug(f"Delivery {delivery_id}: {n_rows} {entity} rows derived.")
+
     def persist_postgres(
         self, entity: Entity, records: List[State], keys_to_remove: Keys
     ) -> None:
@@ -431,28 +868,41 @@ class Loader:
         """
         query: BaseQueries = self._queries[entity]
 
-        # if multiple instructions have the same primary key
-        # db instructions can't be in batch
-        batch_records = len(set(r.key for r in records)) == len(records)
+        # an upsert batch can't hold the same primary key twice, only the last
+        # write of each key is kept
+        n_records = len(records)
+        records = State.last_writes(records)
+        if len(records) < n_records:
+            logger.debug(
+                f"{entity}: {n_records - len(records)} overwritten records dropped."
+            )
 
         # PERSIST RECORDS
-        if batch_records:
+        if len(records) >= self._copy_threshold:
+            self._target.copy_upsert(
+                table=query.TABLE,
+                columns=query.COLUMNS,
+                key=query.KEY,
+                logs=[r.as_tuple() for r in records],
+            )
+        else:
             self._target.execute(
                 instruction=query.UPSERT,
                 logs=[r.as_tuple() for r in records],
             )
-        else:
-            for r in records:
-                self._target.execute(
-                    instruction=query.UPSERT,
-                    logs=[r.as_tuple()],
-                )
 
         # REMOVE
-        self._target.execute(
-            instruction=query.DELETE,
-            logs=[k for k in keys_to_remove],
-        )
+        if len(keys_to_remove) >= self._copy_threshold:
+            self._target.copy_delete(
+                table=query.TABLE,
+                key=query.KEY,
+                keys_to_remove=list(keys_to_remove),
+            )
+        else:
+            self._target.execute(
+                instruction=query.DELETE,
+                logs=[k for k in keys_to_remove],
+            )
 
 
 def parse_args() -> argparse.Namespace:
@@ -615,6 +1065,151 @@ def parse_args() -> argparse.Namespace:
     )
 
 
+    parser.add_argument(
+        "--price_cache",
+        dest="price_cache",
+        action="store_true",
+        required=False,
+        help="Enable incremental in-process prices cache.",
+    )
+    parser.add_argument(
+        "--no-price_cache",
+        dest="price_cache",
+        action="store_false",
+        required=False,
+        help="Disable incremental in-process prices cache (default).",
+    )
+    parser.set_defaults(price_cache=ast.literal_eval(os.environ.get("PRICE_CACHE", "False")))
+
+    parser.add_argument(
+        "--price_cache_dir",
+        dest="price_cache_dir",
+        default=os.getenv("PRICE_CACHE_DIR"),
+        type=str,
+        required=False,
+        help="Local directory for prices cache snapshots (disabled if not set).",
+    )
+
+    parser.add_argument(
+        "--sql_pushdown",
+        dest="sql_pushdown",
+        action="store_true",
+        required=False,
+        help="Filter the symbols universe and columns in the source query.",
+    )
+    parser.add_argument(
+        "--no-sql_pushdown",
+        dest="sql_pushdown",
+        action="store_false",
+        required=False,
+        help="Fetch every symbol and column, filter in the loader (default).",
+    )
+    parser.set_defaults(
+        sql_pushdown=ast.literal_eval(os.environ.get("SQL_PUSHDOWN", "False"))
+    )
+
+    parser.add_argument(
+        "--fetch_mode",
+        dest="fetch_mode",
+        default=os.getenv("FETCH_MODE", "ROWS"),
+        choices=["ROWS", "COLUMNAR", "COPY", "STREAM"],
+        type=str,
+        required=False,
+        help="Prices fetch mode: one object per bar (ROWS), "
+        "a dense close prices matrix (COLUMNAR), "
+        "the same matrix read with COPY TO STDOUT (COPY) "
+        "or filled chunk by chunk from a server-side cursor (STREAM).",
+    )
+    parser.add_argument(
+        "--itersize",
+        dest="itersize",
+        default=int(os.getenv("ITERSIZE", "100000")),
+        type=int,
+        required=False,
+        help="Rows per round trip of the STREAM fetch mode.",
+    )
+
+    parser.add_argument(
+        "--incremental_indicators",
+        dest="incremental_indicators",
+        action="store_true",
+        required=False,
+        help="Resume RSI/MACD from the persisted indicator state.",
+    )
+    parser.add_argument(
+        "--no-incremental_indicators",
+        dest="incremental_indicators",
+        action="store_false",
+        required=False,
+        help="Recompute RSI/MACD over the whole lookback every cycle (default).",
+    )
+    parser.set_defaults(
+        incremental_indicators=ast.literal_eval(
+            os.environ.get("INCREMENTAL_INDICATORS", "False")
+        )
+    )
+
+    parser.add_argument(
+        "--copy_threshold",
+        dest="copy_threshold",
+        default=int(os.getenv("COPY_THRESHOLD", "1000")),
+        type=int,
+        required=False,
+        help="Records from which an entity is persisted with COPY into a staging table.",
+    )
+
+    parser.add_argument(
+        "--id_block_size",
+        dest="id_block_size",
+        default=int(os.getenv("ID_BLOCK_SIZE", "1")),
+        type=int,
+        required=False,
+        help="Delivery and event ids reserved per round trip.",
+    )
+
+    parser.add_argument(
+        "--persist_mode",
+        dest="persist_mode",
+        default=os.getenv("PERSIST_MODE", "STATEMENTS"),
+        choices=["STATEMENTS", "FUNCTION"],
+        type=str,
+        required=False,
+        help="Persist a delivery with one statement per entity (STATEMENTS) "
+        "or in one call to persist_delivery_strategy (FUNCTION).",
+    )
+
+    parser.add_argument(
+        "--latest_mirror",
+        dest="latest_mirror",
+        action="store_true",
+        required=False,
+        help=(
+            "Keep the latest tables in memory, read again only on rollback or when"
+            " another writer moved them."
+        ),
+    )
+    parser.add_argument(
+        "--no-latest_mirror",
+        dest="latest_mirror",
+        action="store_false",
+        required=False,
+        help="Read the latest tables every cycle (default).",
+    )
+    parser.set_defaults(
+        latest_mirror=ast.literal_eval(os.environ.get("LATEST_MIRROR", "False"))
+    )
+
+    parser.add_argument(
+        "--latest_mode",
+        dest="latest_mode",
+        default=os.getenv("LATEST_MODE", "CLIENT"),
+        choices=["CLIENT", "DERIVED"],
+        type=str,
+        required=False,
+        help="Latest tables written by the loader (CLIENT) "
+        "or merged on the server from the history rows of the delivery (DERIVED).",
+    )
+
     a = parser.parse_args()
 
     return a
@@ -4,3 +4,8 @@
 def binance_2_alpaca_symbol(symbol: str) -> str:
     # Assuming only USDC or USDT symbols, just removing the final character
     return symbol[:-1]
+
+
+def alpaca_2_binance_symbol(symbol: str) -> str:
+    # Only USDT symbols are mapped to alpaca (see Loader.filter_data)
+    return f"{symbol}T"
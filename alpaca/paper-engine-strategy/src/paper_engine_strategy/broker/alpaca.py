@@ -1,9 +1,11 @@
 """Alpaca connection."""
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from decimal import Decimal
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 
 from alpaca.data.historical import StockHistoricalDataClient
 from alpaca.trading.client import TradingClient
@@ -15,11 +17,54 @@ from paper_engine_strategy.broker.base import Broker
 logger = logging.getLogger(__name__)
 
 
+class BrokerSnapshot(object):
+    """Account and positions of the broker, fetched together.
+
+    Both are requested concurrently the first time either is needed and then
+    served as is, so the figures of a cycle come from the same instant.
+    """
+
+    _account: Optional[TradeAccount]
+    _positions: Optional[List[Position]]
+
+    def __init__(self, trading_client: TradingClient) -> None:
+        """Broker snapshot.
+
+        Args:
+            trading_client: Trading client the snapshot is fetched with.
+        """
+        self._trading_client = trading_client
+        self._account = None
+        self._positions = None
+
+    def fetch(self) -> None:
+        """Fetches the account and the positions concurrently (once)."""
+        if self._account is not None:
+            return
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            account = executor.submit(self._trading_client.get_account)
+            positions = executor.submit(self._trading_client.get_all_positions)
+            self._account, self._positions = account.result(), positions.result()
+
+    @property
+    def account(self) -> TradeAccount:
+        """Trading account."""
+        self.fetch()
+        return self._account
+
+    @property
+    def positions(self) -> List[Position]:
+        """All open positions."""
+        self.fetch()
+        return self._positions
+
+
 class Alpaca(Broker):
     """Alpaca connection class."""
 
     latest_order = None
     positions: List[Position]
+    _snapshot: Optional[BrokerSnapshot] = None
 
     def __init__(self, api_key: str, secret_key: str) -> None:
         self.trading_client = TradingClient(api_key, secret_key, paper=True)
@@ -27,9 +72,37 @@ class Alpaca(Broker):
 
         self.data_client = StockHistoricalDataClient(api_key, secret_key)
 
+    @contextmanager
+    def snapshot(self) -> Iterator[BrokerSnapshot]:
+        """Scope (e.g. a loader cycle) sharing one snapshot of the broker.
+
+        Account and positions reads inside the scope are served from a single
+        snapshot, fetched on first use. Nested scopes reuse the outer one.
+        """
+        if self._snapshot is not None:
+            yield self._snapshot
+            return
+        self._snapshot = BrokerSnapshot(self.trading_client)
+        try:
+            yield self._snapshot
+        finally:
+            self._snapshot = None
+
+    def get_account(self) -> TradeAccount:
+        """Get trading account, from the snapshot inside a snapshot scope."""
+        if self._snapshot is not None:
+            return self._snapshot.account
+        return self.trading_client.get_account()
+
+    def get_broker_positions(self) -> List[Position]:
+        """Get all open positions, from the snapshot inside a snapshot scope."""
+        if self._snapshot is not None:
+            return self._snapshot.positions
+        return self.trading_client.get_all_positions()
+
     def get_portfolio_value(self, side: str = "ALL") -> Decimal:
         """Get portfolio value."""
-        account: TradeAccount = self.trading_client.get_account()
+        account: TradeAccount = self.get_account()
         if side == "LONG":
             return Decimal(account.long_market_value)
         elif side == "SHORT":
@@ -39,7 +112,7 @@ class Alpaca(Broker):
 
     def get_all_positions(self) -> Optional[Dict]:
         """Get ticker: quantity dict."""
-        self.positions = self.trading_client.get_all_positions()
+        self.positions = self.get_broker_positions()
         res = {
             p.symbol: {
                 "quantity": p.qty,
@@ -51,9 +124,10 @@ class Alpaca(Broker):
         return res if res else None
 
     def get_current_weights(self) -> Optional[List[List]]:
-        positions = self.get_all_positions()
-        long_value = self.get_portfolio_value("LONG")
-        short_value = self.get_portfolio_value("SHORT")
+        with self.snapshot():
+            positions = self.get_all_positions()
+            long_value = self.get_portfolio_value("LONG")
+            short_value = self.get_portfolio_value("SHORT")
 
         if not positions:
             return None
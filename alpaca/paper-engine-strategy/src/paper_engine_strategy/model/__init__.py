@@ -1,11 +1,13 @@
 """Data model."""
 
+from .indicator_state import IndicatorState
 from .strategy import Strategy
 from .strategy_config import StrategyConfig
 from .strategy_control import StrategyControl
 from .strategy_latest import StrategyLatest
 
 __all__ = [
+    "IndicatorState",
     "Strategy",
     "StrategyConfig",
     "StrategyControl",
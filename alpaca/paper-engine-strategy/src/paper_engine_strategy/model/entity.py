@@ -10,6 +10,7 @@ class Entity(str, Enum):
     STRATEGY_CONFIG = "strategy_config"
     STRATEGY_CONTROL = "strategy_control"
     STRATEGY_LATEST = "strategy_latest"
+    INDICATOR_STATE = "indicator_state"
 
     def __repr__(self) -> str:
         return str(self.value)
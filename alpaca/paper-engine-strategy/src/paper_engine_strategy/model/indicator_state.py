@@ -0,0 +1,176 @@
+"""Indicator State data model."""
+
+from datetime import datetime
+from hashlib import sha256
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from paper_engine_strategy._types import Key, Keys, Record
+from paper_engine_strategy.model.base import State
+
+logger = logging.getLogger(__name__)
+
+
+class IndicatorState(State):
+    """Indicator State state."""
+
+    strategy_id: int  # entity key
+    asset_id: str
+    datadate: Optional[datetime] = None
+    # recursions at datadate
+    close_price: Optional[float] = None
+    ema_short: Optional[float] = None
+    ema_long: Optional[float] = None
+    ema_signal: Optional[float] = None
+    rsi_gain: Optional[float] = None
+    rsi_loss: Optional[float] = None
+    # last histogram values, oldest first
+    histogram: Optional[List[float]] = None
+    # quantile sketch of the positive histogram values, weight by bucket
+    sketch_index: Optional[List[int]] = None
+    sketch_weight: Optional[List[float]] = None
+
+    @property
+    def hash(self) -> str:
+        """Object sha256 hash value."""
+        res = (
+            f"{self.strategy_id}, "
+            f"{self.asset_id}, "
+            f"{self.datadate}, "
+            f"{self.close_price}, "
+            f"{self.ema_short}, "
+            f"{self.ema_long}, "
+            f"{self.ema_signal}, "
+            f"{self.rsi_gain}, "
+            f"{self.rsi_loss}, "
+            f"{self.histogram}, "
+            f"{self.sketch_index}, "
+            f"{self.sketch_weight}"
+        )
+
+        return sha256(res.encode("utf-8")).hexdigest()
+
+    @property
+    def key(self) -> Key:
+        """Object key."""
+        return (
+            self.strategy_id,
+            self.asset_id,
+        )
+
+    @classmethod
+    def from_source(cls, record: Record) -> "IndicatorState":
+        """Creates object from source record."""
+        res = cls()
+        res.event_id = None
+        res.delivery_id = None
+        res.strategy_id = record[0]  # entity key
+        res.asset_id = record[1]
+        res.datadate = record[2]
+        res.close_price = record[3]
+        res.ema_short = record[4]
+        res.ema_long = record[5]
+        res.ema_signal = record[6]
+        res.rsi_gain = record[7]
+        res.rsi_loss = record[8]
+        res.histogram = record[9]
+        res.sketch_index = record[10]
+        res.sketch_weight = record[11]
+
+        return res
+
+    @classmethod
+    def from_target(cls, record: Tuple) -> "IndicatorState":
+        """Creates object from target record."""
+        res = cls()
+        res.strategy_id = record[0]
+        res.asset_id = record[1]
+        res.datadate = record[2]
+        res.close_price = record[3]
+        res.ema_short = record[4]
+        res.ema_long = record[5]
+        res.ema_signal = record[6]
+        res.rsi_gain = record[7]
+        res.rsi_loss = record[8]
+        res.histogram = record[9]
+        res.sketch_index = record[10]
+        res.sketch_weight = record[11]
+        _ = record[12]  # hash
+        res.event_id = record[13]
+        res.delivery_id = record[14]
+
+        return res
+
+    @classmethod
+    def removal_instance(
+        cls, event_id: int, delivery_id: int, key: Key
+    ) -> "IndicatorState":
+        """Creates an empty object instance (for removal event logs)."""
+        res = cls()
+        res.event_id = event_id
+        res.delivery_id = delivery_id
+        (res.strategy_id, res.asset_id) = key
+
+        return res
+
+    @staticmethod
+    def list_ids_from_source(records: List[Record]) -> Keys:
+        """Creates a list with all entity keys from source file."""
+        return [(r[0], r[1]) for r in records]
+
+    @staticmethod
+    def records_from_indicators(
+        strategy_id: int, indicator_state: Dict[str, Dict[str, Any]]
+    ) -> List[Record]:
+        """Creates source records from the strategy indicator state."""
+        return [
+            (
+                strategy_id,
+                asset_id,
+                s["datadate"],
+                s["close_price"],
+                s["ema_short"],
+                s["ema_long"],
+                s["ema_signal"],
+                s["rsi_gain"],
+                s["rsi_loss"],
+                s["histogram"],
+                sorted(s["sketch"]),
+                [s["sketch"][i] for i in sorted(s["sketch"])],
+            )
+            for asset_id, s in indicator_state.items()
+        ]
+
+    def as_indicators(self) -> Dict[str, Any]:
+        """Returns the indicator state in the format used by the strategy."""
+        return {
+            "datadate": self.datadate,
+            "close_price": self.close_price,
+            "ema_short": self.ema_short,
+            "ema_long": self.ema_long,
+            "ema_signal": self.ema_signal,
+            "rsi_gain": self.rsi_gain,
+            "rsi_loss": self.rsi_loss,
+            "histogram": self.histogram,
+            "sketch": dict(zip(self.sketch_index, self.sketch_weight)),
+        }
+
+    def as_tuple(self) -> Tuple:
+        """Returns object values as a tuple."""
+        return (
+            self.strategy_id,
+            self.asset_id,
+            self.datadate,
+            self.close_price,
+            self.ema_short,
+            self.ema_long,
+            self.ema_signal,
+            self.rsi_gain,
+            self.rsi_loss,
+            self.histogram,
+            self.sketch_index,
+            self.sketch_weight,
+            self.hash,
+            self.event_id,
+            self.delivery_id,
+        )
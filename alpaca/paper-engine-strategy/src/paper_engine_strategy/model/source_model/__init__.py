@@ -1,6 +1,7 @@
 """Source data model implementation."""
 
+from .price_matrix import PriceMatrix, PriceMatrixBuilder
 from .spot_prices import SpotPrices
 
 
-__all__ = ["SpotPrices"]
+__all__ = ["PriceMatrix", "PriceMatrixBuilder", "SpotPrices"]
@@ -0,0 +1,181 @@
+"""Close prices matrix model."""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class PriceMatrix(object):
+    """Dense (time x asset) close prices.
+
+    Columnar alternative to a list of SpotPrices: rows are the sorted distinct
+    open times, columns the sorted symbols and missing bars are NaN.
+    """
+
+    dates: np.ndarray  # datetime64[us], (time,)
+    symbols: List[str]  # (asset,)
+    prices: np.ndarray  # float64, (time, asset)
+
+    def __init__(
+        self, dates: np.ndarray, symbols: Sequence[str], prices: np.ndarray
+    ) -> None:
+        """Close prices matrix.
+
+        Args:
+            dates: Open times of the rows.
+            symbols: Symbols of the columns.
+            prices: Close prices, NaN where a symbol has no bar.
+        """
+        self.dates = dates
+        self.symbols = list(symbols)
+        self.prices = prices
+
+    @classmethod
+    def from_columns(
+        cls,
+        symbols: Sequence[str],
+        symbol_codes: np.ndarray,
+        open_times: np.ndarray,
+        close_prices: np.ndarray,
+    ) -> "PriceMatrix":
+        """Creates the matrix from (symbol, open_time, close_price) columns.
+
+        Args:
+            symbols: Symbol of each code.
+            symbol_codes: Integer code of the symbol of each bar.
+            open_times: Open time of each bar.
+            close_prices: Close price of each bar.
+
+        Returns:
+            Close prices matrix.
+        """
+        dates, rows = np.unique(open_times, return_inverse=True)
+
+        # columns sorted by symbol
+        order = np.argsort(np.asarray(symbols, dtype=object))
+        rank = np.empty(len(symbols), dtype=np.int64)
+        rank[order] = np.arange(len(symbols))
+
+        prices = np.full((len(dates), len(symbols)), np.nan)
+        prices[rows, rank[symbol_codes]] = close_prices
+
+        return cls(dates, [symbols[i] for i in order], prices)
+
+    def take(
+        self, columns: Sequence[int], symbols: Optional[Sequence[str]] = None
+    ) -> "PriceMatrix":
+        """Creates a matrix with a subset of the columns.
+
+        Args:
+            columns: Positions of the columns to keep.
+            symbols: New symbols of the kept columns (defaults to the current ones).
+
+        Returns:
+            Close prices matrix, columns sorted by symbol.
+        """
+        columns = np.asarray(columns, dtype=np.int64)
+        if symbols is None:
+            symbols = [self.symbols[i] for i in columns]
+        order = np.argsort(np.asarray(symbols, dtype=object))
+
+        return PriceMatrix(
+            self.dates,
+            [symbols[i] for i in order],
+            self.prices[:, columns[order]],
+        )
+
+    def dropna(self) -> "PriceMatrix":
+        """Creates a matrix without the columns with missing bars."""
+        return self.take(np.flatnonzero(~np.isnan(self.prices).any(axis=0)))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns the matrix as a DataFrame (date index, symbol columns)."""
+        return pd.DataFrame(
+            self.prices,
+            index=pd.DatetimeIndex(self.dates.astype("datetime64[ns]"), name="date"),
+            columns=pd.Index(self.symbols, name="symbol"),
+            copy=False,
+        )
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __repr__(self) -> str:
+        return f"PriceMatrix({len(self.dates)} dates x {len(self.symbols)} symbols)"
+
+
+class PriceMatrixBuilder(object):
+    """Fills a close prices matrix from chunks of (symbol, open_time, close) rows.
+
+    Rows and columns are allocated as new open times and symbols arrive, the
+    buffer grows geometrically, so only the matrix and the current chunk are
+    held in memory whatever the number of rows.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """Empty builder.
+
+        Args:
+            capacity: Initial number of rows of the buffer.
+        """
+        self._rows: Dict[int, int] = {}  # open time (us) -> row
+        self._columns: Dict[str, int] = {}  # symbol -> column
+        self._prices = np.full((capacity, 16), np.nan)
+
+    def add(
+        self,
+        symbols: Sequence[str],
+        open_times: Sequence,
+        close_prices: Sequence[float],
+    ) -> None:
+        """Writes a chunk of bars into the matrix.
+
+        Args:
+            symbols: Symbol of each bar.
+            open_times: Open time of each bar.
+            close_prices: Close price of each bar.
+        """
+        times = np.asarray(open_times, dtype="datetime64[us]").view(np.int64)
+        distinct, inverse = np.unique(times, return_inverse=True)
+        rows = np.fromiter(
+            (self._rows.setdefault(t, len(self._rows)) for t in distinct.tolist()),
+            dtype=np.int64,
+            count=len(distinct),
+        )[inverse]
+        columns = np.fromiter(
+            (self._columns.setdefault(s, len(self._columns)) for s in symbols),
+            dtype=np.int64,
+            count=len(symbols),
+        )
+
+        self._reserve(len(self._rows), len(self._columns))
+        self._prices[rows, columns] = np.asarray(close_prices, dtype=np.float64)
+
+    def _reserve(self, n_rows: int, n_columns: int) -> None:
+        capacity_rows, capacity_columns = self._prices.shape
+        if n_rows <= capacity_rows and n_columns <= capacity_columns:
+            return
+
+        while capacity_rows < n_rows:
+            capacity_rows *= 2
+        while capacity_columns < n_columns:
+            capacity_columns *= 2
+        prices = np.full((capacity_rows, capacity_columns), np.nan)
+        used = self._prices[: len(self._rows), : len(self._columns)]
+        prices[: used.shape[0], : used.shape[1]] = used
+        self._prices = prices
+
+    def build(self) -> PriceMatrix:
+        """Returns the matrix, rows sorted by open time and columns by symbol."""
+        n_rows, n_columns = len(self._rows), len(self._columns)
+        times = np.fromiter(self._rows.keys(), dtype=np.int64, count=n_rows)
+        order = np.argsort(times)
+
+        matrix = PriceMatrix(
+            times[order].view("datetime64[us]"),
+            list(self._columns.keys()),
+            self._prices[order, :n_columns],
+        )
+        self._prices = np.empty((0, 0))
+        return matrix.take(np.arange(n_columns))
@@ -22,6 +22,8 @@ class Strategy(State):
     decision_ts: Optional[datetime] = None
     weight: Optional[Decimal] = None
     decision: Optional[int] = None
+    # hash of the latest model, copied by --latest_mode DERIVED
+    latest_hash: Optional[str] = None
 
     @property
     def hash(self) -> str:
@@ -78,6 +80,7 @@ class Strategy(State):
         _ = record[7]  # hash
         res.event_id = record[8]
         res.delivery_id = record[9]
+        res.latest_hash = record[10]
 
         return res
 
@@ -109,4 +112,5 @@ class Strategy(State):
             self.hash,
             self.event_id,
             self.delivery_id,
+            self.latest_hash,
         )
@@ -25,13 +25,12 @@ class StrategyLatest(State):
 
     @property
     def hash(self) -> str:
-        """Object sha256 hash value."""
+        """Object sha256 hash value (observation timestamp excluded)."""
         res = (
             f"{self.strategy_id}, "
             f"{self.asset_id_type}, "
             f"{self.asset_id}, "
             f"{self.datadate}, "
-            f"{self.decision_ts}, "
             f"{self.weight}, "
             f"{self.decision}"
         )
@@ -1,6 +1,8 @@
 """Data source interactions."""
 
+from .cache import PriceCache
+from .mirror import LatestMirror
 from .source import Source
 from .target import Target
 
-__all__ = ["Source", "Target"]
+__all__ = ["LatestMirror", "PriceCache", "Source", "Target"]
@@ -0,0 +1,183 @@
+"""In-process price cache."""
+
+import copy
+from datetime import datetime
+import logging
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+from paper_engine_strategy.model.source_model.spot_prices import SpotPrices
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]  # (schema, interval, symbol)
+
+
+class PriceCache(object):
+    """Spot prices cache keyed by (schema, interval, symbol).
+
+    Only bars past the last seen open_time of each symbol are requested from
+    the source, bars older than the lookback are evicted and, optionally, the cache is
+    snapshotted to local disk so a restarted process warms up without a full
+    reload.
+    """
+
+    _bars: Dict[CacheKey, List[SpotPrices]]
+    _watermarks: Dict[CacheKey, datetime]
+    _coverage: Dict[Tuple[str, str], datetime]
+
+    def __init__(self, snapshot_dir: Optional[str] = None) -> None:
+        """Price cache.
+
+        Args:
+            snapshot_dir: Local directory where snapshots are kept. Snapshots are
+                disabled when not provided.
+        """
+        self._snapshot_dir = snapshot_dir
+        self._bars = {}
+        self._watermarks = {}
+        self._coverage = {}
+
+    def watermarks(
+        self, schema: str, interval: str, start: datetime
+    ) -> Dict[str, datetime]:
+        """Gets the open_time past which bars have to be fetched, by symbol.
+
+        Args:
+            schema: Source schema.
+            interval: Klines interval.
+            start: Start of the lookback window.
+
+        Returns:
+            Last seen open_time of every cached symbol, empty if the cache does
+            not cover the lookback window (the whole window has to be fetched).
+        """
+        covered_from = self._coverage.get((schema, interval))
+        if covered_from is None or start < covered_from:
+            # cold cache or lookback extended: full reload
+            self.clear(schema, interval)
+            return {}
+
+        return {
+            symbol: max(w, start)
+            for (s, i, symbol), w in self._watermarks.items()
+            if (s, i) == (schema, interval)
+        }
+
+    def update(
+        self, schema: str, interval: str, start: datetime, records: List[SpotPrices]
+    ) -> None:
+        """Appends new bars and evicts the ones older than the lookback window.
+
+        Args:
+            schema: Source schema.
+            interval: Klines interval.
+            start: Start of the lookback window.
+            records: Bars fetched from source past the watermarks.
+        """
+        if (schema, interval) not in self._coverage:
+            self._coverage[(schema, interval)] = start
+
+        for r in sorted(records, key=lambda x: x.open_time):
+            key = (schema, interval, r.symbol)
+            watermark = self._watermarks.get(key)
+            if watermark is not None and r.open_time <= watermark:
+                # already seen (fetched by overlapping queries)
+                continue
+            self._bars.setdefault(key, []).append(r)
+            self._watermarks[key] = r.open_time
+
+        self.evict(schema, interval, start)
+
+    def evict(self, schema: str, interval: str, start: datetime) -> None:
+        """Drops bars at or before the start of the lookback window.
+
+        Args:
+            schema: Source schema.
+            interval: Klines interval.
+            start: Start of the lookback window.
+        """
+        for key in [k for k in self._bars.keys() if k[:2] == (schema, interval)]:
+            bars = [b for b in self._bars[key] if b.open_time > start]
+            if bars:
+                self._bars[key] = bars
+            else:
+                # symbol without bars in the lookback window (e.g. delisted)
+                del self._bars[key]
+                del self._watermarks[key]
+
+        if (schema, interval) in self._coverage:
+            self._coverage[(schema, interval)] = max(
+                self._coverage[(schema, interval)], start
+            )
+
+    def records(self, schema: str, interval: str) -> List[SpotPrices]:
+        """Gets copies of all cached bars of the provided schema and interval.
+
+        Args:
+            schema: Source schema.
+            interval: Klines interval.
+
+        Returns:
+            Cached bars (copies, callers are free to mutate them).
+        """
+        return [
+            copy.copy(b)
+            for key, bars in self._bars.items()
+            if key[:2] == (schema, interval)
+            for b in bars
+        ]
+
+    def clear(self, schema: str, interval: str) -> None:
+        """Drops every cached bar of the provided schema and interval."""
+        for key in [k for k in self._bars.keys() if k[:2] == (schema, interval)]:
+            del self._bars[key]
+            del self._watermarks[key]
+        self._coverage.pop((schema, interval), None)
+
+    @property
+    def snapshot_file(self) -> Optional[str]:
+        """Path to the snapshot file."""
+        if not self._snapshot_dir:
+            return None
+        return os.path.join(self._snapshot_dir, "price_cache.pickle")
+
+    def save(self) -> None:
+        """Snapshots the cache to local disk."""
+        if not self.snapshot_file:
+            return
+
+        os.makedirs(self._snapshot_dir, exist_ok=True)
+        tmp_file = f"{self.snapshot_file}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(
+                {
+                    "bars": self._bars,
+                    "watermarks": self._watermarks,
+                    "coverage": self._coverage,
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        # atomic swap, a crash while writing never leaves a corrupt snapshot
+        os.replace(tmp_file, self.snapshot_file)
+
+    def load(self) -> None:
+        """Warms up the cache from the local disk snapshot (if any)."""
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return
+
+        try:
+            with open(self.snapshot_file, "rb") as f:
+                snapshot = pickle.load(f)  # noqa: S301
+            self._bars = snapshot["bars"]
+            self._watermarks = snapshot["watermarks"]
+            self._coverage = snapshot["coverage"]
+        except Exception as e:
+            logger.warning(f"Price cache snapshot could not be loaded: {e}")
+            self._bars, self._watermarks, self._coverage = {}, {}, {}
+            return
+
+        n_bars = sum(len(b) for b in self._bars.values())
+        logger.info(f"Price cache warmed up from snapshot ({n_bars} bars).")
@@ -1,14 +1,22 @@
 """Source datasource."""
 
 import logging
-from typing import Any, List, Tuple
+import secrets
+import tempfile
+from typing import Any, Dict, List, Tuple
 
+import numpy as np
+import pandas as pd
 import psycopg2
 from psycopg2.extensions import connection as Connection, cursor as Cursor
 from psycopg2.extras import execute_values
 
 from paper_engine_strategy._encoders import cast_money
 from paper_engine_strategy._types import File, Record
+from paper_engine_strategy.model.source_model.price_matrix import (
+    PriceMatrix,
+    PriceMatrixBuilder,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -115,3 +123,179 @@ class Source(object):
         res = execute_values(cur=cursor, sql=instruction, argslist=key_list, fetch=True)
 
         return res
+
+    def copy_columns(
+        self,
+        query: str,
+        dtypes: Dict[str, str],
+        variable: Any = None,
+        chunk_size: int = 100000,
+        spool_size: int = 64 * 1024 * 1024,
+    ) -> Dict[str, np.ndarray]:
+        """Retrieves the result of a query as typed columns through COPY.
+
+        The query runs as COPY (...) TO STDOUT, the CSV stream is spooled to a
+        temporary file past spool_size bytes and parsed back in chunks straight
+        into arrays, no Python object is created per row and the CSV text is
+        never held in memory next to the columns.
+
+        Args:
+            query: Query, parameters are bound on the client (COPY takes none).
+            dtypes: Column name to dtype, in the order of the query columns.
+                Dates are given as "datetime64[us]", strings as "object".
+            variable: Query parameters.
+            chunk_size: Rows parsed at once.
+            spool_size: CSV bytes kept in memory before spooling to disk.
+
+        Returns:
+            Column name to array, NULL values are NaN (NaT for dates).
+        """
+        cursor = self.cursor
+        statement = cursor.mogrify(query, variable) if variable else query.encode()
+        statement = statement.decode().strip().rstrip(";")
+
+        dates = [c for c, dtype in dtypes.items() if dtype.startswith("datetime64")]
+        chunks: Dict[str, List[np.ndarray]] = {c: [] for c in dtypes}
+        with tempfile.SpooledTemporaryFile(max_size=spool_size) as buffer:
+            cursor.copy_expert(
+                f"COPY ({statement}) TO STDOUT WITH (FORMAT CSV)", buffer
+            )
+            if not buffer.tell():
+                return {c: np.empty(0, dtype=dtype) for c, dtype in dtypes.items()}
+            buffer.seek(0)
+
+            reader = pd.read_csv(
+                buffer,
+                header=None,
+                names=list(dtypes.keys()),
+                dtype={c: dtype for c, dtype in dtypes.items() if c not in dates},
+                keep_default_na=False,
+                na_values=[""],
+                chunksize=chunk_size,
+            )
+            for frame in reader:
+                for column, dtype in dtypes.items():
+                    if column in dates:
+                        values = pd.to_datetime(frame[column], format="ISO8601")
+                        if values.dt.tz is not None:
+                            values = values.dt.tz_convert(None)
+                        chunks[column].append(values.to_numpy(dtype=dtype))
+                    else:
+                        chunks[column].append(frame[column].to_numpy())
+                del frame
+
+        return {c: np.concatenate(v) for c, v in chunks.items()}
+
+    def get_price_matrix(
+        self,
+        query: str,
+        variable: Any = None,
+        chunk_size: int = 100000,
+        bulk: bool = False,
+    ) -> PriceMatrix:
+        """Retrieves (symbol, open_time, close_price) rows as a prices matrix.
+
+        Rows are fetched in chunks and turned into columns right away, symbols
+        are mapped to integer codes, so no object is kept per row.
+
+        Args:
+            query: Query returning symbol, open_time and close_price (as float).
+            variable: Query parameters.
+            chunk_size: Rows fetched (or parsed, with bulk) at once.
+            bulk: Fetches the rows with COPY instead (see copy_columns).
+
+        Returns:
+            Close prices matrix.
+        """
+        if bulk:
+            columns = self.copy_columns(
+                query,
+                {
+                    "symbol": "object",
+                    "open_time": "datetime64[us]",
+                    "close_price": "float64",
+                },
+                variable=variable,
+                chunk_size=chunk_size,
+            )
+            symbol_codes, symbols = pd.factorize(columns["symbol"])
+            if not len(symbols):
+                return PriceMatrix(
+                    np.empty(0, dtype="datetime64[us]"), [], np.empty((0, 0))
+                )
+            return PriceMatrix.from_columns(
+                list(symbols),
+                symbol_codes,
+                columns["open_time"],
+                columns["close_price"],
+            )
+
+        cursor = self.cursor
+        if variable:
+            cursor.execute(query, variable)
+        else:
+            cursor.execute(query)
+
+        codes: Dict[str, int] = {}
+        symbol_codes: List[np.ndarray] = []
+        open_times: List[np.ndarray] = []
+        close_prices: List[np.ndarray] = []
+
+        rows = cursor.fetchmany(chunk_size)
+        while rows:
+            symbols, times, prices = zip(*rows)
+            symbol_codes.append(
+                np.fromiter(
+                    (codes.setdefault(s, len(codes)) for s in symbols),
+                    dtype=np.int64,
+                    count=len(rows),
+                )
+            )
+            open_times.append(np.array(times, dtype="datetime64[us]"))
+            close_prices.append(np.array(prices, dtype=np.float64))
+            del rows, symbols, times, prices
+            rows = cursor.fetchmany(chunk_size)
+
+        if not codes:
+            return PriceMatrix(
+                np.empty(0, dtype="datetime64[us]"), [], np.empty((0, 0))
+            )
+
+        return PriceMatrix.from_columns(
+            list(codes.keys()),
+            np.concatenate(symbol_codes),
+            np.concatenate(open_times),
+            np.concatenate(close_prices),
+        )
+
+    def stream_price_matrix(
+        self, query: str, variable: Any = None, itersize: int = 100000
+    ) -> PriceMatrix:
+        """Streams (symbol, open_time, close_price) rows into a prices matrix.
+
+        Rows are read through a server-side (named) cursor, itersize at a
+        time, and written into the matrix as they arrive, so the memory used
+        is the matrix plus one chunk whatever the length of the lookback.
+
+        Args:
+            query: Query returning symbol, open_time and close_price (as float).
+            variable: Query parameters.
+            itersize: Rows transferred per round trip.
+
+        Returns:
+            Close prices matrix.
+        """
+        cursor = self._connection.cursor(name=f"prices_{secrets.token_hex(4)}")
+        cursor.itersize = itersize
+        builder = PriceMatrixBuilder()
+        try:
+            cursor.execute(query.strip().rstrip(";"), variable)
+            rows = cursor.fetchmany(itersize)
+            while rows:
+                builder.add(*zip(*rows))
+                del rows
+                rows = cursor.fetchmany(itersize)
+        finally:
+            cursor.close()
+
+        return builder.build()
@@ -1,32 +1,82 @@
 """Postgres datasource."""
 
+from collections import deque
+import io
+import json
 import logging
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
 
 import psycopg2
 from psycopg2.extensions import connection as Connection, cursor as Cursor
 from psycopg2.extras import execute_values
 
-from paper_engine_strategy._encoders import cast_money
+from paper_engine_strategy._encoders import cast_money, PayloadEncoder, to_csv
 from paper_engine_strategy._types import Keys
 
 logger = logging.getLogger(__name__)
 
 
+class IdAllocator(object):
+    """Hands out the values of a sequence, reserved in blocks.
+
+    NEXTVAL is not transactional: reserved values are never handed out twice,
+    by this or any other process, and the ones left unused when the process
+    stops are gaps in the sequence, as after a rollback.
+    """
+
+    def __init__(self, target: "Target", sequence: str, block_size: int = 1) -> None:
+        """Sequence values allocator.
+
+        Args:
+            target: Target holding the sequence.
+            sequence: Sequence name.
+            block_size: Minimum number of values reserved per round trip.
+        """
+        self._target = target
+        self._sequence = sequence
+        self._block_size = max(block_size, 1)
+        self._ids: Deque[int] = deque()
+
+    def reserve(self, n: int) -> None:
+        """Makes n values available locally, in at most one round trip."""
+        missing = n - len(self._ids)
+        if missing <= 0:
+            return
+
+        cursor = self._target.cursor
+        cursor.execute(
+            "SELECT NEXTVAL(%(sequence)s) FROM GENERATE_SERIES(1, %(n_ids)s);",
+            vars={"sequence": self._sequence, "n_ids": max(missing, self._block_size)},
+        )
+        self._ids.extend(sorted(r[0] for r in cursor.fetchall()))
+
+    def take(self, n: int = 1) -> List[int]:
+        """Hands out the next n values."""
+        self.reserve(n)
+        return [self._ids.popleft() for _ in range(n)]
+
+
 class Target(object):
     """Postgres data source."""
 
     _connection: Connection
     _cursor: Cursor
 
-    def __init__(self, connection_string: str) -> None:
+    def __init__(self, connection_string: str, id_block_size: int = 1) -> None:
         """Postgres' data source.
 
         Args:
             connection_string: Definitions to connect with data source.
+            id_block_size: Delivery and event ids reserved per round trip.
         """
         self._connection_string: str = connection_string
         self._in_progress: bool = False
+        self._delivery_ids = IdAllocator(
+            self, "delivery_id_strategy_seq", block_size=id_block_size
+        )
+        self._event_ids = IdAllocator(
+            self, "event_id_strategy_seq", block_size=id_block_size
+        )
 
     def connect(self) -> None:
         """Connects to data source."""
@@ -111,12 +161,31 @@ class Target(object):
         Returns:
             Next delivery id.
         """
+        return self._delivery_ids.take()[0]
+
+    def get_scope_delivery_id(self, query: str, args: Tuple) -> Optional[int]:
+        """Gets the id of the last delivery that wrote a scope (e.g. strategy id).
+
+        Args:
+            query: Delivery id of the control row of the scope.
+            args: Query parameters, the scope key.
+
+        Returns:
+            Last delivery id, None if nothing was persisted yet.
+        """
         cursor = self.cursor
-        # ALTER SEQUENCE delivery_id_strategy_seq RESTART;
-        cursor.execute("SELECT NEXTVAL('delivery_id_strategy_seq');")
+        cursor.execute(query, args)
         res = cursor.fetchone()
 
-        return res[0]
+        return res[0] if res else None
+
+    def reserve_event_ids(self, n: int) -> None:
+        """Reserves n event ids in one round trip, for the next get_next_event_id.
+
+        Args:
+            n: Number of event ids (an upper bound, left overs are kept).
+        """
+        self._event_ids.reserve(n)
 
     def get_next_event_id(self, n: int = 1) -> Iterator[int]:
         """Gets next event id.
@@ -127,18 +196,7 @@ class Target(object):
         Yields:
             Next event id.
         """
-        cursor = self.cursor
-        # ALTER SEQUENCE event_id_delivery_s3_seq RESTART;
-        cursor.execute(
-            "SELECT NEXTVAL('event_id_strategy_seq') "
-            "FROM GENERATE_SERIES(1, %(n_event_ids)s);",
-            vars={"n_event_ids": n},
-        )
-
-        event_id = cursor.fetchone()
-        while event_id is not None:
-            yield event_id[0]
-            event_id = cursor.fetchone()
+        yield from self._event_ids.take(n)
 
     def get_current_state(self, query: str, args: Keys = None) -> List[Tuple]:
         """Gets current state of entity records.
@@ -161,6 +219,67 @@ class Target(object):
 
         return records
 
+    def get_current_hashes(
+        self, queries: Dict[Any, Tuple[str, str, Tuple[str, ...], Optional[Keys]]]
+    ) -> Dict[Any, Dict[Tuple, str]]:
+        """Gets the keys and hashes of the current state of several entities.
+
+        The queries run as a single UNION ALL where each one fills its own key
+        columns, the others are NULLs of the type of the key columns they hold,
+        so the key values keep their types.
+
+        Args:
+            queries: By entity, a query selecting the key columns then the hash,
+                its table, its key columns and the keys bound to its VALUES %s
+                (None when it takes no parameter).
+
+        Returns:
+            By entity, the stored hash of each key.
+        """
+        res: Dict[Any, Dict[Tuple, str]] = {entity: {} for entity in queries}
+        cursor = self.cursor
+        queries = {
+            entity: q for entity, q in queries.items() if q[3] is None or q[3]
+        }
+        # typed NULLs, (NULL::table).column
+        nulls = [
+            f"(NULL::{table}).{column}"
+            for _, table, key, _ in queries.values()
+            for column in key
+        ]
+
+        branches = []
+        layout = []
+        offset = 0
+        for entity, (query, _, key, args) in queries.items():
+            n_key = len(key)
+            if args is not None:
+                values = ", ".join(
+                    cursor.mogrify(f"({', '.join(['%s'] * len(k))})", k).decode()
+                    for k in args
+                )
+                query = query.replace("%s", values)
+
+            columns = [f"c{i}" for i in range(n_key)]
+            slots = list(nulls)
+            slots[offset : offset + n_key] = [f"s.{c}" for c in columns]
+            branches.append(
+                f"SELECT {len(layout)}, s.hash, {', '.join(slots)} "
+                f"FROM ({query.strip().rstrip(';')}) AS s({', '.join(columns)}, hash)"
+            )
+            layout.append((entity, offset, n_key))
+            offset += n_key
+
+        if not branches:
+            return res
+
+        cursor.execute(" UNION ALL ".join(branches) + ";")
+        for row in cursor.fetchall():
+            entity, offset, n_key = layout[row[0]]
+            res[entity][tuple(row[2 + offset : 2 + offset + n_key])] = row[1]
+
+        return res
+
     def persist_delivery(self, args: Dict[str, Any]) -> None:
         """Persist delivery state.
 
@@ -179,6 +298,19 @@ class Target(object):
         cursor = self.cursor
         cursor.execute(query=query, vars=args)
 
+    def persist_delivery_payload(self, payload: Dict[str, Any]) -> None:
+        """Persists a whole delivery with the persist_delivery_strategy function.
+
+        Args:
+            payload: Entities records, keys to remove and delivery metadata
+                (see db/persist_delivery_strategy.sql).
+        """
+        cursor = self.cursor
+        cursor.execute(
+            "SELECT persist_delivery_strategy(%s::JSONB);",
+            (json.dumps(payload, cls=PayloadEncoder),),
+        )
+
     def execute(self, instruction: str, logs: List[Tuple]) -> None:
         """Executes an instruction (CREATE, AMEND, REMOVE) for given logs.
 
@@ -189,3 +321,90 @@ class Target(object):
         if logs:
             cursor = self.cursor
             execute_values(cur=cursor, sql=instruction, argslist=logs)
+
+    def execute_query(self, query: str, args: Dict[str, Any]) -> int:
+        """Executes a single statement.
+
+        Args:
+            query: Statement to execute.
+            args: Statement parameters.
+
+        Returns:
+            Number of rows affected.
+        """
+        cursor = self.cursor
+        cursor.execute(query=query, vars=args)
+
+        return cursor.rowcount
+
+    def copy_upsert(
+        self,
+        table: str,
+        columns: Tuple[str, ...],
+        key: Tuple[str, ...],
+        logs: List[Tuple],
+    ) -> None:
+        """Upserts logs through a staging table loaded with COPY.
+
+        Same result as the UPSERT instruction of the table, with one COPY and
+        one set based INSERT ... SELECT ... ON CONFLICT. Keys must be unique.
+
+        Args:
+            table: Target table.
+            columns: Columns of the logs, in order.
+            key: Primary key columns.
+            logs: Event logs to upsert.
+        """
+        if not logs:
+            return
+
+        cursor = self.cursor
+        staging = self._stage(cursor, table, columns, logs)
+        projection = ", ".join(columns)
+        updates = ", ".join(f"{c}=EXCLUDED.{c}" for c in columns)
+        cursor.execute(
+            f"INSERT INTO {table} ({projection}) "
+            f"SELECT {projection} FROM {staging} "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates};"
+        )
+
+    def copy_delete(
+        self, table: str, key: Tuple[str, ...], keys_to_remove: Keys
+    ) -> None:
+        """Deletes keys through a staging table loaded with COPY.
+
+        Args:
+            table: Target table.
+            key: Primary key columns.
+            keys_to_remove: Keys to delete.
+        """
+        if not keys_to_remove:
+            return
+
+        cursor = self.cursor
+        staging = self._stage(cursor, table, key, keys_to_remove)
+        condition = " AND ".join(f"t.{c} = s.{c}" for c in key)
+        cursor.execute(f"DELETE FROM {table} t USING {staging} s WHERE {condition};")
+
+    @staticmethod
+    def _stage(
+        cursor: Cursor, table: str, columns: Tuple[str, ...], rows: List[Tuple]
+    ) -> str:
+        """Loads rows into a temporary table shaped as columns of table.
+
+        Returns:
+            Name of the staging table, dropped at the end of the transaction.
+        """
+        staging = f"staging_{table}_{len(columns)}"
+        projection = ", ".join(columns)
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS "
+            f"SELECT {projection} FROM {table} WITH NO DATA;"
+        )
+        cursor.execute(f"TRUNCATE {staging};")
+        cursor.copy_expert(
+            f"COPY {staging} ({projection}) FROM STDIN WITH (FORMAT CSV)",
+            io.StringIO(to_csv(rows)),
+        )
+
+        return staging
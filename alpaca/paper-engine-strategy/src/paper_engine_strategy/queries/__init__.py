@@ -1,11 +1,13 @@
 """Queries implementation."""
 
+from .indicator_state import Queries as IndicatorStateQueries
 from .strategy import Queries as StrategyQueries
 from .strategy_config import Queries as StrategyConfigQueries
 from .strategy_control import Queries as StrategyControlQueries
 from .strategy_latest import Queries as StrategyLatestQueries
 
 __all__ = [
+    "IndicatorStateQueries",
     "StrategyQueries",
     "StrategyControlQueries",
     "StrategyConfigQueries",
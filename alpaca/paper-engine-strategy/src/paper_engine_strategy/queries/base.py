@@ -1,10 +1,51 @@
 """Base query."""
 
+from typing import Tuple
+
 
 class BaseQueries:
     """Base query."""
 
+    TABLE: str
+    KEY: Tuple[str, ...]
+    COLUMNS: Tuple[str, ...]
+    # JSONB columns, given as json strings by the models
+    JSON_COLUMNS: Tuple[str, ...] = ()
+
     LOAD_STATE: str
     LOAD_FULL_STATE: str
     UPSERT: str
     DELETE: str
+
+    @classmethod
+    def load_hashes(cls) -> str:
+        """Query of the key and hash of the records with the given keys."""
+        key = ", ".join(cls.KEY)
+        return f"SELECT {key}, hash FROM {cls.TABLE} WHERE ({key}) IN (VALUES %s);"
+
+    @classmethod
+    def derive(cls, source_table: str) -> str:
+        """Upsert of the last row of each key written by a delivery to source_table.
+
+        source_table has the same columns plus latest_hash, the hash of the
+        latest model (observation timestamp excluded) that the rows take as
+        their hash. They keep their event id and rows with an unchanged hash are
+        not updated.
+        """
+        key = ", ".join(cls.KEY)
+        columns = ", ".join(cls.COLUMNS)
+        selection = ", ".join(
+            "latest_hash AS hash" if c == "hash" else c for c in cls.COLUMNS
+        )
+        updates = ", ".join(
+            f"{c}=EXCLUDED.{c}" for c in cls.COLUMNS if c not in cls.KEY
+        )
+        return (
+            f"INSERT INTO {cls.TABLE} ({columns}) "
+            f"SELECT DISTINCT ON ({key}) {selection} "
+            f"FROM {source_table} "
+            "WHERE delivery_id = %(delivery_id)s "
+            f"ORDER BY {key}, event_id DESC "
+            f"ON CONFLICT ({key}) DO UPDATE SET {updates} "
+            f"WHERE {cls.TABLE}.hash IS DISTINCT FROM EXCLUDED.hash;"
+        )
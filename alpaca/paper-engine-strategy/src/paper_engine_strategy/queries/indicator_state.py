@@ -0,0 +1,66 @@
+"""Indicator State queries."""
+
+from paper_engine_strategy.queries.base import BaseQueries
+
+
+class Queries(BaseQueries):
+    """Indicator State queries."""
+
+    TABLE = "indicator_state"
+    KEY = ("strategy_id", "asset_id")
+    COLUMNS = (
+        "strategy_id",
+        "asset_id",
+        "datadate",
+        "close_price",
+        "ema_short",
+        "ema_long",
+        "ema_signal",
+        "rsi_gain",
+        "rsi_loss",
+        "histogram",
+        "sketch_index",
+        "sketch_weight",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
+    LOAD_STATE = "SELECT * FROM indicator_state WHERE (strategy_id, asset_id) IN (VALUES %s);"  # noqa: B950
+    LOAD_STRATEGY_STATE = "SELECT * FROM indicator_state WHERE (strategy_id) IN (VALUES %s);"  # noqa: B950
+    LOAD_STRATEGY_HASHES = "SELECT strategy_id, asset_id, hash FROM indicator_state WHERE (strategy_id) IN (VALUES %s);"  # noqa: B950
+    UPSERT = (
+        "INSERT INTO indicator_state ("
+        "    strategy_id, "
+        "    asset_id,"
+        "    datadate,"
+        "    close_price,"
+        "    ema_short,"
+        "    ema_long,"
+        "    ema_signal,"
+        "    rsi_gain,"
+        "    rsi_loss,"
+        "    histogram,"
+        "    sketch_index,"
+        "    sketch_weight,"
+        "    hash, event_id, delivery_id"
+        ") VALUES %s "
+        "ON CONFLICT (strategy_id, asset_id) DO "
+        "UPDATE SET "
+        "    strategy_id=EXCLUDED.strategy_id,"
+        "    asset_id=EXCLUDED.asset_id,"
+        "    datadate=EXCLUDED.datadate,"
+        "    close_price=EXCLUDED.close_price,"
+        "    ema_short=EXCLUDED.ema_short,"
+        "    ema_long=EXCLUDED.ema_long,"
+        "    ema_signal=EXCLUDED.ema_signal,"
+        "    rsi_gain=EXCLUDED.rsi_gain,"
+        "    rsi_loss=EXCLUDED.rsi_loss,"
+        "    histogram=EXCLUDED.histogram,"
+        "    sketch_index=EXCLUDED.sketch_index,"
+        "    sketch_weight=EXCLUDED.sketch_weight,"
+        "    hash=EXCLUDED.hash,"
+        "    event_id=EXCLUDED.event_id,"
+        "    delivery_id=EXCLUDED.delivery_id;"
+    )
+    DELETE = "DELETE FROM indicator_state WHERE (strategy_id, asset_id) IN (VALUES %s);"  # noqa: B950
@@ -6,3 +6,4 @@ class BaseSourceQueries:
 
     LOAD_LATEST: str
     LOAD_RECORDS: str
+    LOAD_CLOSES: str
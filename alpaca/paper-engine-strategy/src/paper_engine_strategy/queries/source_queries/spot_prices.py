@@ -1,5 +1,7 @@
 """SOURCE Spot Klines queries."""
 
+from typing import Sequence
+
 from paper_engine_strategy.queries.source_queries.base import BaseSourceQueries
 
 
@@ -21,3 +23,83 @@ class Queries(BaseSourceQueries):
         "FROM {schema}.spot_{interval} "
         "WHERE open_time > %s; "
     )
+
+    LOAD_CLOSES = (
+        "SELECT symbol, "
+        "       open_time, "
+        "       close_price::FLOAT8 "
+        "FROM {schema}.spot_{interval} "
+        "WHERE open_time > %s; "
+    )
+
+    # positional layouts of LOAD_RECORDS and LOAD_CLOSES
+    RECORD_COLUMNS = (
+        "id",
+        "symbol",
+        "open_time",
+        "open_price",
+        "high_price",
+        "low_price",
+        "close_price",
+    )
+    CLOSE_COLUMNS = ("symbol", "open_time", "close_price")
+    # columns read by the strategy
+    STRATEGY_COLUMNS = ("symbol", "open_time", "close_price")
+
+    @staticmethod
+    def load(
+        layout: Sequence[str],
+        required: Sequence[str],
+        universe: bool = False,
+        alpaca_symbols: bool = False,
+        float_prices: bool = False,
+        watermarks: bool = False,
+    ) -> str:
+        """Builds a spot klines query with the projection pushed down.
+
+        Args:
+            layout: Columns of the result, in order.
+            required: Columns actually read, the others are returned as NULL
+                (keeps the layout of the models without shipping the values).
+            universe: Restricts the symbols to a list, given as the second
+                query parameter (symbol = ANY(%s)).
+            alpaca_symbols: Maps binance USDT symbols to alpaca (drops the
+                final character) on the server.
+            float_prices: Casts prices to FLOAT8.
+            watermarks: Restricts the bars to the ones past a watermark per
+                symbol, given as the symbols and watermarks arrays query
+                parameters (replaces the open_time > %s parameter).
+
+        Returns:
+            Query with {schema} and {interval} placeholders.
+        """
+        projection = []
+        for column in layout:
+            if column not in required:
+                expression = "NULL"
+            elif column == "symbol" and alpaca_symbols:
+                expression = "LEFT(symbol, -1)"
+            elif column.endswith("_price") and float_prices:
+                expression = f"{column}::FLOAT8"
+            else:
+                expression = column
+            projection.append(f"{expression} AS {column}")
+
+        if watermarks:
+            query = (
+                f"SELECT {', '.join(projection)} "
+                "FROM {schema}.spot_{interval} "
+                "JOIN UNNEST(%s::TEXT[], %s::TIMESTAMP[]) "
+                "AS w(watermark_symbol, watermark) "
+                "ON symbol = watermark_symbol AND open_time > watermark"
+            )
+        else:
+            query = (
+                f"SELECT {', '.join(projection)} "
+                "FROM {schema}.spot_{interval} "
+                "WHERE open_time > %s"
+            )
+        if universe:
+            query += " AND symbol = ANY(%s)"
+
+        return query + "; "
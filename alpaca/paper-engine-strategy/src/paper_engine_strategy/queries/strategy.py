@@ -6,6 +6,22 @@ from paper_engine_strategy.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Strategy queries."""
 
+    TABLE = "strategy"
+    KEY = ("strategy_id", "asset_id_type", "asset_id", "datadate")
+    COLUMNS = (
+        "strategy_id",
+        "asset_id_type",
+        "asset_id",
+        "datadate",
+        "decision_ts",
+        "weight",
+        "decision",
+        "hash",
+        "event_id",
+        "delivery_id",
+        "latest_hash",
+    )
+
     LOAD_STATE = "SELECT * FROM strategy WHERE (strategy_id, asset_id_type, asset_id, datadate) IN (VALUES %s);"  # noqa: B950
     UPSERT = (
         "INSERT INTO strategy ("
@@ -16,7 +32,7 @@ class Queries(BaseQueries):
         "    decision_ts,"
         "    weight,"
         "    decision,"
-        "    hash, event_id, delivery_id"
+        "    hash, event_id, delivery_id, latest_hash"
         ") VALUES %s "
         "ON CONFLICT (strategy_id, asset_id_type, asset_id, datadate) DO "
         "UPDATE SET "
@@ -29,6 +45,7 @@ class Queries(BaseQueries):
         "    decision=EXCLUDED.decision,"
         "    hash=EXCLUDED.hash,"
         "    event_id=EXCLUDED.event_id,"
-        "    delivery_id=EXCLUDED.delivery_id;"
+        "    delivery_id=EXCLUDED.delivery_id,"
+        "    latest_hash=EXCLUDED.latest_hash;"
     )
     DELETE = "DELETE FROM strategy WHERE (strategy_id, asset_id_type, asset_id, datadate) IN (VALUES %s);"  # noqa: B950
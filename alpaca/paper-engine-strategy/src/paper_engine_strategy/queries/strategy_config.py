@@ -6,6 +6,23 @@ from paper_engine_strategy.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Strategy Config queries."""
 
+    TABLE = "strategy_config"
+    KEY = ("strategy_id",)
+    COLUMNS = (
+        "strategy_id",
+        "strategy_type",
+        "asset_type",
+        "interval",
+        "lookback",
+        "strategy_config",
+        "strategy_hash",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
+    JSON_COLUMNS = ("strategy_config",)
+
     LOAD_STATE = "SELECT * FROM strategy_config WHERE (strategy_id) IN (VALUES %s);"
     UPSERT = (
         "INSERT INTO strategy_config ("
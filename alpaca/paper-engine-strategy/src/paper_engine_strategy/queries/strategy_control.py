@@ -6,7 +6,21 @@ from paper_engine_strategy.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Strategy Control queries."""
 
+    TABLE = "strategy_control"
+    KEY = ("strategy_id",)
+    COLUMNS = (
+        "strategy_id",
+        "last_decision_ts",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
     LOAD_STATE = "SELECT * FROM strategy_control WHERE (strategy_id) IN (VALUES %s);"
+    # last delivery that wrote the scope of the loader (see LatestMirror.sync)
+    LOAD_DELIVERY_ID = (
+        "SELECT delivery_id FROM strategy_control WHERE strategy_id = %s;"
+    )
     UPSERT = (
         "INSERT INTO strategy_control ("
         "    strategy_id, "
@@ -21,4 +35,11 @@ class Queries(BaseQueries):
         "    event_id=EXCLUDED.event_id,"
         "    delivery_id=EXCLUDED.delivery_id;"
     )
+    # moves the watermark of a skipped delivery, the row keeps its event and
+    # delivery ids
+    ADVANCE = (
+        "UPDATE strategy_control "
+        "SET last_decision_ts = %(last_decision_ts)s, hash = %(hash)s "
+        "WHERE strategy_id = %(strategy_id)s;"
+    )
     DELETE = "DELETE FROM strategy_control WHERE (strategy_id) IN (VALUES %s);"
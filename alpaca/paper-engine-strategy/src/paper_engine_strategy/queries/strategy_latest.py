@@ -6,8 +6,24 @@ from paper_engine_strategy.queries.base import BaseQueries
 class Queries(BaseQueries):
     """Strategy Latest queries."""
 
+    TABLE = "strategy_latest"
+    KEY = ("strategy_id", "asset_id_type", "asset_id")
+    COLUMNS = (
+        "strategy_id",
+        "asset_id_type",
+        "asset_id",
+        "datadate",
+        "decision_ts",
+        "weight",
+        "decision",
+        "hash",
+        "event_id",
+        "delivery_id",
+    )
+
     LOAD_STATE = "SELECT * FROM strategy_latest  WHERE (strategy_id, asset_id_type, asset_id) IN (VALUES %s);"  # noqa: B950
     LOAD_FULL_STATE = "SELECT * FROM strategy_latest;"  # noqa: B950
+    LOAD_STRATEGY_HASHES = "SELECT strategy_id, asset_id_type, asset_id, hash FROM strategy_latest WHERE (strategy_id) IN (VALUES %s);"  # noqa: B950
     UPSERT = (
         "INSERT INTO strategy_latest ("
         "    strategy_id, "
@@ -1,9 +1,10 @@
 """Base portfolio_optimization model."""
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Union
 
 from paper_engine_strategy._types import File
+from paper_engine_strategy.model.source_model.price_matrix import PriceMatrix
 from paper_engine_strategy.model.source_model.spot_prices import SpotPrices
 
 
@@ -11,6 +12,7 @@ class BaseStrategy(ABC):
     """Base Strategy."""
 
     strategy_id: int
+    indicator_state: Optional[Dict[str, Dict[str, Any]]] = None
 
     @classmethod
     @abstractmethod
@@ -19,6 +21,16 @@ class BaseStrategy(ABC):
         pass
 
     @abstractmethod
-    def get_weights(self, records: List[SpotPrices], prev_weights: List[List]) -> File:
-        """Pick portfolio according to thresholds."""
+    def get_weights(
+        self,
+        records: Union[List[SpotPrices], PriceMatrix],
+        prev_weights: List[List],
+        indicator_state: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> File:
+        """Pick portfolio according to thresholds.
+
+        When indicator_state is provided (asset -> recursive indicator state),
+        the strategy resumes its indicators from it and leaves the updated
+        state in self.indicator_state.
+        """
         pass
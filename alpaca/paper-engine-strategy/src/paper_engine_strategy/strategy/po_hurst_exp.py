@@ -1,13 +1,15 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Union
 
 import pandas as pd
 
 from paper_engine_strategy._types import File
+from paper_engine_strategy.model.source_model.price_matrix import PriceMatrix
 from paper_engine_strategy.model.source_model.spot_prices import SpotPrices
 from paper_engine_strategy.model.strategy_latest import StrategyLatest
 from paper_engine_strategy.strategy.base import BaseStrategy
 from paper_engine_strategy.strategy.portfolio_optimization.po import PortfolioOptimization
 import paper_engine_strategy.strategy.portfolio_optimization.helpers.data_models as dm
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.incremental_indicators as inc
 import paper_engine_strategy.strategy.portfolio_optimization.helpers.tc_optimization as tc
 
 class POHurstExpStrategy(BaseStrategy):
@@ -31,6 +33,7 @@ class POHurstExpStrategy(BaseStrategy):
             MACD_Long_Window=int(strategy_config.get("macd_long_window", 26)),
             Bollinger_Window=int(strategy_config.get("bollinger_window", 20)),
             RSI_Window=int(strategy_config.get("rsi_window", 5)),
+            Hurst_Kernel=dm.hurst_kernel[strategy_config.get("hurst_kernel", "COMPUTE_HC")],
         )
 
         rebalance_constraints = dm.Rebalance_Constraints(
@@ -51,22 +54,37 @@ class POHurstExpStrategy(BaseStrategy):
         res.params = params
         return res
 
-    def get_weights(self, records: List[SpotPrices], prev_weights: List[List]) -> File:
+    def get_weights(
+        self,
+        records: Union[List[SpotPrices], PriceMatrix],
+        prev_weights: List[List],
+        indicator_state: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> File:
         """Pick portfolio according to thresholds."""
         closes = self.records_2_df(records)
 
         params = self.params
+        indicators = None
+        if indicator_state is not None:
+            indicators, self.indicator_state = inc.update_indicators(
+                closes, indicator_state, params["functional_constraints"]
+            )
+
         p = PortfolioOptimization(
             **params,
             closes=closes,
-            previous_weights=prev_weights
+            previous_weights=prev_weights,
+            indicators=indicators,
         )
         strategy_records = p.get_weights()
 
         return strategy_records
 
     @staticmethod
-    def records_2_df(records: List[SpotPrices]) -> pd.DataFrame:
+    def records_2_df(records: Union[List[SpotPrices], PriceMatrix]) -> pd.DataFrame:
+        if isinstance(records, PriceMatrix):
+            return records.dropna().to_frame()
+
         short_records = [{
             "date": r.open_time,
             "symbol": r.symbol,
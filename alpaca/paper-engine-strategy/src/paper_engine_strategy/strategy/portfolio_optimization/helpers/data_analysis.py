@@ -1,10 +1,12 @@
 from datetime import datetime as dt
 
+import numpy as np
 import pandas as pd
-from hurst import compute_Hc
 
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.indicator_engine as engine
 import paper_engine_strategy.strategy.portfolio_optimization.helpers.indicators as indicator
 import paper_engine_strategy.strategy.portfolio_optimization.helpers.data_models as dm
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.sliding_window as sw
 
 """
 
@@ -23,6 +25,8 @@ def get_data_analysis(
     functional_constraints: dm.Functional_Constraints,
     momentum_days_period: int,
     live_analysis=False,
+    sliding_window=True,
+    indicators=None,
 ):
     """
     Analyze data by calculating Hurst exponents, Bollinger Bands, momentum, and close prices for selected periods.
@@ -36,67 +40,50 @@ def get_data_analysis(
         functional_constraints (dm.Functional_Constraints): Functional constraints (see data_models.py).
         momentum_days_period (int): Period for momentum calculations (in days).
         live_analysis (bool): Flag to indicate if the analysis is for live trading.
+        sliding_window (bool): Backtest only, share the indicators state between
+            overlapping rebalance windows instead of recomputing every window.
+        indicators (dict): Live only, indicators already computed from the
+            incremental state (see incremental_indicators.update_indicators).
 
     Returns:
         dict: Dictionary containing the Rebalancing Dates, Hurst exponents, Bollinger Bands, RSI, Cumulative Returns, MACD values, and close prices.
     """
     if live_analysis:
-        H = [
-            compute_Hc(close_df[col].values, kind="price", simplified=False)[0]
-            for col in close_df.columns.to_list()
-        ]
-
-        if mean_rev_type == dm.Mean_Rev_Type.Bollinger_Bands:
-            bollinger_bands = indicator.calculate_bollinger_bands(close_df)
-        elif mean_rev_type == dm.Mean_Rev_Type.RSI:
-            RSI = indicator.calculate_RSI(
-                close_df, window=functional_constraints.get_rsi_window()
-            )
-
-        if momentum_type == dm.Momentum_Type.Cumulative_Returns:
-            # Mudar para o MACD real, por enquanto é o cumrets
-            momentum_cumrets = indicator.momentum_n_days(
-                close_df, momentum_n_days=momentum_days_period
-            )
-
-        elif momentum_type == dm.Momentum_Type.MACD:
-            macd_df = indicator.calculate_macd(
-                close_df,
-                functional_constraints.get_macd_short_window(),
-                functional_constraints.get_macd_long_window(),
-                signal_window=9,
-            )
+        H = indicator.calculate_hurst_exponent(
+            close_df, functional_constraints.get_hurst_kernel()
+        ).to_list()
+
+        indicators = engine.compute_indicators(
+            close_df.to_numpy(dtype=np.float64),
+            mean_rev_type,
+            momentum_type,
+            functional_constraints,
+            momentum_days_period,
+            precomputed=indicators,
+        )
+        macd_values = indicators["macd_values"]
 
         return {
             "hurst_exponents": list(zip(close_df.columns, H)),
             "bollinger_bands": (
-                list(zip(close_df.columns, bollinger_bands.values))
+                list(zip(close_df.columns, indicators["bollinger_bands"]))
                 if mean_rev_type == dm.Mean_Rev_Type.Bollinger_Bands
                 else None
             ),
             "RSI": (
-                list(zip(close_df.columns, RSI.iloc[-1]))
+                list(zip(close_df.columns, indicators["RSI"]))
                 if mean_rev_type == dm.Mean_Rev_Type.RSI
                 else None
             ),
             "momentum_cumrets": (
-                list(zip(close_df.columns, momentum_cumrets))
+                list(zip(close_df.columns, indicators["momentum_cumrets"]))
                 if momentum_type == dm.Momentum_Type.Cumulative_Returns
                 else None
             ),
             "macd_values": (
                 [
-                    (
-                        key,
-                        macd_df.loc["macd", key],
-                        macd_df.loc["signal_line", key],
-                        macd_df.loc["histogram", key],
-                        macd_df.loc["hist_diff", key],
-                        macd_df.loc["lower_threshold", key],
-                        macd_df.loc["upper_threshold", key],
-                        macd_df.loc["trend", key],
-                    )
-                    for key in macd_df.columns
+                    (key, *macd_values[:, k])
+                    for k, key in enumerate(close_df.columns)
                 ]
                 if momentum_type == dm.Momentum_Type.MACD
                 else None
@@ -104,6 +91,20 @@ def get_data_analysis(
             "close_price": list(zip(close_df.columns, close_df.iloc[-1].values)),
         }
 
+    if isinstance(rebalancing_period, dm.Rebalancing_Period):
+        rebalancing_period = get_rebalancing_period_days(rebalancing_period)
+
+    if sliding_window:
+        return sw.get_sliding_data_analysis(
+            close_df,
+            rebalancing_period,
+            hurst_exponents_period,
+            mean_rev_type,
+            momentum_type,
+            functional_constraints,
+            momentum_days_period,
+        )
+
     rebalances = range(hurst_exponents_period, len(close_df), rebalancing_period)
 
     print(rebalances)
@@ -119,10 +120,9 @@ def get_data_analysis(
         keys = temp.keys()
 
         # Calculate Hurst Exponents
-        H = [
-            compute_Hc(temp[col].values, kind="price", simplified=False)[0]
-            for col in temp.columns.to_list()
-        ]
+        H = indicator.calculate_hurst_exponent(
+            temp, functional_constraints.get_hurst_kernel()
+        ).to_list()
 
         # result_dict[i] = list(zip(keys, H))
         # Calculate cumulative return for the last 30 days before rebalance
@@ -118,6 +118,16 @@ hurst_filter = {
 }
 
 
+class Hurst_Kernel(str, enum.Enum):
+    COMPUTE_HC = "COMPUTE_HC"  # hurst.compute_Hc once per asset
+    VECTORIZED = "VECTORIZED"  # batched R/S over the whole price matrix
+
+hurst_kernel = {
+    "COMPUTE_HC": Hurst_Kernel.COMPUTE_HC,
+    "VECTORIZED": Hurst_Kernel.VECTORIZED,
+}
+
+
 class RSIFilter(tuple, enum.Enum):
     STANDARD = (30, 70)
     STRICT = (20, 80)
@@ -143,6 +153,7 @@ class Functional_Constraints:
         MACD_Long_Window=50,
         Bollinger_Window=20,
         RSI_Window=5,
+        Hurst_Kernel=Hurst_Kernel.COMPUTE_HC,
     ):
         self.take_profit = Take_Profit
         self.stop_loss = Stop_Loss
@@ -155,6 +166,7 @@ class Functional_Constraints:
         self.bollinger_window = Bollinger_Window
         self.rsi_window = RSI_Window
         self.rsi_filter = RSIFilter
+        self.hurst_kernel = Hurst_Kernel
 
     def get_capital_at_risk(self):
         return self.capital_at_risk
@@ -162,6 +174,9 @@ class Functional_Constraints:
     def get_rsi_window(self):
         return self.rsi_window
 
+    def get_hurst_kernel(self):
+        return self.hurst_kernel
+
     def get_take_profit(self):
         return self.take_profit
 
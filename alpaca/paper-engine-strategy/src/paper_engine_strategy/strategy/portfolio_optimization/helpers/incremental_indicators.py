@@ -0,0 +1,286 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.data_models as dm
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.indicator_engine as engine
+
+"""
+
+Resumable RSI and MACD state for the live analysis.
+
+The state of an asset is a fixed number of scalars, whatever the lookback:
+the last close, the EMA short/long/signal and Wilder gain/loss recursions, the
+last four MACD histogram values and a bounded quantile sketch of the positive
+histogram values. Each poll only the bars past the stored one are applied, O(1)
+per new bar.
+
+The recursions are seeded once, at the first bar of the state, and never
+reseeded: unlike a recompute of the lookback window they carry the history
+before the window, whose weight decays as (1 - alpha)^lookback. The histogram
+thresholds are read from the sketch, whose weights decay with the lookback so
+it follows the window, within the relative accuracy of its buckets.
+
+The state of an asset is rebuilt from close_df when it is missing, its last
+bar left the lookback window or its close was revised. Configuration and
+lookback changes resolve to a new strategy_id and start from scratch.
+
+"""
+
+STATE_FIELDS = (
+    "datadate",
+    "close_price",
+    "ema_short",
+    "ema_long",
+    "ema_signal",
+    "rsi_gain",
+    "rsi_loss",
+    "histogram",
+    "sketch",
+)
+
+# last histogram values kept (see indicator_engine.histogram_trend)
+HISTOGRAM_LENGTH = 4
+
+# relative accuracy of the sketch quantiles
+SKETCH_ACCURACY = 0.05
+# buckets kept, the highest ones are merged past it
+SKETCH_BINS = 128
+
+_SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_SKETCH_LOG_GAMMA = math.log(_SKETCH_GAMMA)
+
+# quantiles of the thresholds, see indicator_engine.histogram_thresholds
+_LOWER_QUANTILE = 0.85 - 0.8499
+_UPPER_QUANTILE = 0.85 - 0.15
+
+
+def sketch_add(sketch, value, decay, floor):
+    """
+    Decays the weights of a sketch and adds a positive value to it.
+    Parameters:
+    sketch (dict): Weight by bucket index, updated in place
+    value (float): Value to add, ignored unless positive
+    decay (float): Factor applied to the previous weights
+    floor (float): Weight under which a bucket is forgotten
+    """
+    for i in list(sketch):
+        sketch[i] *= decay
+        if sketch[i] < floor:
+            del sketch[i]
+
+    if value > 0:
+        i = math.ceil(math.log(value) / _SKETCH_LOG_GAMMA)
+        sketch[i] = sketch.get(i, 0.0) + 1.0
+
+    if len(sketch) > SKETCH_BINS:
+        buckets = sorted(sketch)
+        top = buckets[SKETCH_BINS - 1]
+        for i in buckets[SKETCH_BINS:]:
+            sketch[top] += sketch.pop(i)
+
+
+def sketch_quantile(sketch, q):
+    """
+    Quantile of the values of a sketch.
+    Parameters:
+    sketch (dict): Weight by bucket index
+    q (float): Quantile, between 0 and 1
+    Returns:
+    float: Value at the quantile, NaN for an empty sketch
+    """
+    if not sketch:
+        return np.nan
+
+    rank = q * sum(sketch.values())
+    cumulative = 0.0
+    buckets = sorted(sketch)
+    for i in buckets:
+        cumulative += sketch[i]
+        if cumulative > rank:
+            break
+    return 2 * _SKETCH_GAMMA**i / (_SKETCH_GAMMA + 1)
+
+
+def _resume_index(state, dates, prices):
+    """
+    Position of the first bar to apply to the state, None if it must be rebuilt.
+    Parameters:
+    state (dict): Indicator state of the asset (see STATE_FIELDS)
+    dates (pd.DatetimeIndex): close_df index
+    prices (np.ndarray): Close prices of the asset
+    Returns:
+    int: Position in dates, None when the state can not be resumed
+    """
+    if not state:
+        return None
+
+    pos = dates.get_indexer([pd.Timestamp(state["datadate"])])[0]
+    if pos < 0 or prices[pos] != state["close_price"]:
+        # the stored bar left the lookback window or was revised
+        return None
+
+    return pos + 1
+
+
+def _rebuild(prices, alpha_rsi, alpha_s, alpha_l, gamma, decay, floor):
+    """
+    Indicator state of an asset recomputed over the lookback window.
+    Parameters:
+    prices (np.ndarray): Close prices of the asset
+    alpha_rsi (float): RSI smoothing factor
+    alpha_s (float): Short EMA smoothing factor
+    alpha_l (float): Long EMA smoothing factor
+    gamma (float): Signal line smoothing factor
+    decay (float): Sketch decay per bar
+    floor (float): Sketch weight under which a bucket is forgotten
+    Returns:
+    dict: Indicator state (see STATE_FIELDS), without datadate
+    """
+    x = prices[:, None]
+    delta = np.diff(x, axis=0, prepend=np.nan)
+    # the first delta is undefined and enters the averages as 0
+    gain = engine.ema(np.where(delta > 0, delta, 0.0), alpha_rsi)[-1, 0]
+    loss = engine.ema(np.where(delta < 0, -delta, 0.0), alpha_rsi)[-1, 0]
+    short_ema = engine.ema(x, alpha_s)
+    long_ema = engine.ema(x, alpha_l)
+    signal_line = engine.ema(short_ema - long_ema, gamma)
+    histogram = (short_ema - long_ema - signal_line)[:, 0]
+
+    sketch = {}
+    for h in histogram:
+        sketch_add(sketch, float(h), decay, floor)
+
+    return {
+        "close_price": float(prices[-1]),
+        "ema_short": float(short_ema[-1, 0]),
+        "ema_long": float(long_ema[-1, 0]),
+        "ema_signal": float(signal_line[-1, 0]),
+        "rsi_gain": float(gain),
+        "rsi_loss": float(loss),
+        "histogram": histogram[-HISTOGRAM_LENGTH:].tolist(),
+        "sketch": sketch,
+    }
+
+
+def _advance(state, x, alpha_rsi, alpha_s, alpha_l, gamma, decay, floor):
+    """
+    Applies a new bar to the indicator state of an asset, in place.
+    Parameters:
+    state (dict): Indicator state (see STATE_FIELDS)
+    x (float): Close price of the new bar
+    alpha_rsi (float): RSI smoothing factor
+    alpha_s (float): Short EMA smoothing factor
+    alpha_l (float): Long EMA smoothing factor
+    gamma (float): Signal line smoothing factor
+    decay (float): Sketch decay per bar
+    floor (float): Sketch weight under which a bucket is forgotten
+    """
+    delta = x - state["close_price"]
+    state["close_price"] = x
+    state["rsi_gain"] += alpha_rsi * (max(delta, 0.0) - state["rsi_gain"])
+    state["rsi_loss"] += alpha_rsi * (max(-delta, 0.0) - state["rsi_loss"])
+    state["ema_short"] += alpha_s * (x - state["ema_short"])
+    state["ema_long"] += alpha_l * (x - state["ema_long"])
+    macd = state["ema_short"] - state["ema_long"]
+    state["ema_signal"] += gamma * (macd - state["ema_signal"])
+
+    histogram = macd - state["ema_signal"]
+    state["histogram"] = (state["histogram"] + [histogram])[-HISTOGRAM_LENGTH:]
+    sketch_add(state["sketch"], histogram, decay, floor)
+
+
+def update_indicators(
+    close_df,
+    states,
+    functional_constraints: dm.Functional_Constraints,
+    signal_window=9,
+):
+    """
+    Brings the indicator state up to the last bar of close_df.
+
+    Parameters:
+        close_df (pd.DataFrame): DataFrame with close prices for different assets (no missing values).
+        states (dict): Indicator state by asset (see STATE_FIELDS), as returned by a previous call.
+        functional_constraints (dm.Functional_Constraints): Functional constraints (see data_models.py).
+        signal_window (int): MACD signal line window.
+
+    Returns:
+        dict: Per asset arrays for 'RSI' (asset,) and 'macd_values' (7, asset),
+            aligned with close_df.columns (see indicator_engine.compute_indicators).
+        dict: Updated indicator state by asset.
+    """
+    prices = close_df.to_numpy(dtype=np.float64)
+    dates = close_df.index
+    n_obs = len(prices)
+    last_date = dates[-1].to_pydatetime()
+
+    # sketch weights follow the lookback window: a value is forgotten once it
+    # is older than the window, unless others fell in its bucket since
+    decay = 1 - 1 / n_obs
+    alphas = (
+        1 / functional_constraints.get_rsi_window(),
+        2 / (functional_constraints.get_macd_short_window() + 1),
+        2 / (functional_constraints.get_macd_long_window() + 1),
+        2 / (signal_window + 1),
+        decay,
+        decay**n_obs,
+    )
+
+    new_states = {}
+    for k, asset in enumerate(close_df.columns):
+        start = _resume_index(states.get(asset), dates, prices[:, k])
+        if start is None:
+            state = _rebuild(prices[:, k], *alphas)
+        else:
+            state = dict(states[asset])
+            state["histogram"] = list(state["histogram"])
+            state["sketch"] = dict(state["sketch"])
+            for t in range(start, n_obs):
+                _advance(state, float(prices[t, k]), *alphas)
+        state["datadate"] = last_date
+        new_states[asset] = state
+
+    return _indicators(close_df.columns, new_states), new_states
+
+
+def _indicators(columns, states):
+    """
+    RSI and MACD of the indicator state.
+    Parameters:
+    columns (pd.Index): Assets, in output order
+    states (dict): Indicator state by asset
+    Returns:
+    dict: Per asset arrays for 'RSI' (asset,) and 'macd_values' (7, asset)
+    """
+    s = [states[a] for a in columns]
+    gain = np.array([a["rsi_gain"] for a in s])
+    loss = np.array([a["rsi_loss"] for a in s])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        RSI = 100 - (100 / (1 + gain / loss))
+
+    macd = np.array([a["ema_short"] - a["ema_long"] for a in s])
+    signal_line = np.array([a["ema_signal"] for a in s])
+    # states of less than four bars (e.g. a new listing) are NaN filled, as
+    # the full recompute (see indicator_engine.macd_summary)
+    histogram = np.full((HISTOGRAM_LENGTH, len(s)), np.nan)
+    for k, a in enumerate(s):
+        histogram[:, k] = engine.last_rows(np.array(a["histogram"]), HISTOGRAM_LENGTH)
+    lower = np.array([sketch_quantile(a["sketch"], _LOWER_QUANTILE) for a in s])
+    upper = np.array([sketch_quantile(a["sketch"], _UPPER_QUANTILE) for a in s])
+
+    return {
+        "RSI": RSI,
+        "macd_values": np.vstack(
+            [
+                macd,
+                signal_line,
+                histogram[-1],
+                histogram[-1] - histogram[-2],
+                lower,
+                upper,
+                engine.histogram_trend(histogram),
+            ]
+        ),
+    }
@@ -0,0 +1,318 @@
+import numpy as np
+
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.data_models as dm
+
+"""
+
+Column parallel versions of the indicators in indicators.py.
+
+Every function works on a float64 (time x asset) price matrix without missing
+values and processes all the assets at once, the recursions (EMAs) loop over
+time only.
+
+"""
+
+
+def ema(x, alpha, seed=None):
+    """
+    Exponential moving average, as pandas ewm(alpha=alpha, adjust=False).
+    Parameters:
+    x (np.ndarray): float64 array of shape (time, asset)
+    alpha (float): Smoothing factor (2 / (span + 1) for a span)
+    seed (np.ndarray): Value before the first observation, when not provided the
+        average starts at the first observation
+    Returns:
+    np.ndarray: EMA of x, same shape as x
+    """
+    beta = 1.0 - alpha
+    out = np.empty_like(x)
+    if seed is None:
+        last = x[0]
+        out[0] = last
+        start = 1
+    else:
+        last = seed
+        start = 0
+    for t in range(start, x.shape[0]):
+        last = beta * last + alpha * x[t]
+        out[t] = last
+    return out
+
+
+def rsi(prices, window=5):
+    """
+    Relative Strength Index at the last observation, see indicators.calculate_RSI.
+    Parameters:
+    prices (np.ndarray): float64 array of shape (time, asset) with close prices
+    window (int): The period for the RSI calculation
+    Returns:
+    np.ndarray: RSI for each asset
+    """
+    delta = np.diff(prices, axis=0, prepend=np.nan)
+    # the first delta is undefined and enters the averages as 0
+    gain = ema(np.where(delta > 0, delta, 0.0), 1 / window)[-1]
+    loss = ema(np.where(delta < 0, -delta, 0.0), 1 / window)[-1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        RS = gain / loss
+        return 100 - (100 / (1 + RS))
+
+
+def bollinger_bands(prices, num_std=2):
+    """
+    Bollinger Bands over the whole series, see indicators.calculate_bollinger_bands.
+    Parameters:
+    prices (np.ndarray): float64 array of shape (time, asset) with close prices
+    num_std (int): Number of standard deviations to use for the bands
+    Returns:
+    np.ndarray: Array of shape (asset, 3) with the upper, middle and lower bands
+    """
+    mean = prices.mean(axis=0)
+    std = prices.std(axis=0, ddof=1)
+    return np.column_stack([mean + std * num_std, mean, mean - std * num_std])
+
+
+def momentum(prices, momentum_n_days=30):
+    """
+    Cumulative return over the last momentum_n_days observations, see
+    indicators.momentum_n_days.
+    Parameters:
+    prices (np.ndarray): float64 array of shape (time, asset) with close prices
+    momentum_n_days (int): Number of days to consider for momentum calculation
+    Returns:
+    np.ndarray: Cumulative momentum for each asset
+    """
+    window = prices[-momentum_n_days:]
+    if len(window) < 2:
+        return np.full(prices.shape[1], np.nan)
+    return window[-1] / window[0] - 1
+
+
+def histogram_thresholds(histogram, percentile=0.85):
+    """
+    Lower and upper thresholds of the positive MACD histogram values.
+
+    The thresholds are the order statistics at int(n * (percentile - 0.8499))
+    and int(n * (percentile - 0.15)) of the n positive values of each asset,
+    selected with a single np.partition over all the assets.
+
+    Parameters:
+    histogram (np.ndarray): float64 array of shape (time, asset)
+    percentile (float): Reference percentile
+    Returns:
+    np.ndarray: Lower threshold for each asset (NaN without positive values)
+    np.ndarray: Upper threshold for each asset (NaN without positive values)
+    """
+    positive = histogram > 0
+    n_positive = positive.sum(axis=0)
+    lower_idx = (n_positive * (percentile - 0.8499)).astype(np.int64)
+    upper_idx = (n_positive * (percentile - 0.15)).astype(np.int64)
+
+    # non positive values sort last and are never selected
+    values = np.where(positive, histogram, np.inf)
+    kth = np.unique(np.concatenate([lower_idx, upper_idx]))
+    values = np.partition(values, kth, axis=0)
+
+    lower = np.take_along_axis(values, lower_idx[None, :], axis=0)[0]
+    upper = np.take_along_axis(values, upper_idx[None, :], axis=0)[0]
+    lower[n_positive == 0] = np.nan
+    upper[n_positive == 0] = np.nan
+    return lower, upper
+
+
+def last_rows(x, n):
+    """
+    Last n rows of an array, NaN filled at the top when it has fewer rows.
+    Parameters:
+    x (np.ndarray): float64 array of shape (time, ...)
+    n (int): Number of rows
+    Returns:
+    np.ndarray: Array of shape (n, ...)
+    """
+    out = np.full((n,) + x.shape[1:], np.nan)
+    if len(x):
+        out[-min(n, len(x)):] = x[-n:]
+    return out
+
+
+def histogram_trend(histogram):
+    """
+    Mean of the last three np.gradient values of the histogram.
+    Parameters:
+    histogram (np.ndarray): float64 array of shape (time, asset), time >= 4
+    Returns:
+    np.ndarray: Histogram trend for each asset (see last_rows for shorter ones)
+    """
+    h = histogram[-4:]
+    return ((h[2] - h[0]) / 2 + (h[3] - h[1]) / 2 + (h[3] - h[2])) / 3
+
+
+def macd_summary(macd, signal_line, histogram=None):
+    """
+    Last values of the MACD and the statistics of its histogram.
+    Parameters:
+    macd (np.ndarray): float64 array of shape (time, asset) with the MACD
+    signal_line (np.ndarray): float64 array of shape (time, asset) with its signal line
+    histogram (np.ndarray): MACD histogram, macd - signal_line when not provided
+    Returns:
+    np.ndarray: Array of shape (7, asset) with the MACD, Signal Line, Histogram,
+    Histogram Difference, Lower Histogram Threshold, Upper Histogram Threshold
+    and Histogram Trend
+    """
+    if histogram is None:
+        histogram = macd - signal_line
+    lower_threshold, upper_threshold = histogram_thresholds(histogram)
+    # NaN differences and trend with less than four observations
+    recent = last_rows(histogram, 4)
+
+    return np.vstack(
+        [
+            macd[-1],
+            signal_line[-1],
+            recent[-1],
+            recent[-1] - recent[-2],
+            lower_threshold,
+            upper_threshold,
+            histogram_trend(recent),
+        ]
+    )
+
+
+def seeded_macd(
+    first_close,
+    short_state,
+    long_state,
+    signal_state,
+    short_window=12,
+    long_window=26,
+    signal_window=9,
+):
+    """
+    MACD of EMAs seeded at the first row, from EMA recursions seeded earlier.
+
+    An EMA seeded at the first row a is ema_t = S_t - beta^(t - a) * (S_a - x_a)
+    where S is the same recursion seeded at any earlier bar, the signal line
+    follows with a geometric sum over both decays. This lets callers keep one
+    recursion over the whole history and still get the values of a window
+    recomputed from scratch.
+
+    Parameters:
+    first_close (np.ndarray): Close prices at the first row (asset,)
+    short_state (np.ndarray): Short EMA recursion, shape (time, asset)
+    long_state (np.ndarray): Long EMA recursion, shape (time, asset)
+    signal_state (np.ndarray): Recursion of the signal EMA over short_state - long_state
+    short_window (int): Short EMA window
+    long_window (int): Long EMA window
+    signal_window (int): Signal line window
+    Returns:
+    np.ndarray: MACD, shape (time, asset)
+    np.ndarray: Signal Line, shape (time, asset)
+    np.ndarray: Histogram, shape (time, asset)
+    """
+    n_obs = len(short_state)
+    gamma = 2 / (signal_window + 1)
+    beta_s = 1 - 2 / (short_window + 1)
+    beta_l = 1 - 2 / (long_window + 1)
+    delta = 1 - gamma
+
+    m = np.arange(n_obs)[:, None]
+    # geo[m] = sum(delta^(m - k) * beta^k for k in 1..m)
+    geo_s, geo_l = np.zeros(n_obs), np.zeros(n_obs)
+    for k in range(1, n_obs):
+        geo_s[k] = delta * geo_s[k - 1] + beta_s**k
+        geo_l[k] = delta * geo_l[k - 1] + beta_l**k
+
+    short_offset = short_state[0] - first_close
+    long_offset = long_state[0] - first_close
+
+    macd_line = (
+        short_state
+        - long_state
+        - beta_s**m * short_offset
+        + beta_l**m * long_offset
+    )
+    signal_line = (
+        signal_state
+        - delta**m * signal_state[0]
+        - gamma * geo_s[:, None] * short_offset
+        + gamma * geo_l[:, None] * long_offset
+    )
+    histogram = macd_line - signal_line
+    # both EMAs start at the first close, the histogram is exactly 0 there
+    macd_line[0], signal_line[0], histogram[0] = 0.0, 0.0, 0.0
+    # round off noise of the closed form is not a positive histogram
+    histogram[np.abs(histogram) <= 1e-12 * np.abs(first_close)] = 0.0
+
+    return macd_line, signal_line, histogram
+
+
+def macd(prices, short_window=12, long_window=26, signal_window=9):
+    """
+    MACD, see indicators.calculate_macd.
+    Parameters:
+    prices (np.ndarray): float64 array of shape (time, asset) with close prices
+    short_window (int): Short EMA window
+    long_window (int): Long EMA window
+    signal_window (int): Signal line window
+    Returns:
+    np.ndarray: Array of shape (7, asset), see macd_summary
+    """
+    short_ema = ema(prices, 2 / (short_window + 1))
+    long_ema = ema(prices, 2 / (long_window + 1))
+    macd_line = short_ema - long_ema
+    signal_line = ema(macd_line, 2 / (signal_window + 1))
+    return macd_summary(macd_line, signal_line)
+
+
+def compute_indicators(
+    prices,
+    mean_rev_type: dm.Mean_Rev_Type,
+    momentum_type: dm.Momentum_Type,
+    functional_constraints: dm.Functional_Constraints,
+    momentum_days_period: int,
+    precomputed=None,
+):
+    """
+    Computes the mean reversion and momentum indicators selected for a strategy.
+
+    Parameters:
+        prices (np.ndarray): float64 array of shape (time, asset) with close prices.
+        mean_rev_type (dm.Mean_Rev_Type): Type of mean reversion indicator to use.
+        momentum_type (dm.Momentum_Type): Type of momentum indicator to use.
+        functional_constraints (dm.Functional_Constraints): Functional constraints (see data_models.py).
+        momentum_days_period (int): Period for momentum calculations (in days).
+        precomputed (dict): Indicators already available (e.g. from the
+            incremental state), with the same keys and shapes as the result.
+
+    Returns:
+        dict: Per asset arrays for 'bollinger_bands' (asset, 3), 'RSI' (asset,),
+            'momentum_cumrets' (asset,) and 'macd_values' (7, asset), None for the
+            indicators that are not selected.
+    """
+    result = {
+        "bollinger_bands": None,
+        "RSI": None,
+        "momentum_cumrets": None,
+        "macd_values": None,
+    }
+    result.update(precomputed or {})
+
+    if mean_rev_type == dm.Mean_Rev_Type.Bollinger_Bands:
+        if result["bollinger_bands"] is None:
+            result["bollinger_bands"] = bollinger_bands(prices)
+    elif mean_rev_type == dm.Mean_Rev_Type.RSI:
+        if result["RSI"] is None:
+            result["RSI"] = rsi(prices, window=functional_constraints.get_rsi_window())
+
+    if momentum_type == dm.Momentum_Type.Cumulative_Returns:
+        if result["momentum_cumrets"] is None:
+            result["momentum_cumrets"] = momentum(prices, momentum_days_period)
+    elif momentum_type == dm.Momentum_Type.MACD and result["macd_values"] is None:
+        result["macd_values"] = macd(
+            prices,
+            functional_constraints.get_macd_short_window(),
+            functional_constraints.get_macd_long_window(),
+            signal_window=9,
+        )
+
+    return result
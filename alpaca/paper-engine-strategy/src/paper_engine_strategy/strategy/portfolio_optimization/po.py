@@ -24,6 +24,7 @@ class PortfolioOptimization:
         mom_days: int = 30,
         closes: pd.DataFrame = None,
         previous_weights=None,
+        indicators=None,
     ):
         self.closes = closes
         self.last_date = closes.index[-1]
@@ -35,6 +36,7 @@ class PortfolioOptimization:
         self.functional_constraints = functional_constraints
         self.rebalance_constraints = rebalance_constraints
         self.momentum_days = mom_days
+        self.indicators = indicators
 
     def get_weights(self):
 
@@ -62,6 +64,7 @@ class PortfolioOptimization:
                 self.functional_constraints,
                 self.momentum_days,
                 live_analysis=True,
+                indicators=self.indicators,
             ),
             hurst_thresholds=self.functional_constraints.hurst_filter,
             mean_rev_type=self.mean_rev_type,
@@ -0,0 +1,111 @@
+"""Incremental RSI and MACD state against the full recompute."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.data_models as dm
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.incremental_indicators as inc
+import paper_engine_strategy.strategy.portfolio_optimization.helpers.indicator_engine as engine
+
+CONSTRAINTS = dm.Functional_Constraints(
+    Capital_at_Risk=0.1, Hurst_Filter=None, RSIFilter=None
+)
+# MACD, Signal Line, Histogram, Histogram Difference and Histogram Trend
+EXACT_ROWS = [0, 1, 2, 3, 6]
+ASSETS = "ABCDEFGHIJKLMNOPQRST"
+
+
+def closes(n_obs: int, assets: str, seed: int = 0) -> pd.DataFrame:
+    """Random walk close prices of the provided assets."""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 1, size=(n_obs, len(assets)))
+    return pd.DataFrame(
+        100 + steps.cumsum(axis=0),
+        index=pd.date_range("2024-01-01", periods=n_obs),
+        columns=list(assets),
+    )
+
+
+def batch(close_df: pd.DataFrame) -> dict:
+    """RSI and MACD recomputed over the whole window."""
+    return engine.compute_indicators(
+        close_df.to_numpy(dtype=np.float64),
+        dm.Mean_Rev_Type.RSI,
+        dm.Momentum_Type.MACD,
+        CONSTRAINTS,
+        30,
+    )
+
+
+def assert_close(incremental: dict, full: dict, tol: float) -> None:
+    np.testing.assert_allclose(incremental["RSI"], full["RSI"], rtol=tol)
+    # MACD values are price differences, compared to the price scale (100)
+    np.testing.assert_allclose(
+        incremental["macd_values"][EXACT_ROWS],
+        full["macd_values"][EXACT_ROWS],
+        atol=100 * tol,
+    )
+    # the sketch weights decay with the window: the upper threshold follows the
+    # recompute within the accuracy of its buckets on typical assets
+    error = incremental["macd_values"][5] / full["macd_values"][5] - 1
+    assert np.median(np.abs(error)) < 2 * inc.SKETCH_ACCURACY
+
+
+def test_rebuilt_state_matches_full_recompute() -> None:
+    close_df = closes(250, ASSETS)
+
+    indicators, states = inc.update_indicators(close_df, {}, CONSTRAINTS)
+
+    assert set(states) == set(ASSETS)
+    assert_close(indicators, batch(close_df), tol=1e-12)
+
+
+def test_resumed_state_matches_full_recompute_with_new_asset() -> None:
+    history = closes(270, ASSETS + "Z")
+    _, states = inc.update_indicators(history.iloc[:250, :-1], {}, CONSTRAINTS)
+
+    # the window slides 20 bars, Z joins the universe and A leaves it
+    close_df = history.iloc[20:, 1:]
+    indicators, new_states = inc.update_indicators(close_df, states, CONSTRAINTS)
+
+    assert set(new_states) == set(ASSETS[1:] + "Z")
+    assert all(len(s["sketch"]) <= inc.SKETCH_BINS for s in new_states.values())
+    # resumed recursions carry the bars before the window, weighted by
+    # (1 - alpha)^lookback (about 1e-4 for the long EMA)
+    assert_close(indicators, batch(close_df), tol=1e-5)
+    z = close_df.columns.get_loc("Z")
+    np.testing.assert_allclose(
+        indicators["macd_values"][EXACT_ROWS, z],
+        batch(close_df)["macd_values"][EXACT_ROWS, z],
+        rtol=1e-12,
+    )
+
+
+@pytest.mark.parametrize("n_obs", [1, 2, 3])
+def test_short_history_is_nan_filled(n_obs: int) -> None:
+    close_df = closes(n_obs, "AB")
+
+    indicators, states = inc.update_indicators(close_df, {}, CONSTRAINTS)
+    full = batch(close_df)
+
+    for values in (indicators["macd_values"], full["macd_values"]):
+        assert values.shape == (7, 2)
+        assert np.isnan(values[6]).all()
+    np.testing.assert_allclose(
+        indicators["macd_values"][EXACT_ROWS], full["macd_values"][EXACT_ROWS]
+    )
+
+
+def test_short_state_resumes_next_to_new_asset() -> None:
+    history = closes(3, "AB")
+    _, states = inc.update_indicators(history.iloc[:1, :1], {}, CONSTRAINTS)
+
+    # A resumes from a one bar state, B is rebuilt over the whole window
+    indicators, states = inc.update_indicators(history, states, CONSTRAINTS)
+
+    assert [len(states[a]["histogram"]) for a in "AB"] == [3, 3]
+    assert np.isnan(indicators["macd_values"][6]).all()
+    np.testing.assert_allclose(
+        indicators["macd_values"][EXACT_ROWS], batch(history)["macd_values"][EXACT_ROWS]
+    )